@@ -0,0 +1,400 @@
+"""
+Leaderboard service for the frontend (frontend2/API_CONTRACT.md), replacing
+the json-server mock. Standard library only: asyncio streams and HTTP/1.1
+with keep-alive.
+
+    GET  /scores?_sort=score&_order=desc&_limit=n   top n scores
+    POST /scores                                    add a score (201, with its id)
+    GET  /health                                    {"status": "ok", ...}
+
+Scores are stored as posted, like json-server: any JSON object with a
+numeric "score", plus the id assigned here. Ties keep submission order.
+
+Reads never sort the table: an in-memory index keeps the best TOP_K scores
+in order, and the encoded body of every limit asked for is cached until
+the index next changes (a new score that does not make the top K changes
+nothing). Other sorts and limits above TOP_K fall back to a full sort.
+
+Writes are group-committed: a POST is answered once its score is in the
+append-only log (scores.log, JSON lines), and all POSTs arriving within
+FLUSH_INTERVAL share one write and fsync. A score is served only once
+that write succeeded; a failed write is cut back out of the log. Once the
+log holds COMPACT_EVERY scores, everything is written to scores.json and
+the log starts over. Loading reads scores.json, then replays the log; only
+its last line may be torn (a crash mid-write), anything else is an error.
+
+Usage:
+    python backend/leaderboard.py --port 4000 --data backend/data
+    python backend/leaderboard.py --import frontend2/mock/db.json --cors-origin https://tetris.example.com
+"""
+import argparse, asyncio, bisect, json, math, os, sys, time
+from urllib.parse import urlsplit, parse_qs
+
+# run as `python backend/leaderboard.py`: the shared helpers live in the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from httputil import DEFAULT_ORIGINS, cors_headers, encode
+
+TOP_K = 1000
+FLUSH_INTERVAL = 0.02
+COMPACT_EVERY = 10000
+MAX_BODY = 64 * 1024
+
+REASONS = {200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# -------- Storage --------
+
+class Scores:
+    """Every score by id, plus the top-K index and the cached responses it backs."""
+    def __init__(self, top_k=TOP_K):
+        self.top_k = top_k
+        self.by_id = {}
+        self.top = []  # (-score, id), best first, at most top_k long
+        self.next_id = 1
+        self.cache = {}
+
+    def add(self, entry):
+        """Add an entry that already has its id; replaying the same id twice is harmless."""
+        if entry["id"] in self.by_id:
+            return
+        self.by_id[entry["id"]] = entry
+        self.next_id = max(self.next_id, entry["id"] + 1)
+        key = (-entry["score"], entry["id"])
+        if len(self.top) < self.top_k or key < self.top[-1]:
+            bisect.insort(self.top, key)
+            del self.top[self.top_k:]
+            self.cache.clear()
+
+    def reserve(self):
+        """A fresh id for an entry that is added once it is stored."""
+        self.next_id += 1
+        return self.next_id - 1
+
+    def best(self, limit):
+        """Encoded JSON array of the top `limit` scores."""
+        if limit > self.top_k and len(self.by_id) > self.top_k:
+            return encode(self.query("score", "desc", limit))
+        body = self.cache.get(limit)
+        if body is None:
+            body = self.cache[limit] = encode([self.by_id[i] for _, i in self.top[:limit]])
+        return body
+
+    def query(self, field, order, limit):
+        """Any other sort: the whole table, json-server style (entries missing the field go last)."""
+        entries = sorted(self.by_id.values(), key=lambda e: e["id"])
+        present = [e for e in entries if isinstance(e.get(field), (int, float, str))]
+        missing = [e for e in entries if not isinstance(e.get(field), (int, float, str))]
+        try:
+            present.sort(key=lambda e: e[field], reverse=order == "desc")
+        except TypeError:
+            present.sort(key=lambda e: str(e[field]), reverse=order == "desc")
+        entries = present + missing
+        return entries if limit is None else entries[:limit]
+
+class Journal:
+    """The append-only log and its compacted snapshot."""
+    def __init__(self, folder, compact_every=COMPACT_EVERY):
+        self.folder = folder
+        self.snapshot_path = os.path.join(folder, "scores.json")
+        self.log_path = os.path.join(folder, "scores.log")
+        self.compact_every = compact_every
+        self.logged = 0
+        self.end = 0  # length of the log up to its last stored line
+        os.makedirs(folder, exist_ok=True)
+        self.log = None
+
+    def load(self, scores):
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as f:
+                for entry in json.load(f)["scores"]:
+                    scores.add(entry)
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as f:
+                lines = f.readlines()
+            for n, line in enumerate(lines, 1):
+                try:
+                    entry = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    entry = None
+                if entry is None:
+                    if n < len(lines):
+                        raise ValueError(f"{self.log_path}: line {n} is corrupt")
+                    break  # cut short by a crash before it was acknowledged; dropped below
+                scores.add(entry)
+                self.logged += 1
+                self.end += len(line)
+        self._reopen()
+
+    def _reopen(self):
+        """Open the log for appending, cut back to its last stored line."""
+        if os.path.exists(self.log_path):
+            os.truncate(self.log_path, self.end)
+        self.log = open(self.log_path, "ab")
+
+    def append(self, lines):
+        data = b"".join(lines)
+        try:
+            if self.log is None:
+                self._reopen()
+            self.log.write(data)
+            self.log.flush()
+            os.fsync(self.log.fileno())
+        except OSError:
+            self._rollback()
+            raise
+        self.end += len(data)
+        self.logged += len(lines)
+
+    def _rollback(self):
+        """After a failed append: drop what it may have written, so the log only holds stored lines."""
+        try:
+            self.log and self.log.close()
+        except OSError:
+            pass
+        self.log = None
+        try:
+            self._reopen()
+        except OSError:
+            pass  # still failing; the next append tries again before writing
+
+    def compact(self, entries):
+        """
+        Write entries (every score) as the snapshot and start an empty log.
+        If this fails before the snapshot is in place the old files stand; if
+        it fails after, the log is emptied by the next append's reopen.
+        """
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": 1, "scores": entries}, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        log, self.log = self.log, None
+        self.logged = self.end = 0  # everything in the log is in the snapshot now
+        if log:
+            log.close()
+        self._reopen()
+
+    def close(self):
+        if self.log:
+            self.log.close()
+
+# -------- Service --------
+
+class Leaderboard:
+    def __init__(self, folder="backend/data", origins=DEFAULT_ORIGINS, top_k=TOP_K,
+                 flush_interval=FLUSH_INTERVAL, compact_every=COMPACT_EVERY):
+        self.scores = Scores(top_k)
+        self.journal = Journal(folder, compact_every)
+        self.journal.load(self.scores)
+        self.origins = set(origins)
+        self.flush_interval = flush_interval
+        self.pending = []  # (entry, log line, future) waiting for the next flush
+        self.wakeup = None
+        self.started = time.time()
+        self.posts = self.gets = 0
+
+    def import_json(self, path):
+        """Seed an empty store from a json-server db.json."""
+        if self.scores.by_id:
+            return 0
+        with open(path) as f:
+            entries = [e for e in json.load(f)["scores"] if _valid_score(e.get("score"))]
+        for entry in entries:
+            if not isinstance(entry.get("id"), int):
+                entry = dict(entry, id=self.scores.next_id)
+            self.scores.add(entry)
+        self.journal.compact(list(self.scores.by_id.values()))
+        return len(entries)
+
+    async def flusher(self):
+        """Group commit: one write and fsync for every POST that came in since the last."""
+        loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            await asyncio.sleep(self.flush_interval)
+            batch, self.pending = self.pending, []
+            try:
+                await loop.run_in_executor(None, self.journal.append, [line for _, line, _ in batch])
+            except OSError as e:
+                for _, _, done in batch:
+                    done.set_exception(e)
+                continue
+            # served only now that they are durable
+            for entry, _, done in batch:
+                self.scores.add(entry)
+                done.set_result(None)
+            if self.journal.logged >= self.journal.compact_every:
+                # the flusher is the only writer, so nothing is appended while this runs
+                entries = list(self.scores.by_id.values())
+                try:
+                    await loop.run_in_executor(None, self.journal.compact, entries)
+                except OSError as e:
+                    # the scores are still in the log; compaction is tried again after the next flush
+                    print(f"compaction failed: {e}", file=sys.stderr, flush=True)
+
+    async def submit(self, fields):
+        entry = dict(fields, id=self.scores.reserve())
+        done = asyncio.get_running_loop().create_future()
+        self.pending.append((entry, encode(entry) + b"\n", done))
+        self.wakeup.set()
+        await done
+        return entry
+
+    # ---- HTTP ----
+
+    async def handle(self, method, path, query, body):
+        """(status, body bytes) for one request."""
+        if path == "/scores":
+            if method == "GET":
+                self.gets += 1
+                return 200, self.get_scores(query)
+            if method == "POST":
+                self.posts += 1
+                return 201, encode(await self.submit(_parse_score(body)))
+            raise HTTPError(405, "use GET or POST")
+        if path == "/health":
+            if method != "GET":
+                raise HTTPError(405, "use GET")
+            return 200, encode({"status": "ok", "scores": len(self.scores.by_id), "posts": self.posts, "gets": self.gets,
+                                "uptime": round(time.time() - self.started, 1)})
+        raise HTTPError(404, f"no route for {path}")
+
+    def get_scores(self, query):
+        field = query.get("_sort", ["id"])[0]
+        order = query.get("_order", ["asc"])[0].lower()
+        limit = query.get("_limit", [None])[0]
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                raise HTTPError(400, "_limit must be an integer")
+            if limit < 0:
+                raise HTTPError(400, "_limit must not be negative")
+        if field == "score" and order == "desc" and limit is not None:
+            return self.scores.best(limit)
+        return encode(self.scores.query(field, order, limit))
+
+    async def connection(self, reader, writer):
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                url = urlsplit(target)
+                extra = cors_headers(self.origins, headers.get("origin"))
+                if method == "OPTIONS":
+                    status, payload = 204, b""
+                    if extra:
+                        extra += [("Access-Control-Allow-Methods", "GET, POST, OPTIONS"),
+                                  ("Access-Control-Allow-Headers", "Content-Type, Authorization"),
+                                  ("Access-Control-Max-Age", "86400")]
+                else:
+                    try:
+                        status, payload = await self.handle(method, url.path.rstrip("/") or "/",
+                                                            parse_qs(url.query), body)
+                    except HTTPError as e:
+                        status, payload = e.status, encode({"error": str(e)})
+                    except OSError:
+                        status, payload = 500, encode({"error": "could not store the score"})
+                keep = headers.get("connection", "").lower() != "close"
+                _write_response(writer, status, payload, extra, keep)
+                await writer.drain()
+                if not keep:
+                    break
+        except HTTPError as e:
+            _write_response(writer, e.status, encode({"error": str(e)}), [], False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+def _valid_score(score):
+    return isinstance(score, (int, float)) and not isinstance(score, bool) and math.isfinite(score)
+
+def _parse_score(body):
+    try:
+        fields = json.loads(body)
+    except ValueError:
+        raise HTTPError(400, "body must be JSON")
+    if not isinstance(fields, dict):
+        raise HTTPError(400, "body must be a JSON object")
+    if not _valid_score(fields.get("score")):
+        raise HTTPError(400, "score must be a number")
+    fields.pop("id", None)
+    return fields
+
+async def _read_request(reader):
+    """(method, target, headers, body), or None at the end of the connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "bad request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    size = headers.get("content-length", "0") or "0"
+    if not (size.isascii() and size.isdigit()):
+        raise HTTPError(400, "bad content-length")
+    size = int(size)
+    if size > MAX_BODY:
+        raise HTTPError(413, "body too large")
+    body = await reader.readexactly(size) if size else b""
+    return method.upper(), target, headers, body
+
+def _write_response(writer, status, payload, extra, keep):
+    head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+    if payload:
+        head.append("Content-Type: application/json; charset=utf-8")
+    head.append(f"Content-Length: {len(payload)}")
+    head.append("Connection: keep-alive" if keep else "Connection: close")
+    head += [f"{k}: {v}" for k, v in extra]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+
+async def serve(board, host, port):
+    flusher = asyncio.create_task(board.flusher())
+    server = await asyncio.start_server(board.connection, host, port)
+    print(f"leaderboard on http://{host}:{port} ({len(board.scores.by_id)} scores)", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        flusher.cancel()
+        board.journal.close()
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description="Leaderboard service for the frontend.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=4000)
+    parser.add_argument("--data", default="backend/data", help="folder for scores.json and scores.log")
+    parser.add_argument("--cors-origin", action="append", default=None,
+                        help=f"allowed frontend origin, repeatable, '*' for any (default: {DEFAULT_ORIGINS[0]})")
+    parser.add_argument("--import", dest="import_path", default=None,
+                        help="seed an empty store from a json-server db.json")
+    args = parser.parse_args(argv)
+
+    board = Leaderboard(args.data, args.cors_origin or DEFAULT_ORIGINS)
+    if args.import_path:
+        print(f"imported {board.import_json(args.import_path)} scores")
+    try:
+        asyncio.run(serve(board, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Headless, vectorized Tetris: N games held in NumPy arrays and advanced together.
+
+Uses the same PIECES, SRS kick tables, spawn, hold, gravity and scoring as
+tetris_ai.Game. One step(actions) call is one Game.step tick for every game.
+"""
+import numpy as np
+
+from tetris_ai import (
+    ROWS, COLS, PIECES, ORDER, JLSTZ_KICKS, I_KICKS,
+    NOOP, LEFT, RIGHT, DOWN, ROT_CW, ROT_CCW, HOLD, HARD_DROP,
+)
+
+SPAWN_R, SPAWN_C = 0, 4
+
+# -------- Lookup tables (kind index follows ORDER, so piece_id = kind + 1) --------
+
+def _build_cells():
+    cells = np.zeros((len(ORDER), 4, 4, 2), dtype=np.int8)
+    for k, kind in enumerate(ORDER):
+        for rot in range(4):
+            cells[k, rot] = PIECES[kind][rot]
+    return cells
+
+def _build_kicks():
+    # kicks[kind, rot, d, i] for d=0 (CW) / d=1 (CCW); short lists are padded with
+    # (0, 0), which retests the unkicked position and never changes the outcome.
+    kicks = np.zeros((len(ORDER), 4, 2, 5, 2), dtype=np.int8)
+    for k, kind in enumerate(ORDER):
+        for rot in range(4):
+            for d, rot_dir in enumerate((1, 3)):
+                new_rot = (rot + rot_dir) % 4
+                if kind == "I":
+                    table = I_KICKS.get((rot, new_rot), [(0,0)])
+                elif kind == "O":
+                    table = [(0,0)]
+                else:
+                    table = JLSTZ_KICKS.get((rot, new_rot), [(0,0)])
+                kicks[k, rot, d, :len(table)] = table
+    return kicks
+
+CELLS = _build_cells()
+KICKS = _build_kicks()
+
+class BatchSim:
+    """
+    N games stepped in lockstep.
+
+    State arrays (all length N along axis 0):
+      boards     bool  (N, ROWS, COLS)
+      kind, rot  int8  current piece (index into ORDER) and rotation
+      r, c       int16 current piece position
+      hold       int8  held kind, -1 when empty
+      hold_used  bool
+      queue      int8  (N, 14) upcoming kinds in draw order: this bag and the next
+      bag_pos    int8  index of the next draw in queue
+      score, lines, pieces  int64 running totals
+      ticks      int64 steps taken, for gravity on every gravity_every-th one
+      done       bool  game over
+    """
+    def __init__(self, n, seed=None, gravity_every=1):
+        self.n = n
+        self.gravity_every = gravity_every
+        self.rng = np.random.default_rng(seed)
+        self.boards = np.zeros((n, ROWS, COLS), dtype=bool)
+        self.kind = np.zeros(n, dtype=np.int8)
+        self.rot = np.zeros(n, dtype=np.int8)
+        self.r = np.zeros(n, dtype=np.int16)
+        self.c = np.zeros(n, dtype=np.int16)
+        self.hold = np.full(n, -1, dtype=np.int8)
+        self.hold_used = np.zeros(n, dtype=bool)
+        self.queue = np.zeros((n, 2 * len(ORDER)), dtype=np.int8)
+        self.bag_pos = np.zeros(n, dtype=np.int8)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lines = np.zeros(n, dtype=np.int64)
+        self.pieces = np.zeros(n, dtype=np.int64)
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.reset()
+
+    # -------- Bags --------
+
+    def _bags(self, m):
+        return self.rng.random((m, len(ORDER))).argsort(axis=1).astype(np.int8)
+
+    def _draw(self, idx):
+        """Pop the next kind for games idx, rolling to a fresh bag when one runs out."""
+        kinds = self.queue[idx, self.bag_pos[idx]]
+        self.bag_pos[idx] += 1
+        roll = idx[self.bag_pos[idx] == len(ORDER)]
+        if roll.size:
+            self.queue[roll, :len(ORDER)] = self.queue[roll, len(ORDER):]
+            self.queue[roll, len(ORDER):] = self._bags(roll.size)
+            self.bag_pos[roll] = 0
+        return kinds
+
+    def peek(self, k=5):
+        """(N, k) upcoming kinds, k <= 7."""
+        cols = self.bag_pos[:, None].astype(np.intp) + np.arange(k)
+        return np.take_along_axis(self.queue, cols, axis=1)
+
+    # -------- Board queries --------
+
+    def _fits(self, idx, kind, rot, r, c):
+        cells = CELLS[kind, rot]
+        rr = r[:, None] + cells[..., 0]
+        cc = c[:, None] + cells[..., 1]
+        inside = (rr >= 0) & (rr < ROWS) & (cc >= 0) & (cc < COLS)
+        hit = self.boards[idx[:, None], np.clip(rr, 0, ROWS - 1), np.clip(cc, 0, COLS - 1)]
+        return (inside & ~hit).all(axis=1)
+
+    def fits(self, idx, dr=0, dc=0):
+        idx = np.asarray(idx)
+        return self._fits(idx, self.kind[idx], self.rot[idx], self.r[idx] + dr, self.c[idx] + dc)
+
+    def heights(self):
+        """(N, COLS) column heights, as tetris_ai.column_heights."""
+        filled = self.boards.any(axis=1)
+        return np.where(filled, ROWS - self.boards.argmax(axis=1), 0)
+
+    # -------- State changes --------
+
+    def reset(self, mask=None):
+        idx = np.arange(self.n) if mask is None else np.flatnonzero(mask)
+        if idx.size == 0:
+            return
+        self.boards[idx] = False
+        self.queue[idx, :len(ORDER)] = self._bags(idx.size)
+        self.queue[idx, len(ORDER):] = self._bags(idx.size)
+        self.bag_pos[idx] = 0
+        self.hold[idx] = -1
+        self.hold_used[idx] = False
+        self.score[idx] = 0
+        self.lines[idx] = 0
+        self.pieces[idx] = 0
+        self.ticks[idx] = 0
+        self.done[idx] = False
+        self._spawn(idx, self._draw(idx))
+
+    def _spawn(self, idx, kinds):
+        self.kind[idx] = kinds
+        self.rot[idx] = 0
+        self.r[idx] = SPAWN_R
+        self.c[idx] = SPAWN_C
+        self.done[idx] = ~self.fits(idx)
+
+    def _shift(self, idx, dr, dc):
+        ok = self.fits(idx, dr, dc)
+        moved = idx[ok]
+        self.r[moved] += dr
+        self.c[moved] += dc
+        return ok
+
+    def _rotate(self, idx, d):
+        kind, rot = self.kind[idx], self.rot[idx]
+        new_rot = (rot + (1 if d == 0 else 3)) % 4
+        pending = np.ones(idx.size, dtype=bool)
+        for i in range(KICKS.shape[3]):
+            kick = KICKS[kind, rot, d, i]
+            ok = pending & self._fits(idx, kind, new_rot, self.r[idx] + kick[:, 0], self.c[idx] + kick[:, 1])
+            hit = idx[ok]
+            self.r[hit] += kick[ok, 0]
+            self.c[hit] += kick[ok, 1]
+            self.rot[hit] = new_rot[ok]
+            pending &= ~ok
+            if not pending.any():
+                break
+
+    def _hold(self, idx):
+        idx = idx[~self.hold_used[idx]]
+        if idx.size == 0:
+            return
+        swap = self.hold[idx].copy()
+        self.hold[idx] = self.kind[idx]
+        self.hold_used[idx] = True
+        empty = swap < 0
+        if empty.any():
+            swap[empty] = self._draw(idx[empty])
+        self._spawn(idx, swap)
+
+    def _drop(self, idx):
+        falling = idx
+        while falling.size:
+            falling = falling[self._shift(falling, 1, 0)]
+
+    def _lock(self, idx, cleared_out):
+        cells = CELLS[self.kind[idx], self.rot[idx]]
+        rr = self.r[idx, None] + cells[..., 0]
+        cc = self.c[idx, None] + cells[..., 1]
+        self.boards[idx[:, None], rr, cc] = True
+
+        full = self.boards[idx].all(axis=2)
+        cleared = full.sum(axis=1)
+        clearing = cleared > 0
+        if clearing.any():
+            sub = idx[clearing]
+            # stable sort puts full rows first (they become the empty top rows),
+            # followed by the kept rows in their original order
+            order = np.argsort(~full[clearing], axis=1, kind="stable")
+            boards = np.take_along_axis(self.boards[sub], order[:, :, None], axis=1)
+            boards[np.arange(ROWS) < cleared[clearing, None]] = False
+            self.boards[sub] = boards
+
+        self.score[idx] += 100 + cleared * 500
+        self.lines[idx] += cleared
+        self.pieces[idx] += 1
+        cleared_out[idx] = cleared
+        self.hold_used[idx] = False
+        self._spawn(idx, self._draw(idx))
+
+    def step(self, actions=None):
+        """
+        Apply one action per game (tetris_ai action codes), then gravity on
+        every gravity_every-th tick, as Game.step. Finished games are left
+        untouched. Returns (locked, lines_cleared) arrays for this tick.
+        """
+        actions = np.full(self.n, NOOP) if actions is None else np.asarray(actions)
+        live = ~self.done
+        self.ticks[live] += 1
+        locked = np.zeros(self.n, dtype=bool)
+        cleared = np.zeros(self.n, dtype=np.int64)
+
+        for action, dr, dc in ((LEFT, 0, -1), (RIGHT, 0, 1), (DOWN, 1, 0)):
+            idx = np.flatnonzero(live & (actions == action))
+            if idx.size:
+                self._shift(idx, dr, dc)
+        for action, d in ((ROT_CW, 0), (ROT_CCW, 1)):
+            idx = np.flatnonzero(live & (actions == action))
+            if idx.size:
+                self._rotate(idx, d)
+        idx = np.flatnonzero(live & (actions == HOLD))
+        if idx.size:
+            self._hold(idx)
+
+        idx = np.flatnonzero(live & (actions == HARD_DROP))
+        if idx.size:
+            self._drop(idx)
+            self._lock(idx, cleared)
+            locked[idx] = True
+
+        falls = self.ticks % self.gravity_every == 0
+        idx = np.flatnonzero(~self.done & live & (actions != HARD_DROP) & falls)
+        if idx.size:
+            resting = idx[~self._shift(idx, 1, 0)]
+            if resting.size:
+                self._lock(resting, cleared)
+                locked[resting] = True
+        return locked, cleared
@@ -0,0 +1,275 @@
+"""
+Benchmarks for the engine, the loggers, inference and the AI, as JSON.
+
+Micro benchmarks time one call in a loop sized to run for at least
+--min-time seconds, repeated --repeat times; the median and best
+nanoseconds per call are reported. Macro benchmarks play whole headless
+games and report steps and pieces per second. Every fixture is seeded, so
+runs on the same machine are comparable; --compare flags benchmarks that
+got slower than a previous result file by more than --threshold (micro
+benchmarks are compared on their best run, the least noisy number).
+
+Usage:
+    python bench.py --out bench.json
+    python bench.py --quick --compare bench.json
+    python bench.py --filter engine.
+"""
+import argparse, gc, json, os, platform, random, statistics, sys, tempfile, time
+
+import numpy as np
+
+import tetris_ai as t
+from framelog import BinaryFrameLogger
+from inference import MLPInference
+from placement import PlacementAI, HeuristicScorer, enumerate_placements, candidate_frames, outcome_features
+
+def midgame(seed=0, pieces=25):
+    """A seeded game played by the heuristic AI for a few pieces: a realistic board."""
+    game = t.Game(next_src=t.NextSource(seed))
+    ai = PlacementAI(HeuristicScorer(), gravity=1)
+    while game.pieces < pieces and not game.over:
+        game.step(ai.next_action(game))
+    return game
+
+def random_model(seed=0, hidden=(128, 64)):
+    """An untrained MLP with the shipped layer sizes; timing does not depend on the weights."""
+    rng = np.random.default_rng(seed)
+    n = len(t.frame_columns())
+    sizes = [n, *hidden, n]
+    weights = [rng.standard_normal((a, b)) * 0.1 for a, b in zip(sizes, sizes[1:])]
+    biases = [np.zeros(b) for b in sizes[1:]]
+    return MLPInference(weights, biases, "relu", np.zeros(n), np.ones(n), np.zeros(n), np.ones(n))
+
+def time_call(fn, min_time, repeat):
+    """(median, best) seconds per call of fn()."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - start >= min_time / 10:
+            break
+        loops *= 2
+    per = (time.perf_counter() - start) / loops
+    loops = max(1, int(min_time / max(per, 1e-9)))
+    samples = []
+    gc_was = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            samples.append((time.perf_counter() - start) / loops)
+    finally:
+        if gc_was:
+            gc.enable()
+    return statistics.median(samples), min(samples)
+
+# -------- Micro benchmarks --------
+
+def micro_benchmarks(tmp):
+    game = midgame()
+    board, piece = game.board, game.current
+    kind = piece.kind
+    resting = max(enumerate_placements(board, piece), key=lambda p: p.pose[0]).pose
+    near_full = board.copy()
+    r = board.n_rows - 1
+    near_full.rows[r] = near_full.full
+    near_full.rescan()
+    empty = t.Board()
+
+    def merge():
+        b = board.copy()
+        b.merge(kind, resting[2], resting[0], resting[1])
+
+    def clear_lines():
+        b = near_full.copy()
+        t.clear_lines(b)
+
+    def rotate():
+        p = t.Piece(kind)
+        p.r, p.c, p.rot = piece.r, piece.c, piece.rot
+        t.try_rotate(board, p, +1)
+
+    def log_frame(logger):
+        # one endless piece would overflow the int16 frame column
+        logger.frame = 0
+        logger._log(piece, board, 0, 0)
+
+    def kick():
+        # an I piece against the right wall only rotates through a kick
+        p = t.Piece("I")
+        p.rot, p.c, p.r = 1, board.n_cols - 2, 2
+        t.try_rotate(empty, p, +1)
+
+    csv_logger = t.FrameLogger(filename=os.path.join(tmp, "bench.csv"))
+    bin_logger = BinaryFrameLogger(filename=os.path.join(tmp, "bench.tfl"))
+    model = random_model()
+    frames = candidate_frames(kind, [p.pose for p in enumerate_placements(board, piece)], board.heights)
+    one = frames[:1]
+    batch = np.repeat(frames, -(-64 // len(frames)), axis=0)[:64]
+    placements = enumerate_placements(board, piece)
+
+    yield "engine.can_place", lambda: t.can_place(board, piece, r_off=1)
+    yield "engine.try_rotate", rotate
+    yield "engine.try_rotate_kick", kick
+    yield "engine.merge", merge
+    yield "engine.clear_lines", clear_lines
+    yield "engine.column_heights", lambda: t.column_heights(board)
+    yield "engine.board_copy", board.copy
+    yield "log.csv_frame", lambda: log_frame(csv_logger)
+    yield "log.tfl_frame", lambda: log_frame(bin_logger)
+    yield "inference.single", lambda: model.predict(one)
+    yield "inference.batch64", lambda: model.predict(batch)
+    yield "ai.enumerate_placements", lambda: enumerate_placements(board, piece)
+    yield "ai.enumerate_placements_gravity", lambda: enumerate_placements(board, piece, gravity=2)
+    yield "ai.outcome_features", lambda: outcome_features(board, kind, placements)
+    csv_logger.save_csv()
+    bin_logger.save_csv()
+
+# -------- Macro benchmarks --------
+
+def play(policy, seed, max_pieces):
+    game = t.Game(next_src=t.NextSource(seed))
+    if policy == "random":
+        rng = np.random.default_rng(seed)
+        actions = rng.integers(0, t.HARD_DROP + 1, size=1 << 16).tolist()
+        next_action = lambda g: actions[g.ticks % len(actions)]
+    else:
+        next_action = PlacementAI(HeuristicScorer(), gravity=1).next_action
+    start = time.perf_counter()
+    while not game.over and game.pieces < max_pieces:
+        game.step(next_action(game))
+    seconds = time.perf_counter() - start
+    return {"steps": game.ticks, "pieces": game.pieces, "lines": game.lines, "seconds": seconds,
+            "steps_per_sec": game.ticks / seconds, "pieces_per_sec": game.pieces / seconds}
+
+def scripted(seed, max_steps):
+    """
+    A seeded game that drops each piece at a random rotation and column,
+    through the new_board/can_place/try_rotate/merge/clear_lines/
+    column_heights wrappers only, logging heights every frame like the
+    FrameLogger. It runs unchanged against the list-of-lists engine, so its
+    steps/s compare engines end to end with no Game or AI cost.
+    """
+    rng = random.Random(seed)
+    board = t.new_board()
+    steps = pieces = lines = 0
+    start = time.perf_counter()
+    while steps < max_steps:
+        p = t.Piece(t.ORDER[rng.randrange(7)])
+        if not t.can_place(board, p):
+            board = t.new_board()
+            continue
+        rot, col = rng.randrange(4), rng.randrange(10)
+        while True:
+            steps += 1
+            t.column_heights(board)
+            t.piece_leftmost_col(p)
+            if p.rot != rot:
+                t.try_rotate(board, p, +1)
+            elif p.c < col and t.can_place(board, p, c_off=+1):
+                p.c += 1
+            elif p.c > col and t.can_place(board, p, c_off=-1):
+                p.c -= 1
+            if t.can_place(board, p, r_off=+1):
+                p.r += 1
+                continue
+            t.column_heights(board)
+            t.merge(board, p, val=1)
+            board, cleared = t.clear_lines(board)
+            pieces += 1
+            lines += cleared
+            break
+    return steps, pieces, lines, time.perf_counter() - start
+
+def macro_benchmarks(quick):
+    def run_scripted():
+        steps, n, lines, seconds = scripted(0, 20000 if quick else 200000)
+        return {"steps": steps, "pieces": n, "lines": lines, "seconds": round(seconds, 4),
+                "steps_per_sec": round(steps / seconds, 1), "pieces_per_sec": round(n / seconds, 2)}
+    yield "game.scripted", run_scripted
+    games = 2 if quick else 5
+    pieces = 100 if quick else 300
+    for policy in ("random", "heuristic"):
+        def run(policy=policy):
+            runs = [play(policy, seed, pieces) for seed in range(games)]
+            steps = sum(r["steps"] for r in runs)
+            n = sum(r["pieces"] for r in runs)
+            seconds = sum(r["seconds"] for r in runs)
+            return {"games": games, "steps": steps, "pieces": n, "seconds": round(seconds, 4),
+                    "steps_per_sec": round(steps / seconds, 1), "pieces_per_sec": round(n / seconds, 2)}
+        yield f"game.{policy}", run
+
+def run(quick=False, name_filter=None, min_time=None, repeat=None):
+    min_time = min_time or (0.05 if quick else 0.2)
+    repeat = repeat or (3 if quick else 7)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, fn in micro_benchmarks(tmp):
+            if name_filter and name_filter not in name:
+                continue
+            median, best = time_call(fn, min_time, repeat)
+            results[name] = {"ns_per_call": round(median * 1e9, 1), "best_ns": round(best * 1e9, 1)}
+            print(f"{name:36s} {median * 1e6:10.2f} us", file=sys.stderr)
+    for name, fn in macro_benchmarks(quick):
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = fn()
+        print(f"{name:36s} {results[name]['steps_per_sec']:10.0f} steps/s "
+              f"{results[name]['pieces_per_sec']:8.1f} pieces/s", file=sys.stderr)
+    return {
+        "time": time.strftime("%Y%m%d-%H%M%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "quick": quick,
+        "results": results,
+    }
+
+def cost(result):
+    """Time per unit of work, lower is better; micro benchmarks use the least noisy best run."""
+    if "best_ns" in result:
+        return result["best_ns"]
+    return 1 / result["steps_per_sec"]
+
+def compare(current, baseline, threshold):
+    """Names of the benchmarks more than threshold (a fraction) slower than baseline."""
+    slower = []
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        ratio = cost(result) / cost(old)
+        mark = "  SLOWER" if ratio > 1 + threshold else ""
+        print(f"{name:36s} x{ratio:5.2f}{mark}", file=sys.stderr)
+        if mark:
+            slower.append(name)
+    return slower
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description="Engine, logging, inference and AI benchmarks.")
+    parser.add_argument("--quick", action="store_true", help="shorter timings and games")
+    parser.add_argument("--filter", default=None, help="only benchmarks whose name contains this")
+    parser.add_argument("--out", default=None, help="write the JSON here instead of stdout")
+    parser.add_argument("--compare", default=None, help="previous JSON result to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="slowdown that counts as a regression")
+    args = parser.parse_args(argv)
+
+    report = run(args.quick, args.filter)
+    text = json.dumps(report, indent=1)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(report, json.load(f), args.threshold)
+        return 1 if slower else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
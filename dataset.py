@@ -0,0 +1,157 @@
+"""
+Training pairs (frame t -> frame t+1) built from frame logs, with an on-disk cache.
+
+Each source file (.csv or .tfl) is streamed in chunks and compiled once into
+<cache>/files/<sha1>.npy: an int16 (k, 2, F) array of (X, y) pairs. Pairs
+never cross a file (game) or a piece_seq boundary. The full dataset is a
+bundle of X/y .npy files named after a hash of every source digest, opened
+memory-mapped; a rerun with no new files reads nothing but the digest index.
+Bundles for other sets of sources are deleted once the current one exists.
+"""
+import hashlib, json, os, re
+
+import numpy as np
+
+from tetris_ai import COLS, frame_columns
+from framelog import iter_frames
+
+CACHE_VERSION = 1
+FEATURES = frame_columns(COLS)
+SOURCE_EXTS = (".csv", ".tfl")
+
+def list_sources(folder):
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.endswith(SOURCE_EXTS)
+    )
+
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+class DigestIndex:
+    """path -> sha1, reused while a file's size and mtime are unchanged."""
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+        self.dirty = False
+
+    def digest(self, source):
+        st = os.stat(source)
+        key = os.path.abspath(source)
+        entry = self.entries.get(key)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        digest = file_digest(source)
+        self.entries[key] = [st.st_size, st.st_mtime_ns, digest]
+        self.dirty = True
+        return digest
+
+    def save(self):
+        if self.dirty:
+            with open(self.path, "w") as f:
+                json.dump(self.entries, f)
+            self.dirty = False
+
+def compile_pairs(path, chunk_frames=65536):
+    """(k, 2, F) int16 pairs of consecutive frames of the same piece in one file."""
+    parts = []
+    prev = None  # last frame of the previous chunk, so pairs can span chunks
+    for records in iter_frames(path, chunk_frames):
+        frames = np.empty((len(records), len(FEATURES)), dtype=np.int16)
+        for i, name in enumerate(FEATURES):
+            frames[:, i] = records[name]
+        if prev is not None:
+            frames = np.concatenate([prev, frames])
+        seq = frames[:, 0]
+        same = seq[1:] == seq[:-1]
+        parts.append(np.stack([frames[:-1][same], frames[1:][same]], axis=1))
+        prev = frames[-1:]
+    if not parts:
+        return np.empty((0, 2, len(FEATURES)), dtype=np.int16)
+    return np.concatenate(parts)
+
+def prune_cache(cache_dir, pattern, keep):
+    """Delete the files in cache_dir whose whole name matches pattern, except those named in keep."""
+    removed = []
+    for name in os.listdir(cache_dir):
+        if name not in keep and re.fullmatch(pattern, name):
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:  # already gone, or still mapped by another process on Windows
+                continue
+            removed.append(name)
+    return removed
+
+def cached_sources(folder="./data", cache_dir=None):
+    """
+    Yield (source, digest, cached pairs path, parsed) for every frame log in
+    folder, compiling the pairs of files whose content is not cached yet.
+    """
+    cache_dir = cache_dir or os.path.join(folder, ".cache")
+    files_dir = os.path.join(cache_dir, "files")
+    os.makedirs(files_dir, exist_ok=True)
+    index = DigestIndex(os.path.join(cache_dir, "digests.json"))
+    try:
+        for source in list_sources(folder):
+            digest = index.digest(source)
+            cached = os.path.join(files_dir, digest + ".npy")
+            parsed = not os.path.exists(cached)
+            if parsed:
+                tmp = cached + ".tmp.npy"
+                np.save(tmp, compile_pairs(source))
+                os.replace(tmp, cached)
+            yield source, digest, cached, parsed
+    finally:
+        index.save()
+
+def build_dataset(folder="./data", cache_dir=None, verbose=True):
+    """
+    Return (X, y) as read-only int16 memmaps of shape (n, len(FEATURES)).
+    Only files whose content is not in the cache yet are parsed.
+    """
+    cache_dir = cache_dir or os.path.join(folder, ".cache")
+    files_dir = os.path.join(cache_dir, "files")
+
+    digests = []
+    parsed = 0
+    for _, digest, _, was_parsed in cached_sources(folder, cache_dir):
+        digests.append(digest)
+        parsed += was_parsed
+
+    key = hashlib.sha1(
+        json.dumps([CACHE_VERSION, FEATURES, sorted(digests)]).encode()
+    ).hexdigest()[:16]
+    x_path = os.path.join(cache_dir, f"bundle-{key}-X.npy")
+    y_path = os.path.join(cache_dir, f"bundle-{key}-y.npy")
+    if not (os.path.exists(x_path) and os.path.exists(y_path)):
+        _write_bundle(files_dir, sorted(set(digests)), x_path, y_path)
+    prune_cache(cache_dir, r"bundle-[0-9a-f]{16}-[Xy]\.npy", {os.path.basename(x_path), os.path.basename(y_path)})
+
+    X = np.load(x_path, mmap_mode="r")
+    y = np.load(y_path, mmap_mode="r")
+    if verbose:
+        print(f"{len(digests)} files ({parsed} parsed, {len(digests) - len(set(digests))} duplicates skipped), {len(X)} pairs")
+    return X, y
+
+def _write_bundle(files_dir, digests, x_path, y_path):
+    pairs = [np.load(os.path.join(files_dir, d + ".npy"), mmap_mode="r") for d in digests]
+    total = sum(len(p) for p in pairs)
+    shape = (total, len(FEATURES))
+    X = np.lib.format.open_memmap(x_path + ".tmp.npy", mode="w+", dtype=np.int16, shape=shape)
+    y = np.lib.format.open_memmap(y_path + ".tmp.npy", mode="w+", dtype=np.int16, shape=shape)
+    at = 0
+    for p in pairs:
+        X[at:at + len(p)] = p[:, 0]
+        y[at:at + len(p)] = p[:, 1]
+        at += len(p)
+    X.flush(); y.flush()
+    del X, y
+    os.replace(x_path + ".tmp.npy", x_path)
+    os.replace(y_path + ".tmp.npy", y_path)
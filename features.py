@@ -0,0 +1,178 @@
+"""
+Engineered board features, computed with array operations over many boards.
+
+BOARD_FEATURES are aggregate height, bumpiness, max well depth, holes and
+row transitions. Frame logs only carry column heights, so frame_features
+rebuilds the board each piece was played on by replaying the lock frames
+(one Board merge per piece, resyncing from the logged heights if the log
+and the replay ever disagree), then evaluates all boards in one batch.
+Each frame gets the features of its board plus, on lock frames, the change
+each feature undergoes across the lock (d_*).
+
+build_features caches the per-file features under <cache>/features, keyed
+by file digest and FEATURE_SET_VERSION, and returns them memory-mapped and
+row-aligned with dataset.build_dataset's X. Feature matrices for other sets
+of files, and per-file features of other versions, are deleted. The AI
+computes the same features for its candidate boards (placement, planner).
+"""
+import hashlib, json, os
+
+import numpy as np
+
+from tetris_ai import ROWS, COLS, ORDER, Board
+from framelog import load_frames
+from dataset import CACHE_VERSION, cached_sources, prune_cache
+
+FEATURE_SET_VERSION = 1
+BOARD_FEATURES = ["aggregate_height", "bumpiness", "max_well_depth", "holes", "row_transitions"]
+FEATURE_NAMES = BOARD_FEATURES + [f"d_{name}" for name in BOARD_FEATURES]
+
+def unpack_rows(rows, n_cols=COLS):
+    """(..., n_rows) Board row masks -> (..., n_rows, n_cols) bool cells."""
+    rows = np.asarray(rows, dtype=np.int64)
+    return ((rows[..., None] >> np.arange(n_cols)) & 1).astype(bool)
+
+def board_features(cells):
+    """(n, n_rows, n_cols) bool boards, row 0 at the top -> (n, 5) float32 BOARD_FEATURES."""
+    cells = np.asarray(cells, dtype=bool)
+    n, n_rows, _ = cells.shape
+    filled = cells.any(axis=1)
+    heights = np.where(filled, n_rows - cells.argmax(axis=1), 0)
+
+    wall = np.full((n, 1), n_rows)
+    padded = np.concatenate([wall, heights, wall], axis=1)
+    wells = np.minimum(padded[:, :-2], padded[:, 2:]) - heights
+
+    # empty cells with a filled cell somewhere above them
+    covered = np.maximum.accumulate(cells, axis=1)
+    holes = (covered & ~cells).sum(axis=(1, 2))
+
+    # filled/empty changes along each row, walls counting as filled;
+    # the empty rows above the stack are left out
+    walled = np.pad(cells, ((0, 0), (0, 0), (1, 1)), constant_values=True)
+    per_row = (walled[:, :, 1:] != walled[:, :, :-1]).sum(axis=2)
+    in_stack = np.maximum.accumulate(cells.any(axis=2), axis=1)
+
+    out = np.empty((n, len(BOARD_FEATURES)), dtype=np.float32)
+    out[:, 0] = heights.sum(axis=1)
+    out[:, 1] = np.abs(np.diff(heights, axis=1)).sum(axis=1)
+    out[:, 2] = np.maximum(wells, 0).max(axis=1)
+    out[:, 3] = holes
+    out[:, 4] = (per_row * in_stack).sum(axis=1)
+    return out
+
+def boards_features(boards):
+    """BOARD_FEATURES of a list of tetris_ai.Board."""
+    if not boards:
+        return np.empty((0, len(BOARD_FEATURES)), dtype=np.float32)
+    return board_features(unpack_rows([b.rows for b in boards], boards[0].n_cols))
+
+def candidate_features(board, n):
+    """
+    Feature rows for n candidate frames logged on board: its BOARD_FEATURES
+    and zero deltas, since a resting piece has not locked yet.
+    """
+    out = np.zeros((n, len(FEATURE_NAMES)), dtype=np.float32)
+    out[:, :len(BOARD_FEATURES)] = boards_features([board])
+    return out
+
+def _board_from_heights(heights, n_rows, n_cols):
+    """Hole-free board with these column heights."""
+    board = Board(n_rows, n_cols)
+    for c, h in enumerate(heights):
+        for r in range(n_rows - h, n_rows):
+            board.rows[r] |= 1 << c
+    board.rescan()
+    return board
+
+def lock_boards(records, n_rows=ROWS):
+    """
+    Replay the lock frames of a frame log. Returns (before, after): the row
+    masks of the board just before and just after each lock, shape (locks, n_rows).
+    """
+    cols = sum(1 for name in records.dtype.names if name.startswith("col_h_"))
+    locks = records[records["locked"] == 1]
+    heights = np.stack([locks[f"col_h_{c}"] for c in range(cols)], axis=1).astype(int).tolist()
+    before = np.zeros((len(locks), n_rows), dtype=np.int64)
+    after = np.zeros((len(locks), n_rows), dtype=np.int64)
+    board = Board(n_rows, cols)
+    for i, (pid, r, c, rot) in enumerate(zip(locks["piece_id"].tolist(), locks["row"].tolist(),
+                                             locks["col"].tolist(), locks["rotation"].tolist())):
+        if board.heights != heights[i]:
+            # a new game in the same file, or a log the replay cannot follow
+            board = _board_from_heights(heights[i], n_rows, cols)
+        before[i] = board.rows
+        kind = ORDER[pid - 1]
+        if board.fits(kind, rot, r, c):
+            board.merge(kind, rot, r, c)
+            board.clear_lines()
+        after[i] = board.rows
+    return before, after
+
+def frame_features(records, n_rows=ROWS):
+    """(n, len(FEATURE_NAMES)) float32 features of every frame of a frame log."""
+    cols = sum(1 for name in records.dtype.names if name.startswith("col_h_"))
+    before, after = lock_boards(records, n_rows)
+    is_lock = records["locked"] == 1
+    # piece k is played on the board of lock k; frames after the last lock on the final board
+    last = after[-1:] if len(after) else np.zeros((1, n_rows), dtype=np.int64)
+    states = board_features(unpack_rows(np.concatenate([before, last]), cols))
+    out = np.zeros((len(records), len(FEATURE_NAMES)), dtype=np.float32)
+    out[:, :len(BOARD_FEATURES)] = states[np.cumsum(is_lock) - is_lock]
+    if len(after):
+        out[is_lock, len(BOARD_FEATURES):] = board_features(unpack_rows(after, cols)) - states[:-1]
+    return out
+
+def compile_features(path, n_rows=ROWS):
+    """Features of the X frame of every pair dataset.compile_pairs makes from path."""
+    records = load_frames(path)
+    features = frame_features(records, n_rows)
+    seq = records["piece_seq"]
+    same = seq[1:] == seq[:-1]
+    return features[:-1][same]
+
+def file_features(source, digest, cache_dir):
+    """(compile_features(source), True if it was not cached yet), cached by content digest."""
+    cached = os.path.join(cache_dir, "features", f"v{FEATURE_SET_VERSION}-{digest}.npy")
+    if os.path.exists(cached):
+        return np.load(cached, mmap_mode="r"), False
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    np.save(cached + ".tmp.npy", compile_features(source))
+    os.replace(cached + ".tmp.npy", cached)
+    return np.load(cached, mmap_mode="r"), True
+
+def build_features(folder="./data", cache_dir=None, verbose=True):
+    """(n, len(FEATURE_NAMES)) float32 memmap, row i describing build_dataset(folder)'s X[i]."""
+    cache_dir = cache_dir or os.path.join(folder, ".cache")
+    feature_dir = os.path.join(cache_dir, "features")
+
+    sources = {}
+    parsed = 0
+    for source, digest, _, _ in cached_sources(folder, cache_dir):
+        sources.setdefault(digest, source)
+        parsed += file_features(source, digest, cache_dir)[1]
+
+    digests = sorted(sources)
+    key = hashlib.sha1(
+        json.dumps([CACHE_VERSION, FEATURE_SET_VERSION, FEATURE_NAMES, digests]).encode()
+    ).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"features-{key}.npy")
+    if not os.path.exists(path):
+        parts = [np.load(os.path.join(feature_dir, f"v{FEATURE_SET_VERSION}-{d}.npy"), mmap_mode="r")
+                 for d in digests]
+        out = np.lib.format.open_memmap(path + ".tmp.npy", mode="w+", dtype=np.float32,
+                                        shape=(sum(len(p) for p in parts), len(FEATURE_NAMES)))
+        at = 0
+        for p in parts:
+            out[at:at + len(p)] = p
+            at += len(p)
+        out.flush()
+        del out
+        os.replace(path + ".tmp.npy", path)
+    prune_cache(cache_dir, r"features-[0-9a-f]{16}\.npy", {os.path.basename(path)})
+    if os.path.isdir(feature_dir):
+        prune_cache(feature_dir, rf"v(?!{FEATURE_SET_VERSION}-)\d+-[0-9a-f]{{40}}\.npy", set())
+    features = np.load(path, mmap_mode="r")
+    if verbose:
+        print(f"{len(digests)} files ({parsed} featurized), {len(features)} feature rows")
+    return features
@@ -0,0 +1,197 @@
+"""
+Binary frame logs (.tfl) and CSV <-> binary conversion.
+
+A .tfl file is:
+    b"TFL\0" magic, uint32 header length, UTF-8 JSON header, fixed-width records.
+The header holds the schema version, board ROWS/COLS, the column names (same
+as the FrameLogger CSV) and one NumPy dtype string per column. Records are
+little-endian int8/int16 (int32 for piece_seq), so the record count is just
+(file size - data offset) // record size and a torn last record is ignored.
+Older archive CSVs start with a float "time" column; it is kept as float64.
+
+Usage:
+    python framelog.py to-bin tetris_frames_numeric_*.csv
+    python framelog.py to-csv tetris_frames_numeric_*.tfl
+"""
+import csv, itertools, json, os, struct, sys, time, warnings
+
+import numpy as np
+
+from tetris_ai import ROWS, COLS, FrameLogger, frame_columns
+
+MAGIC = b"TFL\0"
+SCHEMA_VERSION = 1
+
+def record_dtype(columns, rows=ROWS):
+    """Packed record dtype for a frame log with these columns."""
+    small = "<i1" if rows < 128 else "<i2"
+    fields = []
+    for name in columns:
+        if name == "time":
+            fields.append((name, "<f8"))
+        elif name == "piece_seq":
+            fields.append((name, "<i4"))
+        elif name == "frame":
+            fields.append((name, "<i2"))
+        else:
+            fields.append((name, small))
+    return np.dtype(fields)
+
+def _header_bytes(columns, rows, cols, dtype):
+    header = {
+        "version": SCHEMA_VERSION,
+        "rows": rows,
+        "cols": cols,
+        "columns": list(columns),
+        "dtypes": [dtype.fields[name][0].str for name in columns],
+    }
+    data = json.dumps(header).encode("utf-8")
+    return MAGIC + struct.pack("<I", len(data)) + data
+
+class BinaryFrameLogger(FrameLogger):
+    """
+    FrameLogger that appends fixed-width records to a preallocated buffer and
+    writes them out in chunks. The buffer is also flushed (and fsynced) every
+    checkpoint_secs, so a crash loses at most that much play.
+    """
+    ext = ".tfl"
+
+    def __init__(self, prefix="tetris_frames_numeric", cols=COLS, rows=ROWS,
+                 chunk_frames=4096, checkpoint_secs=5.0, filename=None):
+        self.chunk_frames = chunk_frames
+        self.checkpoint_secs = checkpoint_secs
+        super().__init__(prefix, cols=cols, rows=rows, filename=filename)
+
+    def _open(self):
+        self.dtype = record_dtype(self.columns, self.rows)
+        self.buf = np.zeros(self.chunk_frames, dtype=self.dtype)
+        self.n = 0
+        self.file = open(self.filename, "wb")
+        self.file.write(_header_bytes(self.columns, self.rows, self.cols, self.dtype))
+        self.checkpoint()
+
+    def _write(self, row):
+        self.buf[self.n] = tuple(row)
+        self.n += 1
+        if self.n == self.chunk_frames or time.monotonic() >= self.next_checkpoint:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Write buffered records and force them to disk."""
+        if self.n:
+            self.file.write(self.buf[:self.n].tobytes())
+            self.n = 0
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.next_checkpoint = time.monotonic() + self.checkpoint_secs
+
+    def save_csv(self):
+        """Flush remaining records and close the file (the name is FrameLogger's API)."""
+        if not self.file.closed:
+            self.checkpoint()
+            self.file.close()
+        return self.filename
+
+# -------- Reading --------
+
+def read_header(f):
+    if f.read(4) != MAGIC:
+        raise ValueError(f"{getattr(f, 'name', f)}: not a binary frame log")
+    (size,) = struct.unpack("<I", f.read(4))
+    header = json.loads(f.read(size).decode("utf-8"))
+    if header["version"] != SCHEMA_VERSION:
+        raise ValueError(f"{f.name}: unsupported frame log version {header['version']}")
+    return header
+
+def read_tfl(path):
+    """Return (header, records) where records is a structured array, one field per column."""
+    with open(path, "rb") as f:
+        header = read_header(f)
+        dtype = np.dtype(list(zip(header["columns"], header["dtypes"])))
+        count = (os.fstat(f.fileno()).st_size - f.tell()) // dtype.itemsize
+        records = np.fromfile(f, dtype=dtype, count=count)
+    return header, records
+
+def read_csv(path, rows=ROWS):
+    """Return (columns, records) for a FrameLogger CSV, records typed as in a .tfl."""
+    with open(path, "r", newline="") as f:
+        columns = f.readline().strip().split(",")
+        _check_columns(columns, path)
+        dtype = record_dtype(columns, rows)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # header-only file
+            records = np.loadtxt(f, delimiter=",", dtype=dtype, ndmin=1)
+    return columns, records
+
+def iter_frames(path, chunk_frames=65536, rows=ROWS):
+    """Yield a .csv or .tfl file as structured arrays of at most chunk_frames records."""
+    if path.endswith(FrameLogger.ext):
+        with open(path, "r", newline="") as f:
+            columns = f.readline().strip().split(",")
+            _check_columns(columns, path)
+            dtype = record_dtype(columns, rows)
+            while True:
+                lines = list(itertools.islice(f, chunk_frames))
+                if not lines:
+                    return
+                yield np.loadtxt(lines, delimiter=",", dtype=dtype, ndmin=1)
+    else:
+        with open(path, "rb") as f:
+            header = read_header(f)
+            offset = f.tell()
+        dtype = np.dtype(list(zip(header["columns"], header["dtypes"])))
+        count = (os.path.getsize(path) - offset) // dtype.itemsize
+        if count == 0:
+            return
+        records = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+        for start in range(0, count, chunk_frames):
+            yield np.array(records[start:start + chunk_frames])
+
+def load_frames(path):
+    """Structured array of frames from a .csv or .tfl; records[name] is one column."""
+    if path.endswith(FrameLogger.ext):
+        return read_csv(path)[1]
+    return read_tfl(path)[1]
+
+def _check_columns(columns, path):
+    body = columns[1:] if columns[:1] == ["time"] else columns
+    cols = sum(1 for name in body if name.startswith("col_h_"))
+    if body != frame_columns(cols):
+        raise ValueError(f"{path}: columns do not match the FrameLogger layout")
+    return cols
+
+# -------- Conversion --------
+
+def write_tfl(path, records, rows=ROWS):
+    """Write a structured frame array (as read_csv/read_tfl return) as a .tfl file."""
+    columns = list(records.dtype.names)
+    with open(path, "wb") as f:
+        f.write(_header_bytes(columns, rows, _check_columns(columns, path), records.dtype))
+        f.write(records.tobytes())
+    return path
+
+def csv_to_tfl(path, out=None, rows=ROWS):
+    _, records = read_csv(path, rows)
+    return write_tfl(out or os.path.splitext(path)[0] + BinaryFrameLogger.ext, records, rows)
+
+def tfl_to_csv(path, out=None):
+    header, records = read_tfl(path)
+    out = out or os.path.splitext(path)[0] + FrameLogger.ext
+    with open(out, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header["columns"])
+        writer.writerows(records.tolist())
+    return out
+
+def main(argv):
+    if len(argv) < 2 or argv[0] not in ("to-bin", "to-csv"):
+        print(__doc__.strip().split("Usage:")[1])
+        return 2
+    convert = csv_to_tfl if argv[0] == "to-bin" else tfl_to_csv
+    for path in argv[1:]:
+        out = convert(path)
+        print(f"{path} -> {out} ({os.path.getsize(path)} -> {os.path.getsize(out)} bytes)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
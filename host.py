@@ -0,0 +1,471 @@
+"""
+Multi-session game host: many headless AI games in one asyncio process.
+
+Every session is a solo Game or a versus.Match under the rules of
+tetris_ai.py, each player driven by a PlacementAI. All sessions share one
+model, loaded once, and advance together on a fixed tick (scheduler.FixedStep).
+Each tick the host collects the candidate placements of every player that
+needs a decision, scores them with a single batched model.predict call,
+hands each AI its best placement, then steps every session. A finished
+session restarts on a new seed after a short pause.
+
+The placement searches run on a process pool (--workers), split into one
+job per worker, and the event loop awaits them, so streams and /health
+keep being served during a tick. A tick that takes longer than its budget
+(1 / tick rate) is counted, and /health reports "behind" while the host
+cannot keep up; fewer sessions or a lower tick rate fix that.
+
+Spectators subscribe to a session and receive its state as JSON messages:
+one "full" message, then a "delta" per tick that changed something.
+Per player, a delta carries only what changed among:
+    rows     [[r, mask], ...]  board rows (row 0 at the top, bit c = column c)
+    piece    {kind, r, c, rot, cells: [[r, c], ...]}  the falling piece
+    heights  column heights
+    score, lines, pieces, hold, next, over
+Unwatched sessions cost nothing to stream. A spectator too slow to keep up
+has its backlog dropped and gets a fresh "full" message instead.
+
+Streams are served as server-sent events (GET /sessions/<id>/stream, for
+the React frontend) and as JSON lines over TCP (send "watch <id>\\n", for
+terminal clients such as `python host.py watch`). GET /sessions lists the
+sessions, GET /health reports tick timing and batch sizes.
+
+Usage:
+    python host.py serve --sessions 20 --versus 4 --port 4100 --tcp-port 4101
+    python host.py watch 3 --port 4101
+"""
+import argparse, asyncio, json, os, random, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from tetris_ai import NOOP, Game, NextSource, Piece, PIECES, load_model
+from httputil import DEFAULT_ORIGINS, cors_headers, encode
+from placement import PlacementAI, ModelScorer, candidates_for
+from scheduler import FixedStep
+from versus import Match
+
+QUEUE_SIZE = 64
+RESTART_TICKS = 20
+
+def player_state(game):
+    cur = game.current
+    return {
+        "rows": game.board.rows[:],
+        "piece": {"kind": cur.kind, "r": cur.r, "c": cur.c, "rot": cur.rot,
+                  "cells": [[cur.r + dr, cur.c + dc] for dr, dc in PIECES[cur.kind][cur.rot]]},
+        "heights": game.board.heights[:],
+        "score": game.score, "lines": game.lines, "pieces": game.pieces,
+        "hold": game.hold_kind, "next": game.next_src.peek_kinds(5), "over": game.over,
+    }
+
+def player_delta(old, new):
+    delta = {}
+    changed = [[r, m] for r, (a, m) in enumerate(zip(old["rows"], new["rows"])) if a != m]
+    if changed:
+        delta["rows"] = changed
+    for key in ("piece", "heights", "score", "lines", "pieces", "hold", "next", "over"):
+        if old[key] != new[key]:
+            delta[key] = new[key]
+    return delta
+
+# -------- Sessions --------
+
+class Session:
+    def __init__(self, sid, kind, scorer, seed, gravity_every, max_pieces):
+        self.id = sid
+        self.kind = kind
+        self.scorer = scorer
+        self.gravity_every = gravity_every
+        self.max_pieces = max_pieces
+        self.subscribers = set()
+        self.start(seed)
+
+    def start(self, seed):
+        self.seed = seed
+        self.match = None
+        if self.kind == "versus":
+            self.match = Match(seed, max_pieces=self.max_pieces, gravity_every=self.gravity_every)
+            self.games = self.match.games
+        else:
+            self.games = [Game(next_src=NextSource(seed), gravity_every=self.gravity_every)]
+        # the AI moves on every tick, many times per gravity step
+        self.ais = [PlacementAI(self.scorer) for _ in self.games]
+        self.ticks = 0
+        self.ended = None
+        self.seq = 0
+        self.shown = None
+
+    @property
+    def over(self):
+        if self.match is not None:
+            return self.match.over
+        return self.games[0].over or self.games[0].pieces >= self.max_pieces
+
+    def step(self):
+        actions = [NOOP if g.over else ai.next_action(g) for ai, g in zip(self.ais, self.games)]
+        if self.match is not None:
+            self.match.step(actions)
+        else:
+            self.games[0].step(actions[0])
+        self.ticks += 1
+
+    def summary(self):
+        out = {"id": self.id, "kind": self.kind, "seed": self.seed, "ticks": self.ticks,
+               "scores": [g.score for g in self.games], "over": self.over,
+               "watchers": len(self.subscribers)}
+        if self.match is not None and self.match.over:
+            out["winner"] = self.match.winner
+        return out
+
+    # ---- streaming ----
+
+    def _message(self, kind, players):
+        msg = {"type": kind, "session": self.id, "kind": self.kind, "seq": self.seq, "players": players}
+        if self.match is not None and self.match.over:
+            msg["winner"] = self.match.winner
+        return encode(msg)
+
+    def publish(self):
+        """Send this tick's changes to every subscriber."""
+        if not self.subscribers:
+            self.shown = None
+            return
+        states = [player_state(g) for g in self.games]
+        self.seq += 1
+        full = None
+        delta = None
+        if self.shown is not None:
+            changes = [player_delta(a, b) for a, b in zip(self.shown, states)]
+            if any(changes):
+                delta = self._message("delta", changes)
+        self.shown = states
+        for sub in self.subscribers:
+            if sub.resync:
+                full = full or self._message("full", states)
+                sub.resync = False
+                sub.push(full)
+            elif delta is not None:
+                sub.push(delta)
+
+class Subscriber:
+    def __init__(self):
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.resync = True
+
+    def push(self, data):
+        if self.queue.full():
+            # too slow to follow the deltas: drop the backlog, start over from a full state
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.resync = True
+            return
+        self.queue.put_nowait(data)
+
+# -------- Host --------
+
+def _candidates_batch(jobs):
+    """candidates_for over a list of argument tuples, in a pool worker."""
+    return [candidates_for(*args) for args in jobs]
+
+class Host:
+    def __init__(self, model, solo=20, versus=0, tick_rate=10, speed=2, seed=0, max_pieces=1000,
+                 origins=DEFAULT_ORIGINS, workers=None):
+        self.scorer = ModelScorer(model)
+        self.model = model
+        self.tick_rate = tick_rate
+        self.budget = 1 / tick_rate
+        # workers=0 searches on the event loop itself (tests, one-off runs)
+        self.workers = os.cpu_count() if workers is None else workers
+        self.pool = ProcessPoolExecutor(self.workers) if self.workers else None
+        self.gravity_every = max(1, round(tick_rate / speed))
+        self.rng = random.Random(seed)
+        self.origins = set(origins)
+        self.sessions = {}
+        for i in range(solo + versus):
+            kind = "versus" if i >= solo else "solo"
+            self.sessions[i] = Session(i, kind, self.scorer, self.rng.getrandbits(64),
+                                       self.gravity_every, max_pieces)
+        self.clock = None
+        self.stats = {"ticks": 0, "tick_seconds": 0.0, "batches": 0, "decisions": 0, "rows": 0,
+                      "max_tick_ms": 0.0, "last_tick_ms": 0.0, "over_budget": 0}
+
+    async def candidates(self, jobs):
+        """candidates_for(*args) for every job, one pool task per worker."""
+        if self.pool is None:
+            return _candidates_batch(jobs)
+        size = -(-len(jobs) // self.workers)
+        loop = asyncio.get_running_loop()
+        parts = await asyncio.gather(*(loop.run_in_executor(self.pool, _candidates_batch, jobs[i:i + size])
+                                       for i in range(0, len(jobs), size)))
+        return [result for part in parts for result in part]
+
+    async def decide(self):
+        """
+        Plan every player that needs it, scoring all their candidates in one
+        model call. A piece knocked off its path is searched on the pool
+        too, and only scored if its target can no longer be reached.
+        """
+        wanted = []
+        for session in self.sessions.values():
+            if session.ended is not None:
+                continue  # waiting to restart: nobody moves
+            for ai, game in zip(session.ais, session.games):
+                need = not game.over and ai.needs_plan(game)
+                if need:
+                    wanted.append((ai, game, need))
+        if not wanted:
+            return
+        # sessions are stepped only after this returns, so the games hold still meanwhile
+        results = await self.candidates([ai.candidate_args(game) for ai, game, _ in wanted])
+        scored = [(ai, game, result) for (ai, game, need), result in zip(wanted, results)
+                  if need == "plan" or not ai.resume(game, result[0])]
+        if not scored:
+            return
+        pred = self.model.predict(np.concatenate([frames for _, _, (_, frames, _) in scored]))
+        at = 0
+        for ai, game, (placements, frames, outcomes) in scored:
+            scores = self.scorer.combine(frames, outcomes, pred[at:at + len(frames)])
+            at += len(frames)
+            ai.adopt(game, placements[int(np.argmax(scores))])
+        self.stats["batches"] += 1
+        self.stats["decisions"] += len(scored)
+        self.stats["rows"] += at
+
+    async def tick(self):
+        start = time.perf_counter()
+        await self.decide()
+        for session in self.sessions.values():
+            if session.ended is None:
+                session.step()
+                if session.over:
+                    session.ended = session.ticks
+            elif session.ticks - session.ended >= RESTART_TICKS:
+                session.start(self.rng.getrandbits(64))
+                for sub in session.subscribers:
+                    sub.resync = True
+            else:
+                session.ticks += 1
+            session.publish()
+        seconds = time.perf_counter() - start
+        self.stats["ticks"] += 1
+        self.stats["tick_seconds"] += seconds
+        self.stats["last_tick_ms"] = seconds * 1e3
+        self.stats["max_tick_ms"] = max(self.stats["max_tick_ms"], seconds * 1e3)
+        self.stats["over_budget"] += seconds > self.budget
+
+    async def run(self):
+        self.clock = FixedStep(self.tick_rate)
+        try:
+            while True:
+                wait = self.clock.remaining()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                for _ in range(self.clock.due()):
+                    await self.tick()
+                # let the streams go out between ticks, even when running behind
+                await asyncio.sleep(0)
+        finally:
+            self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def late(self):
+        """Seconds the tick schedule is behind the clock (0 when on time)."""
+        return max(0.0, -self.clock.remaining()) if self.clock else 0.0
+
+    def health(self):
+        s = self.stats
+        ticks = max(s["ticks"], 1)
+        # behind: the last tick overran its budget, or ticks are already overdue
+        behind = s["last_tick_ms"] > self.budget * 1e3 or self.late() > self.budget
+        return {
+            "status": "behind" if behind else "ok", "sessions": len(self.sessions),
+            "watchers": sum(len(x.subscribers) for x in self.sessions.values()),
+            "tick_rate": self.tick_rate, "ticks": s["ticks"], "workers": self.workers,
+            "budget_ms": round(self.budget * 1e3, 3), "late_ms": round(self.late() * 1e3, 3),
+            "ticks_over_budget": s["over_budget"],
+            "ticks_dropped": self.clock.dropped if self.clock else 0,
+            "mean_tick_ms": round(s["tick_seconds"] / ticks * 1e3, 3), "max_tick_ms": round(s["max_tick_ms"], 3),
+            "last_tick_ms": round(s["last_tick_ms"], 3),
+            "batches": s["batches"], "decisions_per_batch": round(s["decisions"] / max(s["batches"], 1), 2),
+            "rows_per_batch": round(s["rows"] / max(s["batches"], 1), 1),
+        }
+
+    def subscribe(self, sid):
+        session = self.sessions.get(sid)
+        if session is None:
+            return None, None
+        sub = Subscriber()
+        session.subscribers.add(sub)
+        return session, sub
+
+    # ---- HTTP: session list, health and server-sent events ----
+
+    async def http_connection(self, reader, writer):
+        try:
+            line = await reader.readline()
+            headers = {}
+            while True:
+                h = await reader.readline()
+                if h in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = h.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            try:
+                method, target, _ = line.decode("latin-1").split()
+            except ValueError:
+                return self._respond(writer, 400, {"error": "bad request line"}, headers)
+            path = urlsplit(target).path.rstrip("/")
+            if method != "GET":
+                return self._respond(writer, 405, {"error": "use GET"}, headers)
+            if path == "/health":
+                return self._respond(writer, 200, self.health(), headers)
+            if path == "/sessions":
+                return self._respond(writer, 200, [s.summary() for s in self.sessions.values()], headers)
+            parts = path.split("/")
+            if len(parts) == 4 and parts[1] == "sessions" and parts[3] == "stream" and parts[2].isdigit():
+                session, sub = self.subscribe(int(parts[2]))
+                if session is not None:
+                    return await self._stream_sse(writer, session, sub, headers)
+            return self._respond(writer, 404, {"error": f"no route for {path}"}, headers)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _cors(self, headers):
+        return "".join(f"{name}: {value}\r\n" for name, value in cors_headers(self.origins, headers.get("origin")))
+
+    def _respond(self, writer, status, obj, headers):
+        body = encode(obj)
+        writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n{self._cors(headers)}\r\n".encode("latin-1") + body)
+
+    async def _stream_sse(self, writer, session, sub, headers):
+        writer.write(("HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                      f"Connection: keep-alive\r\n{self._cors(headers)}\r\n").encode("latin-1"))
+        try:
+            while True:
+                data = await sub.queue.get()
+                writer.write(b"data: " + data + b"\n\n")
+                await writer.drain()
+        finally:
+            session.subscribers.discard(sub)
+
+    # ---- TCP: JSON lines ----
+
+    async def tcp_connection(self, reader, writer):
+        session = sub = None
+        try:
+            words = (await reader.readline()).decode("utf-8", "replace").split()
+            if len(words) == 2 and words[0] == "watch" and words[1].isdigit():
+                session, sub = self.subscribe(int(words[1]))
+            if session is None:
+                writer.write(encode({"error": "send: watch <session id>"}) + b"\n")
+                return
+            while True:
+                writer.write(await sub.queue.get() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if session is not None:
+                session.subscribers.discard(sub)
+            writer.close()
+
+async def serve(host, bind, port, tcp_port):
+    servers = [await asyncio.start_server(host.http_connection, bind, port)]
+    if tcp_port:
+        servers.append(await asyncio.start_server(host.tcp_connection, bind, tcp_port))
+    print(f"{len(host.sessions)} sessions at {host.tick_rate:g} ticks/s; http://{bind}:{port}"
+          + (f", tcp {tcp_port}" if tcp_port else ""), flush=True)
+    await host.run()
+
+# -------- Terminal spectator --------
+
+def apply_message(players, msg):
+    """Fold a full or delta message into players (a list of state dicts)."""
+    if msg["type"] == "full":
+        players[:] = msg["players"]
+        return
+    for state, delta in zip(players, msg["players"]):
+        for r, mask in delta.get("rows", ()):
+            state["rows"][r] = mask
+        for key, value in delta.items():
+            if key != "rows":
+                state[key] = value
+
+def watch(stdscr, port, sid, player, host_name="127.0.0.1"):
+    import curses, socket
+    from tetris_ai import Board, Renderer
+    curses.curs_set(0)
+    stdscr.nodelay(True)
+    renderer = Renderer(stdscr)
+    sock = socket.create_connection((host_name, port))
+    sock.sendall(f"watch {sid}\n".encode())
+    stream = sock.makefile("rb")
+    players = []
+    board = Board()
+    for line in stream:
+        msg = json.loads(line)
+        if "error" in msg:
+            return msg["error"]
+        apply_message(players, msg)
+        state = players[min(player, len(players) - 1)]
+        board.rows = state["rows"]
+        p = state["piece"]
+        piece = Piece(p["kind"])
+        piece.r, piece.c, piece.rot = p["r"], p["c"], p["rot"]
+        preview = SimpleNamespace(peek_kinds=lambda k=5, nxt=state["next"]: nxt[:k])
+        renderer.draw(board, piece, state["score"], preview, state["hold"])
+        if stdscr.getch() in (ord("q"), 27):
+            return None
+    return "stream closed"
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description="Host many AI games in one process and stream them.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("serve", help="run the sessions and serve their streams")
+    run.add_argument("--sessions", type=int, default=20, help="solo games")
+    run.add_argument("--versus", type=int, default=0, help="1v1 matches")
+    run.add_argument("--tick-rate", type=float, default=10)
+    run.add_argument("--speed", type=float, default=2, help="gravity rows per second")
+    run.add_argument("--max-pieces", type=int, default=1000, help="a session restarts after this many pieces")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--workers", type=int, default=None,
+                     help="processes for the placement search (default: one per core; 0: on the event loop)")
+    run.add_argument("--model", default="tetris_model1.pkl")
+    run.add_argument("--bind", default="0.0.0.0")
+    run.add_argument("--port", type=int, default=4100, help="HTTP: /sessions, /health, server-sent events")
+    run.add_argument("--tcp-port", type=int, default=4101, help="JSON lines; 0 to disable")
+    run.add_argument("--cors-origin", action="append", default=None,
+                     help=f"allowed frontend origin, repeatable, '*' for any (default: {DEFAULT_ORIGINS[0]})")
+    spectate = sub.add_parser("watch", help="watch a session in the terminal")
+    spectate.add_argument("session", type=int)
+    spectate.add_argument("--host", default="127.0.0.1")
+    spectate.add_argument("--port", type=int, default=4101, help="the host's TCP port")
+    spectate.add_argument("--player", type=int, default=0, help="which board of a match")
+    args = parser.parse_args(argv)
+
+    if args.command == "watch":
+        import curses
+        error = curses.wrapper(watch, args.port, args.session, args.player, args.host)
+        if error:
+            print(error)
+        return
+    host = Host(load_model(args.model), args.sessions, args.versus, args.tick_rate, args.speed,
+                args.seed, args.max_pieces, args.cors_origin or DEFAULT_ORIGINS, args.workers)
+    try:
+        asyncio.run(serve(host, args.bind, args.port, args.tcp_port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
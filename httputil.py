@@ -0,0 +1,21 @@
+"""
+HTTP helpers shared by the game host (host.py) and the leaderboard service
+(backend/leaderboard.py): compact JSON bodies and the CORS policy for the
+frontend. Standard library only, like the leaderboard.
+"""
+import json
+
+DEFAULT_ORIGINS = ("http://localhost:5173",)
+
+def encode(obj):
+    """obj as compact UTF-8 JSON."""
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+def cors_headers(origins, origin):
+    """
+    [(name, value), ...] CORS response headers for a request from origin:
+    none unless origin is in origins, or origins holds "*".
+    """
+    if not origin or not ("*" in origins or origin in origins):
+        return []
+    return [("Access-Control-Allow-Origin", origin), ("Vary", "Origin")]
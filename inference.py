@@ -0,0 +1,219 @@
+"""
+NumPy-only forward pass for the trained MLPRegressor, with its scalers bundled.
+
+The artifact (.tmod) holds every layer's weights and biases plus the x/y
+StandardScaler parameters, so predict() takes raw frame rows and returns
+raw predicted frames without sklearn. Its layout follows the .tfl frame logs:
+    b"TMOD" magic, uint32 header length, UTF-8 JSON header, raw arrays.
+The header holds the format version, the frame columns the model reads and
+predicts, any extra input features appended to the frame it reads (see
+features.py), the activation, training metadata and, for every array, its
+dtype, shape and offset. Arrays start on 64-byte boundaries, so load() can
+map them straight from the file. The older .npz artifacts still load.
+
+Usage:
+    python inference.py convert tetris_model1.pkl [--data ./data]
+"""
+import json, struct, sys
+
+import numpy as np
+
+MAGIC = b"TMOD"
+FORMAT_VERSION = 1
+ALIGN = 64
+
+ACTIVATIONS = {
+    "relu": lambda h: np.maximum(h, 0, out=h),
+    "tanh": lambda h: np.tanh(h, out=h),
+    "logistic": lambda h: np.reciprocal(1 + np.exp(-h, out=h), out=h),
+    "identity": lambda h: h,
+}
+
+class SchemaError(ValueError):
+    """The artifact was built for a different frame layout than the caller's."""
+
+class MLPInference:
+    def __init__(self, weights, biases, activation, x_mean, x_scale, y_mean, y_scale,
+                 x_var=None, y_var=None, n_samples_seen=0, columns=None, metadata=None, inputs=()):
+        self.weights = [np.asarray(w, dtype=np.float32) for w in weights]
+        self.biases = [np.asarray(b, dtype=np.float32) for b in biases]
+        self.activation = activation
+        self.x_mean = np.asarray(x_mean, dtype=np.float32)
+        self.x_scale = np.asarray(x_scale, dtype=np.float32)
+        self.y_mean = np.asarray(y_mean, dtype=np.float32)
+        self.y_scale = np.asarray(y_scale, dtype=np.float32)
+        # running statistics, kept so training can resume from the artifact
+        self.x_var = self.x_scale ** 2 if x_var is None else np.asarray(x_var, dtype=np.float64)
+        self.y_var = self.y_scale ** 2 if y_var is None else np.asarray(y_var, dtype=np.float64)
+        self.n_samples_seen = int(n_samples_seen)
+        self.columns = list(columns) if columns is not None else None  # frame columns in and out
+        self.inputs = list(inputs)  # extra input features after the frame columns
+        self.metadata = dict(metadata or {})
+
+    @classmethod
+    def from_sklearn(cls, mlp, scaler_x=None, scaler_y=None, columns=None, metadata=None, inputs=()):
+        """Without scalers the model is assumed to take and return raw frames."""
+        n_in, n_out = mlp.coefs_[0].shape[0], mlp.coefs_[-1].shape[1]
+        def params(scaler, n):
+            if scaler is None:
+                return np.zeros(n), np.ones(n), np.ones(n), 0
+            return scaler.mean_, scaler.scale_, scaler.var_, scaler.n_samples_seen_
+        x_mean, x_scale, x_var, seen = params(scaler_x, n_in)
+        y_mean, y_scale, y_var, _ = params(scaler_y, n_out)
+        return cls(mlp.coefs_, mlp.intercepts_, mlp.activation,
+                   x_mean, x_scale, y_mean, y_scale, x_var, y_var, np.max(seen), columns, metadata, inputs)
+
+    def _arrays(self):
+        arrays = {f"W{i}": w for i, w in enumerate(self.weights)}
+        arrays.update({f"b{i}": b for i, b in enumerate(self.biases)})
+        arrays.update(x_mean=self.x_mean, x_scale=self.x_scale, x_var=self.x_var,
+                      y_mean=self.y_mean, y_scale=self.y_scale, y_var=self.y_var)
+        return arrays
+
+    def save(self, path):
+        arrays = {k: np.ascontiguousarray(v) for k, v in self._arrays().items()}
+        layout, offset = {}, 0
+        for name, a in arrays.items():
+            layout[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+            offset = -(-(offset + a.nbytes) // ALIGN) * ALIGN
+        header = json.dumps({
+            "version": FORMAT_VERSION,
+            "activation": self.activation,
+            "layers": len(self.weights),
+            "n_samples_seen": self.n_samples_seen,
+            "columns": self.columns,
+            "inputs": self.inputs,
+            "metadata": self.metadata,
+            "arrays": layout,
+        }).encode("utf-8")
+        # the array section starts aligned, offsets are relative to it
+        start = -(-(len(MAGIC) + 4 + len(header)) // ALIGN) * ALIGN
+        header += b" " * (start - len(MAGIC) - 4 - len(header))
+        with open(path, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", len(header)) + header)
+            for name, a in arrays.items():
+                f.seek(start + layout[name]["offset"])
+                f.write(a.tobytes())
+
+    @classmethod
+    def load(cls, path, columns=None, mmap=True):
+        """
+        Load a .tmod (or legacy .npz) artifact. With columns, raise SchemaError
+        unless the model was trained on exactly that frame layout.
+        """
+        with open(path, "rb") as f:
+            magic = f.read(4)
+            if magic != MAGIC:
+                if magic[:2] == b"PK":
+                    return cls._load_npz(path, columns)
+                raise ValueError(f"{path}: not a model artifact")
+            (size,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(size).decode("utf-8"))
+        if header["version"] != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported artifact version {header['version']}")
+        _check_schema(path, header["columns"], columns)
+        start = len(MAGIC) + 4 + size
+        if mmap:
+            data = np.memmap(path, dtype=np.uint8, mode="r", offset=start)
+        else:
+            with open(path, "rb") as f:
+                f.seek(start)
+                data = np.frombuffer(f.read(), dtype=np.uint8)
+        def array(name):
+            spec = header["arrays"][name]
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            return np.frombuffer(data, dtype, count, spec["offset"]).reshape(spec["shape"])
+        n = header["layers"]
+        net = cls(
+            [array(f"W{i}") for i in range(n)], [array(f"b{i}") for i in range(n)], header["activation"],
+            array("x_mean"), array("x_scale"), array("y_mean"), array("y_scale"),
+            array("x_var"), array("y_var"), header["n_samples_seen"], header["columns"], header["metadata"],
+            header.get("inputs", ()),
+        )
+        _check_shapes(path, net, net.columns)
+        return net
+
+    @classmethod
+    def load_pickle(cls, path, columns=None, scaler_x=None, scaler_y=None, metadata=None):
+        """
+        A pickled MLPRegressor, refused with SchemaError like an artifact if it
+        does not map frames of columns to frames of columns.
+        """
+        import pickle
+        with open(path, "rb") as f:
+            mlp = pickle.load(f)
+        if not hasattr(mlp, "coefs_"):
+            raise SchemaError(f"{path}: {type(mlp).__name__} is not a fitted MLP")
+        if hasattr(mlp, "feature_names_in_"):
+            _check_schema(path, mlp.feature_names_in_, columns)
+        net = cls.from_sklearn(mlp, scaler_x, scaler_y, columns, metadata)
+        _check_shapes(path, net, columns)
+        return net
+
+    @classmethod
+    def _load_npz(cls, path, columns):
+        with np.load(path) as z:
+            n = sum(1 for k in z.files if k.startswith("W"))
+            net = cls(
+                [z[f"W{i}"] for i in range(n)], [z[f"b{i}"] for i in range(n)], str(z["activation"]),
+                z["x_mean"], z["x_scale"], z["y_mean"], z["y_scale"],
+                z["x_var"], z["y_var"], int(z["n_samples_seen"]),
+            )
+        _check_shapes(path, net, columns)
+        return net
+
+    def predict(self, frames):
+        """(n, F) raw frames -> (n, F_out) raw predictions, in one chain of matmuls."""
+        h = (np.asarray(frames, dtype=np.float32) - self.x_mean) / self.x_scale
+        act = ACTIVATIONS[self.activation]
+        last = len(self.weights) - 1
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            h = h @ w
+            h += b
+            if i < last:
+                h = act(h)
+        return h * self.y_scale + self.y_mean
+
+def _check_schema(path, stored, expected):
+    if expected is not None and stored is not None and list(stored) != list(expected):
+        raise SchemaError(f"{path}: model frame columns {stored} do not match {list(expected)}")
+
+def _check_shapes(path, net, columns=None):
+    n_in, n_out = net.weights[0].shape[0], net.weights[-1].shape[1]
+    if columns is not None and (n_in, n_out) != (len(columns) + len(net.inputs), len(columns)):
+        raise SchemaError(f"{path}: model maps {n_in} -> {n_out} values, frames have {len(columns)} columns"
+                          f" plus {len(net.inputs)} input features")
+    if len(net.x_mean) != n_in or len(net.y_mean) != n_out:
+        raise ValueError(f"{path}: scaler sizes do not match the network")
+
+def convert(pickle_path, out=None, data_dir=None):
+    """
+    Write the .tmod artifact for a pickled MLPRegressor. A bare pickle has no
+    scalers; given data_dir they are refitted on that folder's frame logs.
+    """
+    from tetris_ai import frame_columns
+    scaler_x = scaler_y = None
+    if data_dir is not None:
+        from dataset import build_dataset
+        from model import fit_scaler
+        X, y = build_dataset(data_dir)
+        scaler_x, scaler_y = fit_scaler(X), fit_scaler(y)
+    out = out or pickle_path.rsplit(".", 1)[0] + ".tmod"
+    metadata = {"converted_from": pickle_path}
+    MLPInference.load_pickle(pickle_path, frame_columns(), scaler_x, scaler_y, metadata).save(out)
+    return out
+
+def main(argv=sys.argv[1:]):
+    import argparse
+    parser = argparse.ArgumentParser(description="Model artifact tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="write the .tmod artifact for a pickled model")
+    conv.add_argument("pickle")
+    conv.add_argument("--out", default=None)
+    conv.add_argument("--data", default=None, help="refit the scalers on these frame logs")
+    args = parser.parse_args(argv)
+    print(convert(args.pickle, args.out, args.data))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Opt-in instrumentation for the game loop (python tetris_ai.py [ai] --profile).
+
+Phases are timed with perf_counter_ns into fixed-size ring buffers, so a
+long session costs constant memory and the percentiles describe the most
+recent samples; totals, counts and maxima cover the whole run. Timing is
+attached by wrapping methods on the live objects (the AI, the model, the
+logger, the game), so nothing is paid when profiling is off. Wrapped
+phases nest: "step" includes "lock", and both include "log". The AI and
+its model run on the AIWorker thread, so recording takes a lock.
+
+StackSampler is an optional sampling profiler: a thread that snapshots
+the main thread's stack every few milliseconds and writes the counts as
+collapsed stacks ("outer;inner;leaf count" lines), the input format of
+flamegraph.pl and speedscope.
+"""
+import json, sys, threading, time
+from collections import Counter
+
+import numpy as np
+
+class Ring:
+    """The last `capacity` samples (ns) plus whole-run count, total and max."""
+    __slots__ = ("buf", "n", "total", "max")
+
+    def __init__(self, capacity=4096):
+        self.buf = np.zeros(capacity, dtype=np.int64)
+        self.n = self.total = self.max = 0
+
+    def add(self, ns):
+        self.buf[self.n % len(self.buf)] = ns
+        self.n += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def samples(self):
+        return self.buf[:min(self.n, len(self.buf))]
+
+class Instrumentation:
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.phases = {}
+        self.counters = Counter()
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, phase, ns, counter=None):
+        with self._lock:
+            ring = self.phases.get(phase)
+            if ring is None:
+                ring = self.phases[phase] = Ring(self.capacity)
+            ring.add(ns)
+            if counter:
+                self.counters[counter] += 1
+
+    def wrap(self, obj, name, phase, counter=None):
+        """Time every call of obj.name as phase (and count it), by shadowing it on the instance."""
+        timed = self.timed(getattr(obj, name), phase, counter)
+        setattr(obj, name, timed)
+        return timed
+
+    def timed(self, fn, phase, counter=None):
+        """fn, timed as phase; for plain functions and C methods that cannot be shadowed."""
+        clock, record = time.perf_counter_ns, self.record
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(phase, clock() - start, counter)
+        return timed
+
+    def count_kicks(self, game):
+        """Count rotations, rotations that needed a kick offset, and rotations that failed."""
+        rotate = game._rotate
+        counters, lock = self.counters, self._lock
+        def counted(rot_dir):
+            piece = game.current
+            before = (piece.r, piece.c)
+            ok = rotate(rot_dir)
+            with lock:
+                counters["rotations"] += 1
+                if not ok:
+                    counters["rotations_failed"] += 1
+                elif (piece.r, piece.c) != before:
+                    counters["kicks"] += 1
+            return ok
+        game._rotate = counted
+
+    def report(self, pieces=None):
+        with self._lock:
+            rings = {name: (ring.samples() / 1e3, ring.n, ring.total, ring.max)
+                     for name, ring in self.phases.items()}
+            counters = dict(self.counters)
+        phases = {}
+        for name, (us, n, total, peak) in sorted(rings.items()):
+            p50, p90, p99 = np.percentile(us, [50, 90, 99]) if len(us) else (0, 0, 0)
+            phases[name] = {
+                "count": n, "total_ms": round(total / 1e6, 3),
+                "mean_us": round(total / max(n, 1) / 1e3, 2),
+                "p50_us": round(float(p50), 2), "p90_us": round(float(p90), 2),
+                "p99_us": round(float(p99), 2), "max_us": round(peak / 1e3, 2),
+                "histogram": histogram(us),
+            }
+        if pieces:
+            counters["pieces"] = pieces
+            if "predicts" in counters:
+                counters["predicts_per_piece"] = round(counters["predicts"] / pieces, 2)
+        return {"seconds": round(time.perf_counter() - self.started, 3),
+                "window": self.capacity, "phases": phases, "counters": counters}
+
+def histogram(us):
+    """Sample counts per power-of-two microsecond bucket: {"<=1": n, "<=2": n, ...}."""
+    if not len(us):
+        return {}
+    buckets = np.ceil(np.log2(np.maximum(us, 1))).astype(int)
+    values, counts = np.unique(buckets, return_counts=True)
+    return {f"<={1 << int(v)}": int(c) for v, c in zip(values, counts)}
+
+def format_report(report):
+    lines = [f"{'phase':10s} {'count':>8s} {'total ms':>10s} {'p50 us':>9s} {'p90 us':>9s} "
+             f"{'p99 us':>9s} {'max us':>10s}"]
+    for name, p in report["phases"].items():
+        lines.append(f"{name:10s} {p['count']:8d} {p['total_ms']:10.1f} {p['p50_us']:9.1f} "
+                     f"{p['p90_us']:9.1f} {p['p99_us']:9.1f} {p['max_us']:10.1f}")
+    for name, p in report["phases"].items():
+        peak = max(p["histogram"].values(), default=1)
+        lines.append(f"{name} (us):")
+        for bucket, count in p["histogram"].items():
+            lines.append(f"  {bucket:>10s} {count:8d} {'#' * max(1, count * 40 // peak)}")
+    lines.append("counters: " + ", ".join(f"{k}={v}" for k, v in sorted(report["counters"].items())))
+    return "\n".join(lines)
+
+def save_report(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1)
+    return path
+
+class StackSampler:
+    """Samples the stack of the thread that created it every `interval` seconds."""
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.target = threading.get_ident()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def save(self, path):
+        """Write collapsed stacks, one "frame;frame;... count" line each."""
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
@@ -1,26 +1,19 @@
+import argparse
+import csv
+import json
+import os
 import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import numpy as np
 from sklearn.neural_network import MLPRegressor
-from sklearn.model_selection import train_test_split
+from sklearn.metrics import r2_score
+from sklearn.model_selection import KFold, ParameterGrid, ParameterSampler, train_test_split
 from sklearn.preprocessing import StandardScaler
 
-import pandas as pd
-import os
-
-folder_path = "./data"
-data_vectors = []
-for filename in os.listdir("./data"):
-    if filename.endswith(".csv"):
-        file_path = os.path.join(folder_path, filename)
-        
-        # Read CSV with pandas
-        df = pd.read_csv(file_path)
-        
-        # Convert to list of vectors and append
-        data_vectors.extend(df.values.tolist())
-
-X = data_vectors[:len(data_vectors)-1]
-y = data_vectors[1:]
+from dataset import FEATURES, build_dataset, cached_sources, prune_cache
+from inference import MLPInference
 
 #GAMEWIDTH = 10
 
@@ -31,31 +24,426 @@ y = data_vectors[1:]
 
 #test_output_string = [ (GAMEWIDTH * 2) + 2 ]
 
-# ---- PREPROCESSING ----
-scaler_x = StandardScaler()
-scaler_y = StandardScaler()
+SCALE_CHUNK = 1 << 16
+
+def fit_scaler(data):
+    """StandardScaler fitted chunk by chunk, so a memmapped dataset is never copied whole."""
+    scaler = StandardScaler()
+    for start in range(0, len(data), SCALE_CHUNK):
+        scaler.partial_fit(data[start:start + SCALE_CHUNK])
+    return scaler
+
+def scale(scaler, data):
+    out = np.empty(data.shape, dtype=np.float32)
+    for start in range(0, len(data), SCALE_CHUNK):
+        out[start:start + SCALE_CHUNK] = scaler.transform(data[start:start + SCALE_CHUNK])
+    return out
+
+def artifact_path(model_path):
+    """Inference artifact written next to the pickled model."""
+    return model_path.rsplit(".", 1)[0] + ".tmod"
+
+def scaled_memmap(data, scaler):
+    """
+    data scaled chunk by chunk into a float32 .npy next to the memmap it
+    came from, written once and memory-mapped read-only after that.
+    Writing one deletes the scaled copies of memmaps that no longer exist.
+    """
+    path = data.filename[:-len(".npy")] + "-scaled.npy"
+    if not os.path.exists(path):
+        out = np.lib.format.open_memmap(path + ".tmp.npy", mode="w+", dtype=np.float32, shape=data.shape)
+        for start in range(0, len(data), SCALE_CHUNK):
+            out[start:start + SCALE_CHUNK] = scaler.transform(data[start:start + SCALE_CHUNK])
+        out.flush()
+        del out
+        os.replace(path + ".tmp.npy", path)
+        _prune_scaled(os.path.dirname(path))
+    return np.load(path, mmap_mode="r")
+
+def _prune_scaled(folder):
+    """Delete the -scaled.npy files in folder whose source .npy has been pruned."""
+    live = {name for name in os.listdir(folder) if name.endswith("-scaled.npy")
+            and os.path.exists(os.path.join(folder, name[:-len("-scaled.npy")] + ".npy"))}
+    prune_cache(folder, r".+-scaled\.npy", live)
+
+def concat_scalers(*scalers):
+    """One StandardScaler over the columns of several, fitted on the same rows."""
+    scaler = StandardScaler()
+    for attr in ("mean_", "var_", "scale_"):
+        setattr(scaler, attr, np.concatenate([getattr(s, attr) for s in scalers]))
+    scaler.n_samples_seen_ = scalers[0].n_samples_seen_
+    scaler.n_features_in_ = len(scaler.mean_)
+    return scaler
+
+def splits(n, folds=1):
+    """[(train_idx, test_idx), ...] sorted: one 80/20 split of n pairs, or K folds. Fixed seed."""
+    if folds > 1:
+        pairs = KFold(folds, shuffle=True, random_state=42).split(np.arange(n))
+    else:
+        pairs = [train_test_split(np.arange(n), test_size=0.2, random_state=42)]
+    return [(np.sort(train_idx), np.sort(test_idx)) for train_idx, test_idx in pairs]
+
+def train(data_dir="./data", out="tetris_model1.pkl", features=False):
+    """With features, the engineered features.FEATURE_NAMES are appended to every input frame."""
+    X, y = build_dataset(data_dir)
+
+    # ---- PREPROCESSING ----
+    # scaled into memmaps; only the rows of each split are ever loaded
+    scaler_x = fit_scaler(X)
+    scaler_y = fit_scaler(y)
+    parts = [scaled_memmap(X, scaler_x)]
+    y_scaled = scaled_memmap(y, scaler_y)
+    inputs = []
+    if features:
+        from features import FEATURE_NAMES, build_features
+        F = build_features(data_dir)
+        scaler_f = fit_scaler(F)
+        parts.append(scaled_memmap(F, scaler_f))
+        scaler_x = concat_scalers(scaler_x, scaler_f)
+        inputs = FEATURE_NAMES
+
+    # ---- TRAIN/TEST SPLIT ----
+    (train_idx, test_idx), = splits(len(X))
+    rows = lambda idx: np.concatenate([p[idx] for p in parts], axis=1)
+    X_train, X_test = rows(train_idx), rows(test_idx)
+    y_train, y_test = y_scaled[train_idx], y_scaled[test_idx]
+
+    # ---- MODEL ----
+    mlp = MLPRegressor(
+        hidden_layer_sizes=(128, 64),
+        activation='relu',
+        solver='adam',
+        max_iter=1000,
+        random_state=0
+    )
+
+    # ---- TRAIN ----
+    mlp.fit(X_train, y_train)
+    score = mlp.score(X_test, y_test)
+    print(f"Success rate: {score:.4f}")
+
+    with open(out, "wb") as f:
+        pickle.dump(mlp, f)
+    metadata = {"trained": time.strftime("%Y%m%d-%H%M%S"), "pairs": len(X), "score": score,
+                "hidden_layer_sizes": list(mlp.hidden_layer_sizes)}
+    MLPInference.from_sklearn(mlp, scaler_x, scaler_y, FEATURES, metadata, inputs).save(artifact_path(out))
+
+    new_ledger(out, data_dir)
+    return mlp, scaler_x, scaler_y
+
+# ---- INCREMENTAL UPDATE ----
+
+HOLDOUT = 0.2
+
+def ledger_path(model_path):
+    return model_path.rsplit(".", 1)[0] + ".ledger.json"
+
+class Ledger:
+    """
+    The frame logs a model has seen, by content digest, plus one record per
+    update. Files added by an update keep a fixed held-out share of their
+    pairs (holdout=True) that is never trained on. Files of the full train
+    (holdout=False) had the test rows of split held out instead: the bundle
+    order of their digests, their pair counts and the number of folds, from
+    which held_out_rows() rebuilds them.
+    """
+    def __init__(self, path, fresh=False):
+        self.path = path
+        self.files, self.updates, self.split = {}, [], None
+        if not fresh and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.files, self.updates = data["files"], data["updates"]
+            self.split = data.get("split")  # absent in ledgers written before it was recorded
+        self._test_idx = None
+
+    def held_out_rows(self, digest):
+        """Row indices into digest's cached pairs that the full train held out, or None if unknown."""
+        if not self.split or digest not in self.split["digests"]:
+            return None
+        if self._test_idx is None:
+            self._test_idx = splits(sum(self.split["pairs"]), self.split["folds"])[0][1]
+        i = self.split["digests"].index(digest)
+        start = sum(self.split["pairs"][:i])
+        idx = self._test_idx
+        return idx[(idx >= start) & (idx < start + self.split["pairs"][i])] - start
+
+    def add(self, source, digest, holdout):
+        self.files[digest] = {"source": source, "added": time.strftime("%Y%m%d-%H%M%S"), "holdout": holdout}
+
+    def save(self):
+        with open(self.path + ".tmp", "w") as f:
+            json.dump({"files": self.files, "updates": self.updates, "split": self.split}, f, indent=1)
+        os.replace(self.path + ".tmp", self.path)
+
+def new_ledger(model_path, data_dir, folds=1):
+    """
+    Start model_path's ledger over: it was trained on every file of data_dir,
+    less the test rows of splits(n, folds)[0] over build_dataset's bundle.
+    """
+    ledger = Ledger(ledger_path(model_path), fresh=True)
+    pairs = {}
+    for source, digest, cached, _ in cached_sources(data_dir):
+        ledger.add(source, digest, holdout=False)
+        pairs[digest] = len(np.load(cached, mmap_mode="r"))
+    digests = sorted(pairs)  # the order build_dataset bundles them in
+    ledger.split = {"folds": folds, "digests": digests, "pairs": [pairs[d] for d in digests]}
+    ledger.save()
+    return ledger
+
+def holdout_mask(digest, n):
+    """Fixed per file: the same pairs are held out on every run."""
+    return np.random.default_rng(int(digest[:16], 16)).random(n) < HOLDOUT
+
+def restore_scaler(mean, var, n_samples_seen):
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(mean, dtype=np.float64)
+    scaler.var_ = np.asarray(var, dtype=np.float64)
+    scaler.scale_ = np.sqrt(scaler.var_)
+    scaler.scale_[scaler.scale_ == 0] = 1.0
+    scaler.n_samples_seen_ = np.int64(n_samples_seen)
+    scaler.n_features_in_ = len(scaler.mean_)
+    return scaler
+
+def rescale_network(mlp, old_x, new_x, old_y, new_y):
+    """
+    Fold a change of scaler statistics into the first and last layers, so the
+    network computes the same raw-frame function under the new scalers.
+    """
+    w = mlp.coefs_[0]
+    mlp.intercepts_[0] = mlp.intercepts_[0] + ((new_x.mean_ - old_x.mean_) / old_x.scale_) @ w
+    mlp.coefs_[0] = w * (new_x.scale_ / old_x.scale_)[:, None]
+    mlp.coefs_[-1] = mlp.coefs_[-1] * (old_y.scale_ / new_y.scale_)
+    mlp.intercepts_[-1] = (mlp.intercepts_[-1] * old_y.scale_ + old_y.mean_ - new_y.mean_) / new_y.scale_
+
+def held_out_score(mlp, scaler_x, scaler_y, X, y):
+    """R^2 on raw frames, comparable across scaler updates."""
+    if len(X) == 0:
+        return None
+    net = MLPInference.from_sklearn(mlp, scaler_x, scaler_y)
+    return float(r2_score(y, net.predict(X)))
+
+def update(data_dir="./data", out="tetris_model1.pkl", epochs=5, seed=0):
+    """
+    Continue training out on the frame logs of data_dir it has not seen:
+    running scaler statistics, mini-batch partial_fit on the new pairs only,
+    and the held-out score before and after, for earlier and new files.
+    """
+    ledger = Ledger(ledger_path(out))
+    artifact = artifact_path(out)
+    if not os.path.exists(artifact):  # written before the .tmod format
+        artifact = out.rsplit(".", 1)[0] + ".npz"
+    net = MLPInference.load(artifact, FEATURES)
+    cache_dir = os.path.join(data_dir, ".cache")
+
+    def inputs_of(source, digest, pairs, rows=slice(None)):
+        X = pairs[rows, 0].astype(np.float32)
+        if net.inputs:
+            from features import file_features
+            X = np.concatenate([X, file_features(source, digest, cache_dir)[0][rows]], axis=1)
+        return X, pairs[rows, 1].astype(np.float32)
+
+    new, held_old = [], []
+    for source, digest, cached, _ in cached_sources(data_dir, cache_dir):
+        seen = ledger.files.get(digest)
+        if seen and not seen["holdout"]:
+            rows = ledger.held_out_rows(digest)
+            if rows is not None and len(rows):
+                held_old.append(inputs_of(source, digest, np.load(cached, mmap_mode="r"), rows))
+            continue
+        # memory-mapped: a file seen before only has its held-out rows read
+        pairs = np.load(cached, mmap_mode="r")
+        mask = holdout_mask(digest, len(pairs))
+        if seen is None:
+            new.append((source, digest, *inputs_of(source, digest, pairs), mask))
+        else:
+            held_old.append(inputs_of(source, digest, pairs, mask))
+    if not new:
+        print("No new frame logs.")
+        return None
+
+    with open(out, "rb") as f:
+        mlp = pickle.load(f)
+    old_x = restore_scaler(net.x_mean, net.x_var, net.n_samples_seen)
+    old_y = restore_scaler(net.y_mean, net.y_var, net.n_samples_seen)
+
+    stack = lambda parts, i: np.concatenate([p[i] for p in parts]) if parts else np.empty((0, 0))
+    X_new = np.concatenate([X[~mask] for _, _, X, _, mask in new])
+    y_new = np.concatenate([y[~mask] for _, _, _, y, mask in new])
+    held_new = [(X[mask], y[mask]) for _, _, X, y, mask in new]
+    held = (stack(held_old, 0), stack(held_old, 1)), (stack(held_new, 0), stack(held_new, 1))
+    before = [held_out_score(mlp, old_x, old_y, *h) for h in held]
+
+    # running mean/variance over everything seen so far
+    scaler_x = restore_scaler(old_x.mean_, old_x.var_, old_x.n_samples_seen_).partial_fit(X_new)
+    scaler_y = restore_scaler(old_y.mean_, old_y.var_, old_y.n_samples_seen_).partial_fit(y_new)
+    rescale_network(mlp, old_x, scaler_x, old_y, scaler_y)
+
+    X = scale(scaler_x, X_new)
+    y = scale(scaler_y, y_new)
+    rng = np.random.default_rng(seed)
+    for _ in range(epochs):
+        order = rng.permutation(len(X))
+        for start in range(0, len(order), SCALE_CHUNK):
+            idx = order[start:start + SCALE_CHUNK]
+            mlp.partial_fit(X[idx], y[idx])
+    after = [held_out_score(mlp, scaler_x, scaler_y, *h) for h in held]
+
+    with open(out, "wb") as f:
+        pickle.dump(mlp, f)
+    metadata = dict(net.metadata, updated=time.strftime("%Y%m%d-%H%M%S"),
+                    updates=net.metadata.get("updates", 0) + 1)
+    MLPInference.from_sklearn(mlp, scaler_x, scaler_y, FEATURES, metadata, net.inputs).save(artifact_path(out))
+    for source, digest, *_ in new:
+        ledger.add(source, digest, holdout=True)
+    record = {
+        "time": time.strftime("%Y%m%d-%H%M%S"), "files": len(new), "pairs": len(X),
+        "held_out_earlier": [before[0], after[0]], "held_out_new": [before[1], after[1]],
+    }
+    ledger.updates.append(record)
+    ledger.save()
+
+    fmt = lambda v: "n/a" if v is None else f"{v:.4f}"
+    print(f"{len(new)} new files, {len(X)} training pairs, {epochs} epochs")
+    print(f"Held-out score, earlier files: {fmt(before[0])} -> {fmt(after[0])}")
+    print(f"Held-out score, new files:     {fmt(before[1])} -> {fmt(after[1])}")
+    return record
+
+# ---- SWEEP ----
+
+SWEEP_GRID = {
+    "hidden_layer_sizes": [(64,), (128, 64), (256, 128), (128, 64, 32)],
+    "learning_rate_init": [1e-3, 3e-4],
+    "alpha": [1e-4, 1e-3, 1e-2],
+    "batch_size": [200, 1000],
+}
+
+def sweep_configs(grid=SWEEP_GRID, n_random=None, seed=0):
+    """Every combination of grid, or n_random of them sampled without replacement."""
+    if n_random is None:
+        return list(ParameterGrid(grid))
+    return list(ParameterSampler(grid, n_random, random_state=seed))
+
+def scaled_dataset(data_dir, features=False):
+    """
+    Scale the dataset once and store it next to the bundle, so every sweep
+    worker memory-maps the same float32 X/y instead of rebuilding it. X comes
+    as a list of paths, frames then (with features) the feature block, whose
+    columns are joined row by row.
+    """
+    X, y = build_dataset(data_dir)
+    scaler_x = fit_scaler(X)
+    scaler_y = fit_scaler(y)
+    x_paths = [scaled_memmap(X, scaler_x).filename]
+    inputs = []
+    if features:
+        from features import FEATURE_NAMES, build_features
+        F = build_features(data_dir)
+        scaler_f = fit_scaler(F)
+        x_paths.append(scaled_memmap(F, scaler_f).filename)
+        scaler_x = concat_scalers(scaler_x, scaler_f)
+        inputs = FEATURE_NAMES
+    return x_paths, scaled_memmap(y, scaler_y).filename, scaler_x, scaler_y, inputs
+
+def _init_sweep_worker():
+    # one BLAS thread per process, so the pool scales with the number of workers
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
 
-X_scaled = scaler_x.fit_transform(X)
-y_scaled = scaler_y.fit_transform(y)
+def _fit_trial(index, config, x_paths, y_path, folds, max_iter):
+    parts = [np.load(path, mmap_mode="r") for path in x_paths]
+    X = lambda idx: np.concatenate([p[idx] for p in parts], axis=1)
+    y = np.load(y_path, mmap_mode="r")
+    trial_splits = splits(len(y), folds)
+    scores, fit_seconds, first = [], 0.0, None
+    for train_idx, test_idx in trial_splits:
+        mlp = MLPRegressor(**config, activation='relu', solver='adam', max_iter=max_iter, random_state=0)
+        start = time.perf_counter()
+        mlp.fit(X(train_idx), y[train_idx])
+        fit_seconds += time.perf_counter() - start
+        scores.append(mlp.score(X(test_idx), y[test_idx]))
+        if first is None:
+            first = mlp
+    # per-call latency of the NumPy forward pass on one frame, as the game uses it
+    net = MLPInference.from_sklearn(first)
+    row = np.asarray(X(slice(0, 1)), dtype=np.float32)
+    calls = 200
+    start = time.perf_counter()
+    for _ in range(calls):
+        net.predict(row)
+    latency = (time.perf_counter() - start) / calls
+    result = {
+        "trial": index,
+        **{k: str(v) if isinstance(v, tuple) else v for k, v in config.items()},
+        "score": float(np.mean(scores)),
+        "score_std": float(np.std(scores)),
+        "fit_seconds": round(fit_seconds / len(trial_splits), 3),
+        "latency_us": round(latency * 1e6, 1),
+    }
+    return result, first
 
-# ---- TRAIN/TEST SPLIT ----
-X_train, X_test, y_train, y_test = train_test_split(X_scaled, y_scaled, test_size=0.2, random_state=42)
+def sweep(data_dir="./data", out="tetris_model1.pkl", n_random=None, folds=1,
+          workers=None, max_iter=1000, seed=0, results="sweep_results.csv", features=False):
+    """
+    Fit every config over a process pool, write one row per trial to results
+    (best score first) and save the best trial's model as out plus its .tmod.
+    With folds > 1 the score is the K-fold mean and the kept model is the one
+    fitted on the first fold. features appends the engineered features as in train().
+    """
+    x_paths, y_path, scaler_x, scaler_y, inputs = scaled_dataset(data_dir, features)
+    configs = sweep_configs(n_random=n_random, seed=seed)
+    rows, best, best_model = [], None, None
+    with ProcessPoolExecutor(workers, initializer=_init_sweep_worker) as pool:
+        futures = [pool.submit(_fit_trial, i, c, x_paths, y_path, folds, max_iter)
+                   for i, c in enumerate(configs)]
+        for future in as_completed(futures):
+            result, mlp = future.result()
+            rows.append(result)
+            print(f"trial {result['trial']}: score {result['score']:.4f} "
+                  f"fit {result['fit_seconds']}s latency {result['latency_us']}us")
+            if best is None or result["score"] > best["score"]:
+                best, best_model = result, mlp
 
-# ---- MODEL ----
-mlp = MLPRegressor(
-    hidden_layer_sizes=(128, 64),
-    activation='relu',
-    solver='adam',
-    max_iter=1000,
-    random_state=0
-)
+    rows.sort(key=lambda r: -r["score"])
+    with open(results, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Best trial {best['trial']}: score {best['score']:.4f} (results in {results})")
+    with open(out, "wb") as f:
+        pickle.dump(best_model, f)
+    metadata = {"trained": time.strftime("%Y%m%d-%H%M%S"), "sweep": best}
+    MLPInference.from_sklearn(best_model, scaler_x, scaler_y, FEATURES, metadata, inputs).save(artifact_path(out))
+    new_ledger(out, data_dir, folds)
+    return rows
 
-# ---- TRAIN ----
-mlp.fit(X_train, y_train)
-print(f"Success rate: {mlp.score(X_test, y_test):.4f}")
+def main():
+    parser = argparse.ArgumentParser(description="Train the next-frame MLP on logged games.")
+    parser.add_argument("--data", default="./data", help="folder of .csv/.tfl frame logs")
+    parser.add_argument("--out", default="tetris_model1.pkl")
+    parser.add_argument("--features", action="store_true",
+                        help="also feed the engineered board features (features.py) to the model")
+    parser.add_argument("--update", action="store_true",
+                        help="continue training --out on files it has not seen")
+    parser.add_argument("--epochs", type=int, default=5, help="passes over the new pairs with --update")
+    parser.add_argument("--sweep", action="store_true", help="search SWEEP_GRID instead of one fit")
+    parser.add_argument("--random", type=int, default=None, metavar="N", help="sample N configs of the grid")
+    parser.add_argument("--folds", type=int, default=1, help="K-fold CV (1: one 80/20 split)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-iter", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--results", default="sweep_results.csv")
+    args = parser.parse_args()
+    if args.update:
+        update(args.data, args.out, args.epochs, args.seed)
+    elif args.sweep:
+        sweep(args.data, args.out, args.random, args.folds, args.workers,
+              args.max_iter, args.seed, args.results, args.features)
+    else:
+        train(args.data, args.out, args.features)
 
-with open("tetris_model1.pkl", "wb") as f:
-    pickle.dump(mlp, f)
+if __name__ == "__main__":
+    main()
 
 # ---- PREDICT ----
 #while True:
@@ -66,4 +454,4 @@ with open("tetris_model1.pkl", "wb") as f:
 #
 #    print("\nExample prediction:")
 #    print("Current state:", scaler_x.inverse_transform(sample_input).tolist())
-#    print("Predicted next state:", rounded_next_state)
\ No newline at end of file
+#    print("Predicted next state:", rounded_next_state)
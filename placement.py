@@ -0,0 +1,322 @@
+"""
+Placement-level AI: find every reachable resting position of the current piece,
+score them all with one batched evaluation, then walk the piece there.
+
+Reachability is a breadth-first search over (r, c, rot) using the game's own
+moves (can_place / try_rotate, so SRS kicks, tucks and spins are included).
+With gravity=k the search also applies the k gravity steps the game runs
+between two AI decisions, so it only offers placements the AI can actually
+reach at that speed; each step of the resulting path is one AI decision.
+"""
+from collections import deque
+
+import numpy as np
+
+from features import board_features, candidate_features, unpack_rows
+from tetris_ai import (
+    PIECE_MASKS, PIECE_TO_ID, Piece, try_rotate, frame_columns,
+    NOOP, LEFT, RIGHT, DOWN, ROT_CW, ROT_CCW, HARD_DROP,
+)
+
+COLUMNS = frame_columns()
+ROW_I, ROT_I, LOCKED_I = (COLUMNS.index(n) for n in ("row", "rotation", "locked"))
+
+# El-Tetris style weights for (aggregate height, lines cleared, holes, bumpiness)
+HEURISTIC_WEIGHTS = np.array([-0.510066, 0.760666, -0.35663, -0.184483])
+
+class Placement:
+    __slots__ = ("pose", "steps")
+
+    def __init__(self, pose, steps):
+        self.pose = pose    # (r, c, rot) where the piece comes to rest
+        self.steps = steps  # [(action, pose after the action), ...] ending in HARD_DROP
+
+def cells_key(kind, rot, r, c):
+    """Occupied cells as row masks; equal for poses that cover the same cells."""
+    _, _, min_dc, _, masks = PIECE_MASKS[kind, rot]
+    left = c + min_dc
+    return tuple((r + dr, m << left) for dr, m, _ in masks)
+
+def _moves(board, kind, pose):
+    r, c, rot = pose
+    if board.fits(kind, rot, r, c - 1):
+        yield LEFT, (r, c - 1, rot)
+    if board.fits(kind, rot, r, c + 1):
+        yield RIGHT, (r, c + 1, rot)
+    for action, rot_dir in ((ROT_CW, +1), (ROT_CCW, -1)):
+        p = Piece(kind)
+        p.r, p.c, p.rot = pose
+        if try_rotate(board, p, rot_dir):
+            yield action, (p.r, p.c, p.rot)
+    if board.fits(kind, rot, r + 1, c):
+        yield DOWN, (r + 1, c, rot)
+
+def _steps(parents, pose, collapse=True):
+    steps = []
+    while parents[pose] is not None:
+        prev, action = parents[pose]
+        steps.append((action, pose))
+        pose = prev
+    steps.reverse()
+    # without gravity in the search, trailing soft drops become one hard drop
+    while collapse and steps and steps[-1][0] == DOWN:
+        steps.pop()
+    return steps
+
+def _fall(board, kind, pose, rows):
+    """Apply up to `rows` gravity steps; returns (pose, locked)."""
+    r, c, rot = pose
+    for _ in range(rows):
+        if not board.fits(kind, rot, r + 1, c):
+            return (r, c, rot), True
+        r += 1
+    return (r, c, rot), False
+
+def search(board, kind, start, target=None, gravity=0):
+    """
+    BFS from start. Returns {cells_key: Placement} for every distinct resting
+    position, or only the Placement for target (a cells_key) once it is found.
+    """
+    parents = {start: None}
+    queue = deque([start])
+    found = {}
+    rests = {}  # pose -> where it comes to rest when dropped, shared along each fall
+
+    def rest_of(pose):
+        r, c, rot = pose
+        passed = []
+        while (r, c, rot) not in rests and board.fits(kind, rot, r + 1, c):
+            passed.append(r)
+            r += 1
+        rest = rests.get((r, c, rot), (r, c, rot))
+        for row in passed:
+            rests[row, c, rot] = rest
+        rests[r, c, rot] = rest
+        return rest
+
+    def land(pose, frm, last):
+        """Record a resting pose reached from frm by the step last."""
+        key = cells_key(kind, pose[2], pose[0], pose[1])
+        if key not in found:
+            found[key] = Placement(pose, _steps(parents, frm, gravity == 0) + [last])
+        return key == target
+
+    while queue:
+        pose = queue.popleft()
+        if gravity == 0:
+            r, c, rot = pose
+            if not board.fits(kind, rot, r + 1, c):
+                if land(pose, pose, (HARD_DROP, pose)):
+                    return found[target]
+            moves = _moves(board, kind, pose)
+        else:
+            rest = rest_of(pose)
+            if land(rest, pose, (HARD_DROP, rest)):
+                return found[target]
+            moves = []
+            for action, moved in [(NOOP, pose)] + list(_moves(board, kind, pose)):
+                moved, locked = _fall(board, kind, moved, gravity)
+                if not locked:
+                    moves.append((action, moved))
+                elif land(moved, pose, (action, moved)):
+                    return found[target]
+        for action, nxt in moves:
+            if nxt not in parents:
+                parents[nxt] = (pose, action)
+                queue.append(nxt)
+    return None if target is not None else found
+
+def enumerate_placements(board, piece, gravity=0):
+    return list(search(board, piece.kind, (piece.r, piece.c, piece.rot), gravity=gravity).values())
+
+def candidates_for(board, kind, pose, gravity=0, piece_seq=0, frame=0, features=False):
+    """
+    (placements, frames, outcomes): every resting pose of a piece of kind at
+    pose, and the scorer's inputs for each. Only plain data goes in and out,
+    so it can run in another process.
+    """
+    placements = list(search(board, kind, pose, gravity=gravity).values())
+    frames = candidate_frames(kind, [p.pose for p in placements], board.heights, piece_seq, frame)
+    if features:
+        frames = np.hstack([frames, candidate_features(board, len(frames))])
+    return placements, frames, outcome_features(board, kind, placements)
+
+# -------- Batched candidate features --------
+
+def log_position(game):
+    """(piece_seq, frame) of the current piece's next logged frame; (0, 0) without a logger."""
+    logger = game.logger
+    return (logger.piece_seq, logger.frame) if logger else (0, 0)
+
+def candidate_frames(kind, poses, heights, piece_seq=0, frame=0):
+    """(n, F) frame rows, as FrameLogger would log the piece at each resting (r, c, rot)."""
+    n = len(poses)
+    frames = np.zeros((n, len(COLUMNS)), dtype=np.float32)
+    poses = np.array(poses, dtype=np.float32).reshape(n, 3)
+    frames[:, 0] = piece_seq
+    frames[:, 1] = frame
+    frames[:, 2] = PIECE_TO_ID[kind]
+    frames[:, ROW_I:ROT_I + 1] = poses
+    frames[:, ROT_I + 1] = poses[:, 1] + np.array([PIECE_MASKS[kind, int(rot)][2] for rot in poses[:, 2]])
+    frames[:, ROT_I + 2:LOCKED_I] = heights
+    return frames
+
+def outcome_features(board, kind, placements):
+    """(n, 4) aggregate height, lines cleared, holes and bumpiness after each placement locks."""
+    rows = np.empty((len(placements), board.n_rows), dtype=np.int64)
+    lines = np.empty(len(placements), dtype=np.float32)
+    for i, p in enumerate(placements):
+        after = board.copy()
+        r, c, rot = p.pose
+        after.merge(kind, rot, r, c)
+        lines[i] = after.clear_lines()
+        rows[i] = after.rows
+    return outcomes_from(rows, lines, board.n_cols)
+
+def outcomes_from(rows, lines, n_cols):
+    """outcome_features columns from the row masks of the boards after each lock."""
+    f = board_features(unpack_rows(rows, n_cols))
+    return np.stack([f[:, 0], lines, f[:, 3], f[:, 1]], axis=1)
+
+# -------- Scorers: one call per piece, higher is better --------
+
+class HeuristicScorer:
+    def __init__(self, weights=HEURISTIC_WEIGHTS):
+        self.weights = weights
+
+    def __call__(self, frames, outcomes):
+        return outcomes @ self.weights
+
+class ModelScorer:
+    """
+    Adds the next-frame model's predicted lock likelihood at each resting pose
+    to the board heuristic. The model is not a value function on its own:
+    ranking on it alone tops out at a few dozen pieces.
+    """
+    def __init__(self, model, weight=0.5):
+        self.model = model
+        self.heuristic = HeuristicScorer()
+        self.weight = weight
+        # the model reads features.candidate_features after each frame
+        self.features = bool(getattr(model, "inputs", ()))
+
+    def __call__(self, frames, outcomes):
+        return self.combine(frames, outcomes, self.model.predict(frames))
+
+    def combine(self, frames, outcomes, pred):
+        """Scores from model predictions made elsewhere (e.g. one batch for many games)."""
+        return self.heuristic(frames, outcomes) + self.weight * pred[:, LOCKED_I]
+
+# -------- Executing a plan in a running game --------
+
+class PlacementAI:
+    """
+    next_action(game) returns one action per AI tick. A new piece triggers one
+    enumerate + score; if gravity or a failed move knocks the piece off its
+    path, the path is re-searched to the same target (no new evaluation),
+    and only a target that can no longer be reached is evaluated again.
+    gravity is the number of gravity steps the game runs per AI decision.
+
+    A caller that scores many AIs together asks needs_plan(game) first and
+    answers with adopt(game, best), or for a piece knocked off its path with
+    resume(game, placements) when the target is still among them;
+    next_action then never searches or evaluates itself.
+    """
+    def __init__(self, scorer, gravity=0):
+        self.scorer = scorer
+        self.gravity = gravity
+        self.piece = None
+        self.target = None
+        self.steps = []
+        self.i = 0
+        self.evaluations = 0
+
+    def candidate_args(self, game):
+        """The arguments of candidates_for for the current piece."""
+        cur = game.current
+        return (game.board, cur.kind, (cur.r, cur.c, cur.rot), self.gravity,
+                *log_position(game), getattr(self.scorer, "features", False))
+
+    def candidates(self, game):
+        """(placements, frames, outcomes): every resting pose of the current piece and the scorer's inputs."""
+        return candidates_for(*self.candidate_args(game))
+
+    def choose(self, game):
+        placements, frames, outcomes = self.candidates(game)
+        self.evaluations += 1
+        return placements[int(np.argmax(self.scorer(frames, outcomes)))]
+
+    def needs_plan(self, game):
+        """
+        What the next next_action call would search for, without searching:
+        "plan" for a new piece, "repath" for one knocked off its path, or
+        None while it is on its path.
+        """
+        cur = game.current
+        if cur is not self.piece:
+            return "plan"
+        return None if self._on_path(cur) else "repath"
+
+    def adopt(self, game, best):
+        """Follow best (a Placement scored elsewhere) for the current piece."""
+        self.piece = game.current
+        self.evaluations += 1
+        self._follow(game, best)
+
+    def resume(self, game, placements):
+        """
+        Take the path to the current target from placements, searched
+        elsewhere from where the piece is now; False if the target is gone.
+        """
+        kind = game.current.kind
+        for p in placements:
+            r, c, rot = p.pose
+            if cells_key(kind, rot, r, c) == self.target:
+                self.steps, self.i = p.steps, 0
+                return True
+        return False
+
+    def _plan(self, game):
+        self._follow(game, self.choose(game))
+
+    def _follow(self, game, best):
+        r, c, rot = best.pose
+        self.target = cells_key(game.current.kind, rot, r, c)
+        self.steps = best.steps
+        self.i = 0
+
+    def _repath(self, game):
+        """Re-search the way to the current target from where the piece is now; False if it is gone."""
+        cur = game.current
+        found = self.target and search(game.board, cur.kind, (cur.r, cur.c, cur.rot), self.target, self.gravity)
+        if found is None:
+            return False
+        self.steps, self.i = found.steps, 0
+        return True
+
+    def _on_path(self, cur):
+        if self.i == 0:
+            return True
+        pose = self.steps[self.i - 1][1]
+        if pose is None:
+            # a hold that was not carried out
+            return False
+        r, c, rot = pose
+        return cur.c == c and cur.rot == rot and cur.r >= r
+
+    def next_action(self, game):
+        cur = game.current
+        if cur is not self.piece:
+            self.piece = cur
+            self._plan(game)
+        elif not self._on_path(cur) and not self._repath(game):
+            self._plan(game)
+        # soft drops that gravity has already done are skipped
+        while self.i < len(self.steps) - 1:
+            action, (r, _, _) = self.steps[self.i]
+            if action != DOWN or cur.r < r:
+                break
+            self.i += 1
+        action = self.steps[min(self.i, len(self.steps) - 1)][0]
+        self.i += 1
+        return action
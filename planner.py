@@ -0,0 +1,218 @@
+"""
+Lookahead planner: beam search over the next-piece preview and the hold slot.
+
+Each ply places one piece (from the preview, or swapped with hold) and every
+child board of the ply is scored in one batched scorer call. The placements
+of a piece on a board are memoized in an LRU transposition table keyed by the
+packed board bits plus the piece kind. The first ply uses the real reachable
+placements (placement.search, with gravity); deeper plies use plain drops.
+"""
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from tetris_ai import PIECE_MASKS, HOLD, Board
+from features import candidate_features
+from placement import (
+    HeuristicScorer, PlacementAI, cells_key, candidate_frames, log_position, outcomes_from, search,
+)
+
+def board_key(board):
+    """All row bits packed into one int: exact, and cheap to hash."""
+    key = 0
+    for row in board.rows:
+        key = (key << board.n_cols) | row
+    return key
+
+class Children:
+    """
+    Every placement of one piece on one board and the boards they leave.
+    Boards are kept as tuples of ints, which the garbage collector does not
+    track, so a full table does not slow down collections.
+    """
+    __slots__ = ("poses", "states", "outcomes", "placements")
+
+    def __init__(self, board, kind, poses, placements=None):
+        self.poses = poses
+        self.placements = placements  # with paths; only for the root ply
+        states = []
+        lines = np.empty(len(poses), dtype=np.float32)
+        for i, (r, c, rot) in enumerate(poses):
+            after = board.copy()
+            after.merge(kind, rot, r, c)
+            lines[i] = after.clear_lines()
+            states.append((tuple(after.rows), tuple(after.heights), tuple(after.holes), tuple(after.row_fill)))
+        self.states = tuple(states)
+        rows = np.array([s[0] for s in states], dtype=np.int64).reshape(len(poses), board.n_rows)
+        self.outcomes = outcomes_from(rows, lines, board.n_cols).astype(np.float32)
+
+    def board(self, j, like):
+        b = Board(like.n_rows, like.n_cols)
+        rows, heights, holes, row_fill = self.states[j]
+        b.rows, b.heights, b.holes, b.row_fill = list(rows), list(heights), list(holes), list(row_fill)
+        return b
+
+def drop_poses(board, kind):
+    """Each distinct rotation/column hard-dropped from the top of the board."""
+    found = {}
+    for rot in range(4):
+        min_dr, _, min_dc, max_dc, _ = PIECE_MASKS[kind, rot]
+        top = -min_dr
+        for c in range(-min_dc, board.n_cols - max_dc):
+            if not board.fits(kind, rot, top, c):
+                continue
+            r = top
+            while board.fits(kind, rot, r + 1, c):
+                r += 1
+            found.setdefault(cells_key(kind, rot, r, c), (r, c, rot))
+    return tuple(found.values())
+
+class TranspositionTable:
+    def __init__(self, capacity=20000):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+
+    def children(self, board, kind):
+        key = (board_key(board), kind)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+        self.misses += 1
+        entry = Children(board, kind, drop_poses(board, kind))
+        self.entries[key] = entry
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return entry
+
+class Node:
+    __slots__ = ("board", "hold", "q", "lines", "first", "value", "piece_seq", "frame")
+
+    def __init__(self, board, hold, q, lines, first, value=0.0, piece_seq=0, frame=0):
+        self.board = board
+        self.hold = hold    # kind in the hold slot, or None
+        self.q = q          # index of the next piece in the planning sequence
+        self.lines = lines  # lines cleared since the root
+        self.first = first  # (use_hold, Placement) taken at the root
+        self.value = value
+        self.piece_seq = piece_seq  # FrameLogger piece_seq and frame the piece at q is scored with
+        self.frame = frame
+
+class BeamPlanner:
+    """
+    decide(game) -> (use_hold, Placement). width is the beam width; the search
+    stops at the end of the preview, or when time_limit seconds or max_nodes
+    child boards are used up, and returns the best node of the last full ply.
+    """
+    def __init__(self, scorer=None, width=8, preview=5, time_limit=0.1,
+                 max_nodes=20000, gravity=0, table=None):
+        self.scorer = scorer or HeuristicScorer()
+        self.width = width
+        self.preview = preview
+        self.time_limit = time_limit
+        self.max_nodes = max_nodes
+        self.gravity = gravity
+        self.table = table or TranspositionTable()
+        self.nodes = 0
+        self.depth = 0
+
+    def _options(self, node, seq):
+        """(use_hold, kind to place, hold after, q after) for the piece at node.q."""
+        if node.q >= len(seq):
+            return []
+        kind = seq[node.q]
+        options = [(False, kind, node.hold, node.q + 1)]
+        if node.hold is None:
+            if node.q + 1 < len(seq):
+                options.append((True, seq[node.q + 1], kind, node.q + 2))
+        elif node.hold != kind:
+            options.append((True, node.hold, kind, node.q + 1))
+        return options
+
+    def _root_children(self, game, use_hold, kind):
+        if use_hold:
+            start = (0, 4, 0)  # where the swapped-in piece spawns
+        else:
+            cur = game.current
+            start = (cur.r, cur.c, cur.rot)
+        placements = list(search(game.board, kind, start, gravity=self.gravity).values())
+        return Children(game.board, kind, tuple(p.pose for p in placements), placements)
+
+    def _expand(self, nodes, seq, game, deadline):
+        """All children of nodes, scored in one call. None if the budget ran out."""
+        parents, frames, outcomes, kids = [], [], [], []
+        features = getattr(self.scorer, "features", False)
+        for node in nodes:
+            for use_hold, kind, hold, q in self._options(node, seq):
+                if node.first is None:
+                    if use_hold and game.hold_used:
+                        continue
+                    children = self._root_children(game, use_hold, kind)
+                else:
+                    children = self.table.children(node.board, kind)
+                if not children.poses:
+                    continue
+                out = children.outcomes.copy()
+                out[:, 1] += node.lines
+                # holding spawns the swapped-in piece, which the logger counts as a new piece
+                piece_seq = node.piece_seq + use_hold
+                rows = candidate_frames(kind, children.poses, node.board.heights, piece_seq, node.frame)
+                if features:
+                    rows = np.hstack([rows, candidate_features(node.board, len(rows))])
+                frames.append(rows)
+                outcomes.append(out)
+                parents.append((node, use_hold, hold, q, children, piece_seq))
+                kids.append(len(children.poses))
+                self.nodes += len(children.poses)
+            if node.first is not None and (self.nodes > self.max_nodes or time.perf_counter() > deadline):
+                return None
+        if not parents:
+            return []
+        scores = self.scorer(np.concatenate(frames), np.concatenate(outcomes))
+        best = np.argsort(-scores, kind="stable")[:self.width]
+        offsets = np.cumsum([0] + kids)
+        out = []
+        for i in best:
+            g = int(np.searchsorted(offsets, i, side="right")) - 1
+            node, use_hold, hold, q, children, piece_seq = parents[g]
+            j = i - offsets[g]
+            first = node.first or (use_hold, children.placements[j])
+            board = children.board(j, node.board)
+            out.append(Node(board, hold, q, outcomes[g][j, 1], first, float(scores[i]), piece_seq + 1, node.frame))
+        return out
+
+    def decide(self, game):
+        deadline = time.perf_counter() + self.time_limit
+        seq = [game.current.kind] + game.next_src.peek_kinds(self.preview)
+        self.nodes = 0
+        root = Node(game.board, game.hold_kind, 0, 0, None, 0.0, *log_position(game))
+        beam = self._expand([root], seq, game, deadline)
+        self.depth = 1
+        while True:
+            nxt = self._expand(beam, seq, game, deadline)
+            if not nxt:
+                break
+            beam = nxt
+            self.depth += 1
+        return beam[0].first
+
+class LookaheadAI(PlacementAI):
+    """PlacementAI whose per-piece choice comes from a BeamPlanner; may press hold."""
+    def __init__(self, planner):
+        super().__init__(planner.scorer, planner.gravity)
+        self.planner = planner
+
+    def _plan(self, game):
+        use_hold, best = self.planner.decide(game)
+        self.evaluations += 1
+        self.i = 0
+        if use_hold:
+            # the swapped-in piece is planned again when it spawns
+            self.target, self.steps = None, [(HOLD, None)]
+        else:
+            r, c, rot = best.pose
+            self.target = cells_key(game.current.kind, rot, r, c)
+            self.steps = best.steps
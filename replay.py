@@ -0,0 +1,123 @@
+"""
+Input replays (.trp): a game stored as its piece seed plus its input stream.
+
+Games are deterministic given NextSource's seed and the action passed to
+Game.step on every tick, so a replay keeps only the non-NOOP actions with
+their tick numbers and re-simulating it reproduces the game, and its frame
+log, exactly. A .trp file is:
+    b"TRP\0" magic, uint32 header length, UTF-8 JSON header, packed events.
+The header holds the format version, the seed, the board size, the gravity
+interval in ticks, the number of ticks played and the final
+score/lines/pieces; events are (uint32 tick, uint8 action) records in tick
+order.
+
+Usage:
+    python replay.py to-log tetris_frames_numeric_*.trp [--format tfl]
+"""
+import argparse, json, os, struct, sys, time
+
+import numpy as np
+
+from tetris_ai import ROWS, COLS, NOOP, FrameLogger, Game, NextSource
+
+MAGIC = b"TRP\0"
+REPLAY_VERSION = 1
+EVENT_DTYPE = np.dtype([("tick", "<u4"), ("action", "u1")])
+
+class ReplayRecorder:
+    """Pass as Game(recorder=...); keeps the non-NOOP inputs of every tick."""
+    def __init__(self, seed, rows=ROWS, cols=COLS):
+        self.seed = seed
+        self.rows = rows
+        self.cols = cols
+        self.events = []
+
+    def record(self, tick, action):
+        if action != NOOP:
+            self.events.append((tick, action))
+
+    def save(self, path, game):
+        header = json.dumps({
+            "version": REPLAY_VERSION,
+            "seed": self.seed,
+            "rows": self.rows,
+            "cols": self.cols,
+            "gravity_every": game.gravity_every,
+            "ticks": game.ticks,
+            "score": game.score,
+            "lines": game.lines,
+            "pieces": game.pieces,
+            "recorded": time.strftime("%Y%m%d-%H%M%S"),
+        }).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", len(header)) + header)
+            f.write(np.array(self.events, dtype=EVENT_DTYPE).tobytes())
+        return path
+
+def read_replay(path):
+    """Return (header, events) where events is a structured (tick, action) array."""
+    with open(path, "rb") as f:
+        if f.read(4) != MAGIC:
+            raise ValueError(f"{path}: not a replay")
+        (size,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(size).decode("utf-8"))
+        if header["version"] != REPLAY_VERSION:
+            raise ValueError(f"{path}: unsupported replay version {header['version']}")
+        events = np.frombuffer(f.read(), dtype=EVENT_DTYPE)
+    return header, events
+
+def simulate(path, logger=None, check=True):
+    """
+    Re-play a replay headlessly, logging frames to logger if given; returns
+    the finished Game. With check, a game that ends differently from the
+    recording (e.g. after a rule change) raises ValueError.
+    """
+    header, events = read_replay(path)
+    state = Game(logger, NextSource(header["seed"]), header["rows"], header["cols"],
+                 gravity_every=header.get("gravity_every", 1))
+    ticks = events["tick"].tolist()
+    actions = events["action"].tolist()
+    i = 0
+    for tick in range(header["ticks"]):
+        action = NOOP
+        if i < len(ticks) and ticks[i] == tick:
+            action = actions[i]
+            i += 1
+        state.step(action)
+    if check and (state.score, state.lines, state.pieces) != (header["score"], header["lines"], header["pieces"]):
+        raise ValueError(f"{path}: re-simulation diverged from the recorded game")
+    return state
+
+def to_log(path, fmt="csv", out=None, check=True):
+    """Regenerate the frame log of a replay; returns its path."""
+    header, _ = read_replay(path)
+    if fmt == "tfl":
+        from framelog import BinaryFrameLogger as logger_cls
+    else:
+        logger_cls = FrameLogger
+    out = out or path.rsplit(".", 1)[0] + logger_cls.ext
+    logger = logger_cls(cols=header["cols"], rows=header["rows"], filename=out)
+    try:
+        simulate(path, logger, check)
+    finally:
+        logger.save_csv()
+    return out
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description="Replay tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("to-log", help="regenerate the frame log of each replay")
+    conv.add_argument("replays", nargs="+")
+    conv.add_argument("--format", choices=("csv", "tfl"), default="csv")
+    conv.add_argument("--out-dir", default=None, help="default: next to each replay")
+    conv.add_argument("--no-check", action="store_true", help="do not require the recorded outcome")
+    args = parser.parse_args(argv)
+    for path in args.replays:
+        out = None
+        if args.out_dir:
+            os.makedirs(args.out_dir, exist_ok=True)
+            out = os.path.join(args.out_dir, os.path.basename(path).rsplit(".", 1)[0] + "." + args.format)
+        print(to_log(path, args.format, out, not args.no_check))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Fixed-timestep pacing and an AI worker thread for the game loop.
+
+FixedStep hands out simulation ticks at a constant rate, independent of
+how long input, rendering or the AI take; gravity speed is a number of
+ticks (Game.gravity_every), so the game runs at the same pace on any
+machine. After a stall it catches up a few ticks and then drops the rest
+rather than fast-forwarding the game.
+
+AIWorker runs ai.next_action on its own thread. The loop posts it a
+detached snapshot of the game whenever it is idle and picks up the action
+on a later tick; an action is applied only if the piece has not moved
+since its snapshot (gravity may have pulled it down meanwhile), otherwise
+it is dropped and the AI thinks again on the new state. Slow inference
+then delays the AI's moves but never gravity, input or rendering.
+"""
+import copy, queue, threading, time
+from types import SimpleNamespace
+
+from tetris_ai import Piece
+
+class FixedStep:
+    def __init__(self, rate, max_catchup=5):
+        self.dt = 1 / rate
+        self.max_catchup = max_catchup
+        self.next = time.perf_counter()
+        self.ticks = self.dropped = 0
+
+    def remaining(self):
+        """Seconds until the next tick is due (<= 0 once it is)."""
+        return self.next - time.perf_counter()
+
+    def due(self):
+        """Number of ticks to run now, advancing the schedule past them."""
+        now = time.perf_counter()
+        if now < self.next:
+            return 0
+        n = int((now - self.next) / self.dt) + 1
+        if n > self.max_catchup:
+            self.dropped += n - self.max_catchup
+            self.next += (n - self.max_catchup) * self.dt
+            n = self.max_catchup
+        self.next += n * self.dt
+        self.ticks += n
+        return n
+
+def piece_key(game):
+    """Changes whenever the falling piece moves, rotates, locks or is held."""
+    cur = game.current
+    return (game.pieces, game.hold_used, cur.kind, cur.r, cur.c, cur.rot)
+
+class AIWorker:
+    def __init__(self, ai):
+        self.ai = ai
+        self.busy = False
+        self._inbox = queue.Queue()
+        self._outbox = queue.Queue()
+        # the AI tells pieces apart by identity, so each real piece gets one stand-in
+        self._source = self._shadow = None
+        self._thread = threading.Thread(target=self._run, name="ai-worker", daemon=True)
+        self._thread.start()
+
+    def snapshot(self, game):
+        """A copy of game the AI can read while the loop keeps changing the real one."""
+        cur = game.current
+        if cur is not self._source:
+            self._source, self._shadow = cur, Piece(cur.kind)
+        self._shadow.kind, self._shadow.r, self._shadow.c, self._shadow.rot = cur.kind, cur.r, cur.c, cur.rot
+        snap = copy.copy(game)
+        snap.board = game.board.copy()
+        snap.current = self._shadow
+        snap.next_src = copy.copy(game.next_src)
+        snap.next_src.bag, snap.next_src.next_bag = game.next_src.bag[:], game.next_src.next_bag[:]
+        snap.logger = game.logger and SimpleNamespace(piece_seq=game.logger.piece_seq, frame=game.logger.frame)
+        snap.recorder = None
+        return snap
+
+    def post(self, game):
+        """Start thinking about game unless already busy."""
+        if self.busy or game.over:
+            return False
+        self.busy = True
+        self._inbox.put((piece_key(game), self.snapshot(game)))
+        return True
+
+    def poll(self, game):
+        """The action decided for game's current state, or None (not ready, or stale)."""
+        try:
+            key, action = self._outbox.get_nowait()
+        except queue.Empty:
+            return None
+        self.busy = False
+        if isinstance(action, BaseException):
+            raise action
+        return action if key == piece_key(game) else None
+
+    def _run(self):
+        while True:
+            item = self._inbox.get()
+            if item is None:
+                return
+            key, snap = item
+            try:
+                action = self.ai.next_action(snap)
+            except BaseException as e:
+                action = e
+            self._outbox.put((key, action))
+
+    def close(self):
+        self._inbox.put(None)
+        self._thread.join()
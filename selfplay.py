@@ -0,0 +1,137 @@
+"""
+Headless self-play data generator.
+
+Games run in a process pool, one output shard per task, written by the same
+loggers as the curses game (FrameLogger CSV or BinaryFrameLogger .tfl), so
+the shards drop straight into dataset.build_dataset. Every shard gets its own
+seed; games inside a shard are seeded from it, so any shard can be
+regenerated alone. A manifest.json listing every shard is written last.
+
+Usage:
+    python selfplay.py --policy heuristic --games 2000 --out selfplay_data
+    python selfplay.py --policy model --workers 8 --format csv
+"""
+import argparse, json, os, random, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from tetris_ai import FrameLogger, Game, NextSource, HARD_DROP, load_model
+from framelog import BinaryFrameLogger
+
+POLICIES = ("random", "heuristic", "model")
+
+class ShardCSVLogger(FrameLogger):
+    """FrameLogger without the per-row flush; a shard is only read once it is closed."""
+    def _write(self, row):
+        self.writer.writerow(row)
+
+LOGGERS = {"csv": ShardCSVLogger, "tfl": BinaryFrameLogger}
+
+class RandomPolicy:
+    """Uniformly random inputs, one per tick."""
+    def __init__(self, rng):
+        self.rng = rng
+
+    def next_action(self, game):
+        return self.rng.randrange(HARD_DROP + 1)
+
+_policy_args = None
+
+def _init_worker(policy, model_path):
+    # the model is loaded once per worker, not once per game
+    global _policy_args
+    _policy_args = (policy, load_model(model_path) if policy == "model" else None)
+
+def make_policy(policy, model, rng):
+    if policy == "random":
+        return RandomPolicy(rng)
+    from placement import PlacementAI, HeuristicScorer, ModelScorer
+    scorer = ModelScorer(model) if policy == "model" else HeuristicScorer()
+    # headless, every decision is followed by exactly one gravity step
+    return PlacementAI(scorer, gravity=1)
+
+def play_shard(index, seed, games, path, fmt, max_pieces):
+    """Play `games` games into one shard file; returns its manifest entry."""
+    policy, model = _policy_args
+    start = time.perf_counter()
+    logger = LOGGERS[fmt](filename=path)
+    rng = random.Random(seed)
+    entry = {"shard": index, "file": os.path.basename(path), "seed": seed,
+             "games": games, "pieces": 0, "lines": 0, "score": 0}
+    for _ in range(games):
+        state = Game(logger=logger, next_src=NextSource(rng.getrandbits(64)))
+        ai = make_policy(policy, model, rng)
+        while not state.over and state.pieces < max_pieces:
+            state.step(ai.next_action(state))
+        entry["pieces"] += state.pieces
+        entry["lines"] += state.lines
+        entry["score"] += state.score
+    entry["frames"] = logger.total_frames
+    logger.save_csv()
+    entry["seconds"] = round(time.perf_counter() - start, 3)
+    return entry
+
+def shard_seeds(seed, n):
+    """Independent 32-bit seeds, one per shard."""
+    return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(n)]
+
+def generate(out="selfplay_data", policy="heuristic", games=1000, shards=None, workers=None,
+             fmt="tfl", seed=0, max_pieces=500, model_path="tetris_model1.pkl"):
+    workers = workers or os.cpu_count()
+    shards = min(shards or workers * 4, games)
+    os.makedirs(out, exist_ok=True)
+    per_shard = [games // shards + (i < games % shards) for i in range(shards)]
+    seeds = shard_seeds(seed, shards)
+
+    start = time.perf_counter()
+    entries = []
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(policy, model_path)) as pool:
+        futures = [
+            pool.submit(play_shard, i, seeds[i], per_shard[i],
+                        os.path.join(out, f"shard-{i:05d}.{fmt}"), fmt, max_pieces)
+            for i in range(shards)
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            entries.append(future.result())
+            print(f"\r{done}/{shards} shards", end="", flush=True)
+    print()
+    entries.sort(key=lambda e: e["shard"])
+    seconds = time.perf_counter() - start
+
+    manifest = {
+        "policy": policy,
+        "model": model_path if policy == "model" else None,
+        "format": fmt,
+        "seed": seed,
+        "max_pieces": max_pieces,
+        "workers": workers,
+        "games": games,
+        "frames": sum(e["frames"] for e in entries),
+        "pieces": sum(e["pieces"] for e in entries),
+        "seconds": round(seconds, 3),
+        "shards": entries,
+    }
+    with open(os.path.join(out, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    print(f"{manifest['frames']} frames, {manifest['pieces']} pieces in {seconds:.1f}s "
+          f"({manifest['frames'] / max(seconds, 1e-9):.0f} frames/s)")
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate frame logs from headless self-play.")
+    parser.add_argument("--policy", choices=POLICIES, default="heuristic")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--shards", type=int, default=None, help="default: 4 per worker")
+    parser.add_argument("--workers", type=int, default=None, help="default: one per core")
+    parser.add_argument("--format", choices=sorted(LOGGERS), default="tfl")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-pieces", type=int, default=500, help="cap on pieces per game")
+    parser.add_argument("--model", default="tetris_model1.pkl")
+    parser.add_argument("--out", default="selfplay_data")
+    args = parser.parse_args()
+    generate(args.out, args.policy, args.games, args.shards, args.workers,
+             args.format, args.seed, args.max_pieces, args.model)
+
+if __name__ == "__main__":
+    main()
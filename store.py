@@ -0,0 +1,172 @@
+"""
+Content-addressed store for frame logs.
+
+Every game file added is keyed by the SHA-1 of its frames (the FrameLogger
+columns in canonical .tfl types), so a file and its copies, or a CSV and its
+.tfl conversion, are stored once. Objects are kept as .tfl under
+objects/<2 hex>/<digest>.tfl; index.json maps each digest to its metadata
+(every source path it was added from, frames, pieces, score, lines) and
+caches the digest of each source by size and mtime.
+
+Usage:
+    python store.py add archive_data
+    python store.py list --min-pieces 50
+    python store.py export ./data --min-pieces 50
+"""
+import argparse, hashlib, json, os, shutil, sys, time
+
+import numpy as np
+
+from tetris_ai import ROWS, frame_columns
+from framelog import load_frames, record_dtype, write_tfl
+from dataset import SOURCE_EXTS
+
+STORE_VERSION = 1
+
+def frames_digest(records, rows=ROWS):
+    """Hash of the frame columns only: independent of file format and the old time column."""
+    cols = sum(1 for name in records.dtype.names if name.startswith("col_h_"))
+    canonical = np.empty(len(records), dtype=record_dtype(frame_columns(cols), rows))
+    for name in canonical.dtype.names:
+        canonical[name] = records[name]
+    h = hashlib.sha1(f"{cols}:".encode())
+    h.update(canonical.tobytes())
+    return h.hexdigest()
+
+def game_stats(records):
+    """Frames, pieces, lines and score, scored as Game does (100 per piece, 500 per line)."""
+    locked = records["locked"] == 1
+    pieces = int(locked.sum())
+    lines = int(records["lines_cleared"][locked].astype(np.int64).sum())
+    return {"frames": len(records), "pieces": pieces, "lines": lines, "score": 100 * pieces + 500 * lines}
+
+def walk_sources(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                for name in sorted(files):
+                    if name.endswith(SOURCE_EXTS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+class Store:
+    def __init__(self, root="store"):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self.games, self.sources = {}, {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                data = json.load(f)
+            if data["version"] != STORE_VERSION:
+                raise ValueError(f"{self.index_path}: unsupported store version {data['version']}")
+            self.games, self.sources = data["games"], data["sources"]
+
+    def path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest + ".tfl")
+
+    def add(self, source):
+        """Store one frame log; returns (digest, True if its content was new)."""
+        key = os.path.abspath(source)
+        st = os.stat(source)
+        known = self.sources.get(key)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns and known[2] in self.games:
+            return known[2], False
+        records = load_frames(source)
+        digest = frames_digest(records)
+        self.sources[key] = [st.st_size, st.st_mtime_ns, digest]
+        entry = self.games.get(digest)
+        if entry is not None:
+            if key not in entry["sources"]:
+                entry["sources"].append(key)
+            return digest, False
+        out = self.path(digest)
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        write_tfl(out + ".tmp", records)
+        os.replace(out + ".tmp", out)
+        self.games[digest] = dict(
+            game_stats(records), sources=[key], has_time="time" in records.dtype.names,
+            added=time.strftime("%Y%m%d-%H%M%S"),
+        )
+        return digest, True
+
+    def add_all(self, paths, verbose=True):
+        added = seen = 0
+        for source in walk_sources(paths):
+            _, new = self.add(source)
+            added += new
+            seen += 1
+        self.save()
+        if verbose:
+            print(f"{seen} files, {added} new games, {seen - added} duplicates or already stored; {len(self.games)} games in store")
+        return added
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.index_path + ".tmp", "w") as f:
+            json.dump({"version": STORE_VERSION, "games": self.games, "sources": self.sources}, f, indent=1)
+        os.replace(self.index_path + ".tmp", self.index_path)
+
+    def query(self, min_pieces=0, min_frames=0, min_score=0, min_lines=0, source=None, where=None):
+        """
+        Digests of the games passing every filter, in a stable order. source
+        matches a substring of any source path; where(meta) is a custom test.
+        """
+        out = []
+        for digest, meta in sorted(self.games.items()):
+            if (meta["pieces"] < min_pieces or meta["frames"] < min_frames
+                    or meta["score"] < min_score or meta["lines"] < min_lines):
+                continue
+            if source is not None and not any(source in s for s in meta["sources"]):
+                continue
+            if where is not None and not where(meta):
+                continue
+            out.append(digest)
+        return out
+
+    def export(self, digests, folder):
+        """Link (or copy) the games into folder, ready for dataset.build_dataset."""
+        os.makedirs(folder, exist_ok=True)
+        for digest in digests:
+            dst = os.path.join(folder, digest + ".tfl")
+            if os.path.exists(dst):
+                continue
+            try:
+                os.link(self.path(digest), dst)
+            except OSError:
+                shutil.copyfile(self.path(digest), dst)
+        return folder
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description="Content-addressed frame log store.")
+    parser.add_argument("--store", default="store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="add frame logs or folders of them")
+    add.add_argument("paths", nargs="+")
+    filters = argparse.ArgumentParser(add_help=False)
+    for name in ("pieces", "frames", "score", "lines"):
+        filters.add_argument(f"--min-{name}", type=int, default=0)
+    filters.add_argument("--source", default=None, help="substring of a source path")
+    sub.add_parser("list", parents=[filters], help="list matching games")
+    export = sub.add_parser("export", parents=[filters], help="link matching games into a folder")
+    export.add_argument("folder")
+    args = parser.parse_args(argv)
+
+    store = Store(args.store)
+    if args.command == "add":
+        store.add_all(args.paths)
+        return
+    digests = store.query(args.min_pieces, args.min_frames, args.min_score, args.min_lines, args.source)
+    if args.command == "list":
+        for digest in digests:
+            meta = store.games[digest]
+            print(f"{digest}  frames {meta['frames']:6d}  pieces {meta['pieces']:5d}  "
+                  f"lines {meta['lines']:4d}  score {meta['score']:7d}  {meta['sources'][0]}")
+        print(f"{len(digests)} games")
+    else:
+        store.export(digests, args.folder)
+        print(f"{len(digests)} games in {args.folder}")
+
+if __name__ == "__main__":
+    main()
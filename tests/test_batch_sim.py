@@ -0,0 +1,48 @@
+import os, random, sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import tetris_ai as t
+from batch_sim import BatchSim
+
+class SimKinds:
+    """NextSource for a Game that hands out whatever env i of the BatchSim just spawned."""
+    def __init__(self, sim, i):
+        self.sim, self.i = sim, i
+    def next_kind(self):
+        return t.ORDER[self.sim.kind[self.i]]
+
+@pytest.mark.parametrize("gravity_every", [1, 3])
+def test_matches_game_step(gravity_every):
+    """Every env of a BatchSim stays tick for tick equal to a Game fed the same pieces and actions."""
+    n = 8
+    sim = BatchSim(n, seed=5, gravity_every=gravity_every)
+    games = [t.Game(next_src=SimKinds(sim, i), gravity_every=gravity_every) for i in range(n)]
+    rng = random.Random(5)
+    # mostly moves and rotations so pieces travel; drops and holds now and then
+    weights = [4, 6, 6, 2, 4, 3, 1, 1]
+    locks = restarts = 0
+    for tick in range(1500):
+        actions = np.array(rng.choices(range(8), weights, k=n))
+        locked, cleared = sim.step(actions)
+        locks += locked.sum()
+        for i, g in enumerate(games):
+            g.step(int(actions[i]))
+            assert bool(sim.done[i]) == g.over, (tick, i)
+            if g.over:
+                continue
+            cur = g.current
+            assert (sim.kind[i], sim.rot[i], sim.r[i], sim.c[i]) == (t.ORDER.index(cur.kind), cur.rot, cur.r, cur.c), (tick, i)
+            assert (sim.score[i], sim.lines[i], sim.pieces[i], sim.ticks[i]) == (g.score, g.lines, g.pieces, g.ticks), (tick, i)
+            assert sim.boards[i].tolist() == [[bool(x) for x in g.board[r]] for r in range(t.ROWS)], (tick, i)
+            assert sim.heights()[i].tolist() == t.column_heights(g.board)
+        if sim.done.any():
+            sim.reset(sim.done)
+            for i in np.flatnonzero(~sim.done & np.array([g.over for g in games])):
+                games[i] = t.Game(next_src=SimKinds(sim, i), gravity_every=gravity_every)
+                restarts += 1
+    assert locks > 10 * n and restarts > 0
@@ -0,0 +1,39 @@
+import glob, os, shutil, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import dataset
+
+SOURCES = sorted(glob.glob(os.path.join(ROOT, "archive_data", "ethan_data_nullmovement", "*.csv")))[:3]
+
+def cache_files(cache_dir, prefix):
+    return sorted(name for name in os.listdir(cache_dir) if name.startswith(prefix))
+
+def test_new_sources_replace_the_old_bundle(tmp_path):
+    """Each new set of sources gets one bundle, and the bundles of earlier sets are deleted."""
+    data = tmp_path / "data"
+    data.mkdir()
+    cache = str(data / ".cache")
+    sizes = []
+    for source in SOURCES:
+        shutil.copy(source, data)
+        X, y = dataset.build_dataset(str(data), verbose=False)
+        sizes.append(len(X))
+        bundles = cache_files(cache, "bundle-")
+        assert bundles == sorted(os.path.basename(p) for p in (X.filename, y.filename))
+        del X, y
+    assert sizes == sorted(set(sizes))
+
+    # back to a set seen before: rebuilt from the per-file cache, the rest pruned
+    os.remove(data / os.path.basename(SOURCES[-1]))
+    X, _ = dataset.build_dataset(str(data), verbose=False)
+    assert len(X) == sizes[-2]
+    assert len(cache_files(cache, "bundle-")) == 2
+    assert len(os.listdir(os.path.join(cache, "files"))) == len(SOURCES)
+
+def test_prune_cache_only_touches_matching_names(tmp_path):
+    for name in ("bundle-0123456789abcdef-X.npy", "bundle-0123456789abcdef-X-scaled.npy", "notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    assert dataset.prune_cache(str(tmp_path), r"bundle-[0-9a-f]{16}-[Xy]\.npy", set()) == ["bundle-0123456789abcdef-X.npy"]
+    assert sorted(os.listdir(tmp_path)) == ["bundle-0123456789abcdef-X-scaled.npy", "notes.txt"]
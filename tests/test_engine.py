@@ -0,0 +1,147 @@
+import os, pickle, random, sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import tetris_ai as t
+
+# -------- Reference rules: the list-of-lists engine the bitboard replaced --------
+
+def ref_can_place(cells, kind, rot, r, c):
+    n_rows, n_cols = len(cells), len(cells[0])
+    for dr, dc in t.PIECES[kind][rot]:
+        rr, cc = r + dr, c + dc
+        if not (0 <= rr < n_rows and 0 <= cc < n_cols) or cells[rr][cc]:
+            return False
+    return True
+
+def ref_try_rotate(cells, piece, rot_dir):
+    new_rot = (piece.rot + rot_dir) % 4
+    if piece.kind == "I":
+        kicks = t.I_KICKS.get((piece.rot, new_rot), [(0, 0)])
+    elif piece.kind == "O":
+        kicks = [(0, 0)]
+    else:
+        kicks = t.JLSTZ_KICKS.get((piece.rot, new_rot), [(0, 0)])
+    for dr, dc in kicks:
+        if ref_can_place(cells, piece.kind, new_rot, piece.r + dr, piece.c + dc):
+            return piece.r + dr, piece.c + dc, new_rot
+    return None
+
+def ref_lock(cells, piece):
+    for dr, dc in t.PIECES[piece.kind][piece.rot]:
+        cells[piece.r + dr][piece.c + dc] = 1
+    kept = [row for row in cells if not all(row)]
+    cleared = len(cells) - len(kept)
+    return [[0]*len(cells[0]) for _ in range(cleared)] + kept, cleared
+
+def ref_garbage(cells, n, hole):
+    n = min(n, len(cells))
+    row = [0 if c == hole else 1 for c in range(len(cells[0]))]
+    return cells[n:] + [row[:] for _ in range(n)]
+
+def ref_heights_holes(cells):
+    n_rows = len(cells)
+    heights, holes = [], []
+    for c in range(len(cells[0])):
+        col = [cells[r][c] for r in range(n_rows)]
+        top = col.index(1) if 1 in col else n_rows
+        heights.append(n_rows - top)
+        holes.append(col[top:].count(0))
+    return heights, holes
+
+def assert_same(board, cells):
+    assert [board[r] for r in range(board.n_rows)] == cells
+    heights, holes = ref_heights_holes(cells)
+    assert board.heights == heights
+    assert board.holes == holes
+    assert board.row_fill == [sum(row) for row in cells]
+    assert t.column_heights(board) == heights
+
+# -------- Tests --------
+
+@pytest.mark.parametrize("n_rows,n_cols", [(20, 10), (12, 6)])
+@pytest.mark.parametrize("seed", range(4))
+def test_random_play_matches_reference(seed, n_rows, n_cols):
+    """Random moves, locks, clears and garbage leave the bitboard equal to the list-of-lists rules."""
+    rng = random.Random(seed)
+    board, cells = None, None
+    locks = clears = 0
+    while locks < 300:
+        p = t.Piece(rng.choice(t.ORDER))
+        p.c = n_cols // 2 - 1
+        if board is None or not ref_can_place(cells, p.kind, p.rot, p.r, p.c):
+            assert board is None or not t.can_place(board, p)
+            # garbage rows with one gap each make line clears common
+            board = t.Board(n_rows, n_cols)
+            cells = [[0]*n_cols for _ in range(n_rows)]
+            for _ in range(3):
+                hole = rng.randrange(n_cols)
+                board.add_garbage(1, hole)
+                cells = ref_garbage(cells, 1, hole)
+            continue
+        for _ in range(rng.randrange(12)):
+            move = rng.randrange(4)
+            if move == 3:
+                rot_dir = rng.choice((1, -1))
+                expected = ref_try_rotate(cells, p, rot_dir)
+                before = (p.r, p.c, p.rot)
+                ok = t.try_rotate(board, p, rot_dir)
+                if expected is None:
+                    assert not ok and (p.r, p.c, p.rot) == before
+                else:
+                    assert ok and (p.r, p.c, p.rot) == expected
+                continue
+            dc = (-1, 1, 0)[move]
+            fits = ref_can_place(cells, p.kind, p.rot, p.r, p.c + dc)
+            assert t.can_place(board, p, c_off=dc) == fits
+            if fits:
+                p.c += dc
+        while ref_can_place(cells, p.kind, p.rot, p.r + 1, p.c):
+            assert t.can_place(board, p, r_off=1)
+            p.r += 1
+        assert not t.can_place(board, p, r_off=1)
+        assert t.piece_leftmost_col(p) == p.c + min(dc for _, dc in p.blocks())
+        t.merge(board, p, 1)
+        board, cleared = t.clear_lines(board)
+        cells, expected = ref_lock(cells, p)
+        assert cleared == expected
+        locks += 1
+        clears += cleared
+        if rng.random() < 0.1:
+            n, hole = rng.randrange(1, 4), rng.randrange(n_cols)
+            ok = board.add_garbage(n, hole)
+            assert ok == (not any(any(row) for row in cells[:n]))
+            cells = ref_garbage(cells, n, hole)
+        assert_same(board, cells)
+    assert clears > 0
+
+def test_fits_every_pose_matches_reference():
+    """fits() agrees with the cell-by-cell rule for every piece, rotation and position, off-board ones included."""
+    rng = random.Random(7)
+    board = t.Board()
+    cells = [[int(r > 8 and rng.random() < 0.5) for _ in range(t.COLS)] for r in range(t.ROWS)]
+    for r, row in enumerate(cells):
+        board.rows[r] = sum(bit << c for c, bit in enumerate(row))
+    board.rescan()
+    assert_same(board, cells)
+    for kind in t.ORDER:
+        for rot in range(4):
+            for r in range(-3, t.ROWS + 3):
+                for c in range(-3, t.COLS + 3):
+                    assert board.fits(kind, rot, r, c) == ref_can_place(cells, kind, rot, r, c), (kind, rot, r, c)
+
+def test_copy_and_pickle_are_independent():
+    board = t.Board()
+    p = t.Piece("T")
+    p.r, p.c = 18, 1
+    t.merge(board, p, 1)
+    for clone in (board.copy(), pickle.loads(pickle.dumps(board))):
+        assert (clone.rows, clone.heights, clone.holes, clone.row_fill) == (board.rows, board.heights, board.holes, board.row_fill)
+        assert clone.fit is board.fit
+        p.c = 5
+        t.merge(clone, p, 1)
+        assert clone.rows != board.rows and clone.heights != board.heights
+        p.c = 1
@@ -0,0 +1,27 @@
+import glob, os, shutil, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dataset import build_dataset
+from features import FEATURE_SET_VERSION, build_features
+
+SOURCES = sorted(glob.glob(os.path.join(ROOT, "archive_data", "ethan_data_nullmovement", "*.csv")))[:2]
+
+def test_feature_matrices_are_pruned(tmp_path):
+    """build_features keeps one feature matrix, for the current files, and only current-version per-file features."""
+    data = tmp_path / "data"
+    data.mkdir()
+    cache = data / ".cache"
+    (cache / "features").mkdir(parents=True)
+    stale = cache / "features" / f"v{FEATURE_SET_VERSION + 1}-{'0' * 40}.npy"
+    stale.write_bytes(b"")
+    for source in SOURCES:
+        shutil.copy(source, data)
+        F = build_features(str(data), verbose=False)
+        X, _ = build_dataset(str(data), verbose=False)
+        assert len(F) == len(X)
+        assert [n for n in os.listdir(cache) if n.startswith("features-")] == [os.path.basename(F.filename)]
+        del F, X
+    assert not stale.exists()
+    assert len(os.listdir(cache / "features")) == len(SOURCES)
@@ -0,0 +1,106 @@
+import asyncio, json, os, sys, warnings
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import host as H
+from placement import PlacementAI
+from tetris_ai import load_model
+
+TICKS = 300
+
+@pytest.fixture(scope="module")
+def model():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # the shipped pickle was saved by another sklearn version
+        return load_model(os.path.join(ROOT, "tetris_model1.pkl"))
+
+def make_host(model, workers):
+    return H.Host(model, solo=4, versus=2, tick_rate=10, speed=2, seed=11, max_pieces=40, workers=workers)
+
+@pytest.mark.parametrize("workers", [0, 1])
+def test_batched_host_matches_per_ai_choose(model, workers, monkeypatch):
+    """One model call for every player picks the same placements as each AI choosing alone."""
+    batched, alone = make_host(model, workers), make_host(model, 0)
+
+    async def nothing():
+        pass
+    alone.decide = nothing  # every AI falls back to PlacementAI.choose in next_action
+
+    choose = PlacementAI.choose
+    calls = {"batched": 0, "alone": 0}
+    def counted(ai, game):
+        calls["batched" if any(ai in s.ais for s in batched.sessions.values()) else "alone"] += 1
+        return choose(ai, game)
+    monkeypatch.setattr(PlacementAI, "choose", counted)
+
+    async def play():
+        try:
+            for tick in range(TICKS):
+                await batched.tick()
+                await alone.tick()
+                for sid, session in batched.sessions.items():
+                    other = alone.sessions[sid]
+                    assert session.seed == other.seed
+                    for a, b in zip(session.games, other.games):
+                        assert (a.board.rows, a.pieces, a.score) == (b.board.rows, b.pieces, b.score), (tick, sid)
+        finally:
+            batched.close()
+    asyncio.run(play())
+
+    assert calls["batched"] == 0
+    assert calls["alone"] > 0
+    assert batched.stats["decisions"] == calls["alone"]
+
+def test_deltas_rebuild_the_state(model):
+    """A spectator folding every message with apply_message ends up with player_state each tick."""
+    h = make_host(model, 0)
+    subs = {sid: h.subscribe(sid)[1] for sid in h.sessions}
+    mirror = {sid: [] for sid in h.sessions}
+    kinds = set()
+
+    async def play():
+        for tick in range(TICKS):
+            await h.tick()
+            for sid, sub in subs.items():
+                while not sub.queue.empty():
+                    msg = json.loads(sub.queue.get_nowait())
+                    kinds.add(msg["type"])
+                    H.apply_message(mirror[sid], msg)
+                assert mirror[sid] == [H.player_state(g) for g in h.sessions[sid].games], (tick, sid)
+    asyncio.run(play())
+    assert kinds == {"full", "delta"}
+
+def test_player_delta_round_trip(model):
+    """player_delta carries exactly what apply_message needs to turn one state into the next."""
+    h = make_host(model, 0)
+    game = h.sessions[0].games[0]
+    old = H.player_state(game)
+    for _ in range(60):
+        asyncio.run(h.tick())
+    new = H.player_state(game)
+    delta = H.player_delta(old, new)
+    assert delta and set(delta) <= set(new)
+    players = [json.loads(json.dumps(old))]
+    H.apply_message(players, {"type": "delta", "players": [delta]})
+    assert players[0] == json.loads(json.dumps(new))
+    assert H.player_delta(new, new) == {}
+
+def test_repaths_run_in_the_candidate_jobs(model, monkeypatch):
+    """A piece knocked off its path is re-searched by the pool jobs, never by the AI on the event loop."""
+    h = make_host(model, 0)
+    monkeypatch.setattr(PlacementAI, "_repath", lambda ai, game: pytest.fail("searched on the event loop"))
+    resumed = []
+    resume = PlacementAI.resume
+    def counted(ai, game, placements):
+        resumed.append(resume(ai, game, placements))
+        return resumed[-1]
+    monkeypatch.setattr(PlacementAI, "resume", counted)
+
+    async def play():
+        for _ in range(TICKS):
+            await h.tick()
+    asyncio.run(play())
+    assert True in resumed
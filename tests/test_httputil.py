@@ -0,0 +1,16 @@
+import os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from httputil import DEFAULT_ORIGINS, cors_headers, encode
+
+def test_cors_allows_listed_origins_only():
+    allowed = set(DEFAULT_ORIGINS)
+    assert cors_headers(allowed, DEFAULT_ORIGINS[0]) == [("Access-Control-Allow-Origin", DEFAULT_ORIGINS[0]), ("Vary", "Origin")]
+    assert cors_headers(allowed, "https://elsewhere.example") == []
+    assert cors_headers(allowed, None) == []
+    assert cors_headers({"*"}, "https://elsewhere.example")[0] == ("Access-Control-Allow-Origin", "https://elsewhere.example")
+
+def test_encode_is_compact():
+    assert encode({"username": "zoë", "score": [1, 2]}) == '{"username":"zo\\u00eb","score":[1,2]}'.encode()
@@ -0,0 +1,121 @@
+import asyncio, json, os, sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+import leaderboard as lb
+
+def post(board, score, name="p"):
+    return board.handle("POST", "/scores", {}, json.dumps({"username": name, "score": score}).encode())
+
+def top(board, n=10):
+    return [e["score"] for e in json.loads(board.scores.best(n))]
+
+async def running(board, body):
+    flusher = asyncio.create_task(board.flusher())
+    await asyncio.sleep(0)
+    try:
+        # a commit that never resolves fails the test instead of hanging it
+        return await asyncio.wait_for(body(), 10)
+    finally:
+        flusher.cancel()
+        board.journal.close()
+
+def test_group_commit_and_reload(tmp_path, monkeypatch):
+    """Concurrent POSTs share one append and fsync, and everything acknowledged survives a restart."""
+    board = lb.Leaderboard(str(tmp_path), flush_interval=0.01)
+    appends = []
+    append = board.journal.append
+    monkeypatch.setattr(board.journal, "append", lambda lines: appends.append(len(lines)) or append(lines))
+
+    async def body():
+        return await asyncio.gather(*(post(board, s) for s in range(50)))
+    replies = asyncio.run(running(board, body))
+    assert all(status == 201 for status, _ in replies)
+    assert appends == [50]
+    assert sorted(json.loads(b)["id"] for _, b in replies) == list(range(1, 51))
+
+    again = lb.Leaderboard(str(tmp_path))
+    assert top(again, 5) == [49, 48, 47, 46, 45]
+    assert len(again.scores.by_id) == 50
+
+def test_failed_append_is_not_served_or_kept(tmp_path, monkeypatch):
+    board = lb.Leaderboard(str(tmp_path), flush_interval=0.001)
+
+    async def body():
+        assert (await post(board, 5))[0] == 201
+        monkeypatch.setattr(lb.os, "fsync", lambda fd: (_ for _ in ()).throw(OSError(28, "disk full")))
+        with pytest.raises(OSError):
+            await post(board, 9)
+        assert top(board) == [5]
+        monkeypatch.undo()
+        assert (await post(board, 7))[0] == 201
+    asyncio.run(running(board, body))
+    assert top(lb.Leaderboard(str(tmp_path))) == [7, 5]
+
+@pytest.mark.parametrize("fail", ["snapshot", "reopen"])
+def test_posts_commit_after_failed_compaction(tmp_path, monkeypatch, fail):
+    """A compaction that fails leaves the flusher running and every score on disk."""
+    board = lb.Leaderboard(str(tmp_path), flush_interval=0.001, compact_every=3)
+    failures = []
+    if fail == "snapshot":
+        def replace(src, dst):
+            failures.append(dst)
+            raise OSError(28, "disk full")
+        monkeypatch.setattr(lb.os, "replace", replace)
+    else:
+        real_open = open
+        def flaky_open(path, mode="r", *args, **kwargs):
+            if path == board.journal.log_path and not failures:
+                failures.append(path)
+                raise OSError(28, "disk full")
+            return real_open(path, mode, *args, **kwargs)
+        monkeypatch.setattr(lb, "open", flaky_open, raising=False)
+
+    async def body():
+        for score in range(8):
+            status, _ = await post(board, score)
+            assert status == 201
+    asyncio.run(running(board, body))
+    assert failures
+    monkeypatch.undo()
+
+    again = lb.Leaderboard(str(tmp_path))
+    assert sorted(e["score"] for e in again.scores.by_id.values()) == list(range(8))
+    again.journal.close()
+
+def test_load_drops_only_a_torn_last_line(tmp_path):
+    board = lb.Leaderboard(str(tmp_path), flush_interval=0.001)
+
+    async def body():
+        for score in (3, 4):
+            await post(board, score)
+    asyncio.run(running(board, body))
+    log = tmp_path / "scores.log"
+    good = log.read_bytes()
+
+    log.write_bytes(good + b'{"username":"x","sc')
+    again = lb.Leaderboard(str(tmp_path))
+    assert top(again) == [4, 3]
+    again.journal.close()
+    assert log.read_bytes() == good
+
+    log.write_bytes(b"garbage\n" + good)
+    with pytest.raises(ValueError):
+        lb.Leaderboard(str(tmp_path))
+
+@pytest.mark.parametrize("length", [b"abc", b"-3", b"1_0"])
+def test_bad_content_length_is_400(tmp_path, length):
+    board = lb.Leaderboard(str(tmp_path))
+
+    async def body():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"POST /scores HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n")
+        reader.feed_eof()
+        with pytest.raises(lb.HTTPError) as e:
+            await lb._read_request(reader)
+        assert e.value.status == 400
+    asyncio.run(body())
+    board.journal.close()
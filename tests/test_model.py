@@ -0,0 +1,56 @@
+import glob, os, shutil, sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import model
+from dataset import build_dataset
+
+SOURCES = sorted(glob.glob(os.path.join(ROOT, "archive_data", "ethan_data_nullmovement", "*.csv")))[:2]
+
+def test_scaled_memmaps_follow_their_bundle(tmp_path):
+    """scaled_memmap scales once per bundle, and drops the scaled copies of bundles that were pruned."""
+    data = tmp_path / "data"
+    data.mkdir()
+    cache = data / ".cache"
+    for source in SOURCES:
+        shutil.copy(source, data)
+        X, y = build_dataset(str(data), verbose=False)
+        scaler = model.fit_scaler(X)
+        scaled = model.scaled_memmap(X, scaler)
+        np.testing.assert_allclose(scaled, scaler.transform(X), rtol=1e-5, atol=1e-5)
+        model.scaled_memmap(y, model.fit_scaler(y))
+        stem = os.path.basename(X.filename)[:-len("-X.npy")]
+        assert sorted(n for n in os.listdir(cache) if n.endswith("-scaled.npy")) == [stem + "-X-scaled.npy", stem + "-y-scaled.npy"]
+        del X, y, scaled
+
+    # an existing scaled copy is reused as is
+    X, _ = build_dataset(str(data), verbose=False)
+    path = X.filename[:-len(".npy")] + "-scaled.npy"
+    mtime = os.stat(path).st_mtime_ns
+    model.scaled_memmap(X, model.fit_scaler(X))
+    assert os.stat(path).st_mtime_ns == mtime
+
+def test_first_update_scores_the_trained_files(tmp_path):
+    """The ledger of a full train knows its held-out rows, so the first update scores earlier files too."""
+    data = tmp_path / "data"
+    data.mkdir()
+    for source in SOURCES:
+        shutil.copy(source, data)
+    out = str(tmp_path / "m.pkl")
+    model.train(str(data), out)
+
+    ledger = model.Ledger(model.ledger_path(out))
+    X, _ = build_dataset(str(data), verbose=False)
+    (_, test_idx), = model.splits(len(X))
+    offsets = np.cumsum([0] + ledger.split["pairs"])
+    held = np.concatenate([ledger.held_out_rows(d) + offsets[i] for i, d in enumerate(ledger.split["digests"])])
+    assert held.tolist() == test_idx.tolist()
+
+    shutil.copy(sorted(glob.glob(os.path.join(ROOT, "archive_data", "ethan_data_nullmovement", "*.csv")))[2], data)
+    record = model.update(str(data), out, epochs=1)
+    assert record["files"] == 1
+    assert None not in record["held_out_earlier"] + record["held_out_new"]
+    assert model.Ledger(model.ledger_path(out)).split == ledger.split
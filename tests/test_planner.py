@@ -0,0 +1,46 @@
+import os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import tetris_ai as t
+from placement import HeuristicScorer
+from planner import BeamPlanner
+
+class Recording(HeuristicScorer):
+    """HeuristicScorer that keeps the (piece_seq, frame) columns of every call."""
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def __call__(self, frames, outcomes):
+        self.calls.append(frames[:, :2].astype(int))
+        return super().__call__(frames, outcomes)
+
+def test_plies_are_scored_at_their_logged_piece_seq(tmp_path):
+    """Each ply's frames carry the piece_seq its piece will be logged with, and the frame the root is at."""
+    game = t.Game(t.FrameLogger(filename=str(tmp_path / "game.csv")), t.NextSource(4))
+    for _ in range(5):
+        game.act(t.HARD_DROP)
+    game.act(t.LEFT)
+    seq, frame = game.logger.piece_seq, game.logger.frame
+    assert (seq, frame) == (5, 2)
+
+    scorer = Recording()
+    planner = BeamPlanner(scorer, width=4, preview=3, time_limit=10)
+    planner.decide(game)
+    game.logger.save_csv()
+    assert planner.depth == len(scorer.calls) >= 3
+    assert set(scorer.calls[0][:, 0]) == {seq, seq + 1}
+    for ply, cols in enumerate(scorer.calls):
+        assert (cols[:, 1] == frame).all()
+        # one piece per ply, plus one more spawn for every swap with hold on the way
+        assert seq + ply <= cols[:, 0].min() and cols[:, 0].max() <= seq + 2 * ply + 1
+
+def test_without_a_logger_plies_count_from_zero():
+    game = t.Game(next_src=t.NextSource(4))
+    scorer = Recording()
+    BeamPlanner(scorer, width=4, preview=2, time_limit=10).decide(game)
+    assert set(scorer.calls[0][:, 0]) == {0, 1}
+    assert set(scorer.calls[1][:, 0]) <= {1, 2, 3}
+    assert all((cols[:, 1] == 0).all() for cols in scorer.calls)
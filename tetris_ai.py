@@ -1,33 +1,18 @@
-import curses, time, random, csv, pickle, sys, os
+import curses, time, random, csv, sys, os
 
 ROWS, COLS = 20,10
 
 # -------- Board helpers --------
 
 def new_board():
-    board = []
-    for a in range(ROWS):
-        row = []
-        for b in range(COLS):
-            row.append(0)
-        board.append(row)
-    return board
+    return Board()
 
 def column_heights(board):
-    """Return list of 10 integers: height of each column (0..ROWS)."""
-    heights = [0]*COLS
-    for c in range(COLS):
-        h = 0
-        for r in range(ROWS):
-            if board[r][c] != 0:
-                h = ROWS - r
-                break
-        heights[c] = h
-    return heights
+    """Return a list with the height of each column (0..ROWS)."""
+    return board.heights[:]
 
 def piece_leftmost_col(piece):
-    xs = [piece.c + dc for (_, dc) in PIECES[piece.kind][piece.rot]]
-    return min(xs)
+    return piece.c + PIECE_MASKS[piece.kind, piece.rot][2]
 
 # -------- Pieces & rotation (SRS-like) --------
 
@@ -111,14 +96,172 @@ class Piece:
 
 def in_bounds(r,c): return 0 <= r < ROWS and 0 <= c < COLS
 
-def can_place(board, piece, r_off=0, c_off=0, rot=None):
-    rot = piece.rot if rot is None else rot
-    for dr,dc in PIECES[piece.kind][rot]:
-        r = piece.r + dr + r_off
-        c = piece.c + dc + c_off
-        if not in_bounds(r,c) or board[r][c] != 0:
+# -------- Bitboard engine --------
+
+def _build_piece_masks():
+    """
+    (kind, rot) -> (min_dr, max_dr, min_dc, max_dc, ((dr, rowmask, cols), ...)).
+    Row masks are aligned so bit 0 is the piece's leftmost column; cols are
+    the set bits of each row mask.
+    """
+    masks = {}
+    for kind, rots in PIECES.items():
+        for rot, blocks in enumerate(rots):
+            min_dc = min(dc for _, dc in blocks)
+            rows = {}
+            for dr, dc in blocks:
+                rows[dr] = rows.get(dr, 0) | (1 << (dc - min_dc))
+            masks[kind, rot] = (
+                min(rows), max(rows),
+                min_dc, max(dc for _, dc in blocks),
+                tuple((dr, m, _set_bits(m)) for dr, m in sorted(rows.items())),
+            )
+    return masks
+
+def _set_bits(mask):
+    """Column indices of the set bits in a row mask."""
+    return tuple(c for c in range(mask.bit_length()) if (mask >> c) & 1)
+
+PIECE_MASKS = _build_piece_masks()
+
+_FIT_TABLES = {}
+
+def _fit_table(n_rows, n_cols):
+    """
+    (kind, rot) -> {c: (lowest r, highest r, ((dr, mask shifted to column c), ...))}
+    for every column c where the piece is inside the board; built once per board size.
+    """
+    table = _FIT_TABLES.get((n_rows, n_cols))
+    if table is None:
+        table = {}
+        for key, (min_dr, max_dr, min_dc, max_dc, masks) in PIECE_MASKS.items():
+            table[key] = {c: (-min_dr, n_rows - 1 - max_dr, tuple((dr, m << (c + min_dc)) for dr, m, _ in masks))
+                          for c in range(-min_dc, n_cols - max_dc)}
+        _FIT_TABLES[n_rows, n_cols] = table
+    return table
+
+class Board:
+    """
+    Board stored as one int per row: bit c of rows[r] is set when (r, c) is filled.
+    Row 0 is the top, like the old list-of-lists board.
+
+    heights, holes (empty cells under each column's top) and row_fill are kept
+    up to date by merge() and clear_lines(), so reading them is O(1).
+    Call rescan() after editing rows directly.
+    """
+    __slots__ = ("rows", "n_rows", "n_cols", "full", "heights", "holes", "row_fill", "fit")
+
+    def __init__(self, n_rows=ROWS, n_cols=COLS):
+        self.n_rows = n_rows
+        self.n_cols = n_cols
+        self.full = (1 << n_cols) - 1
+        self.rows = [0]*n_rows
+        self.heights = [0]*n_cols
+        self.holes = [0]*n_cols
+        self.row_fill = [0]*n_rows
+        self.fit = _fit_table(n_rows, n_cols)
+
+    def __getstate__(self):
+        # the fit table is shared per board size, not pickled with every board
+        return self.n_rows, self.n_cols, self.rows, self.heights, self.holes, self.row_fill
+
+    def __setstate__(self, state):
+        self.n_rows, self.n_cols, self.rows, self.heights, self.holes, self.row_fill = state
+        self.full = (1 << self.n_cols) - 1
+        self.fit = _fit_table(self.n_rows, self.n_cols)
+
+    def copy(self):
+        b = Board.__new__(Board)
+        b.n_rows, b.n_cols, b.full, b.fit = self.n_rows, self.n_cols, self.full, self.fit
+        b.rows = self.rows[:]
+        b.heights = self.heights[:]
+        b.holes = self.holes[:]
+        b.row_fill = self.row_fill[:]
+        return b
+
+    def __getitem__(self, r):
+        # Row as a list of 0/1 cells, for code that still indexes board[r][c].
+        row = self.rows[r]
+        return [(row >> c) & 1 for c in range(self.n_cols)]
+
+    def fits(self, kind, rot, r, c):
+        at = self.fit[kind, rot].get(c)
+        if at is None or r < at[0] or r > at[1]:
             return False
-    return True
+        rows = self.rows
+        for dr, m in at[2]:
+            if rows[r + dr] & m:
+                return False
+        return True
+
+    def merge(self, kind, rot, r, c):
+        _, _, min_dc, _, masks = PIECE_MASKS[kind, rot]
+        left = c + min_dc
+        rows, heights, holes, row_fill = self.rows, self.heights, self.holes, self.row_fill
+        for dr, m, cols in masks:
+            rr = r + dr
+            rows[rr] |= m << left
+            row_fill[rr] += len(cols)
+            top = self.n_rows - rr
+            for dc in cols:
+                cc = left + dc
+                h = heights[cc]
+                if top > h:
+                    holes[cc] += top - h - 1
+                    heights[cc] = top
+                else:
+                    holes[cc] -= 1
+
+    def clear_lines(self):
+        full = self.full
+        if full not in self.rows:
+            return 0
+        rows, row_fill = self.rows, self.row_fill
+        kept = [r for r in range(self.n_rows) if rows[r] != full]
+        cleared = self.n_rows - len(kept)
+        # A column whose top cell sat in a cleared row may drop by more than
+        # `cleared` (and lose holes); everything else just shifts down.
+        rescan = [c for c, h in enumerate(self.heights) if rows[self.n_rows - h] == full]
+        self.rows = [0]*cleared + [rows[r] for r in kept]
+        self.row_fill = [0]*cleared + [row_fill[r] for r in kept]
+        heights = self.heights
+        for c in range(self.n_cols):
+            heights[c] -= cleared
+        for c in rescan:
+            self._scan_column(c)
+        return cleared
+
+    def _scan_column(self, c):
+        bit = 1 << c
+        h = holes = 0
+        for r, row in enumerate(self.rows):
+            if row & bit:
+                if not h:
+                    h = self.n_rows - r
+            elif h:
+                holes += 1
+        self.heights[c] = h
+        self.holes[c] = holes
+
+    def add_garbage(self, n, hole):
+        """
+        Push n garbage rows, full but for column hole, in from the bottom.
+        Returns False if filled cells were pushed off the top.
+        """
+        n = min(n, self.n_rows)
+        spilled = any(self.rows[:n])
+        self.rows = self.rows[n:] + [self.full & ~(1 << hole)]*n
+        self.rescan()
+        return not spilled
+
+    def rescan(self):
+        """Recompute heights, holes and row_fill from rows."""
+        self.row_fill = [bin(row).count("1") for row in self.rows]
+        for c in range(self.n_cols):
+            self._scan_column(c)
+
+def can_place(board, piece, r_off=0, c_off=0, rot=None):
+    return board.fits(piece.kind, piece.rot if rot is None else rot, piece.r + r_off, piece.c + c_off)
 
 def try_rotate(board, piece, rot_dir):
     old_rot = piece.rot
@@ -130,7 +273,7 @@ def try_rotate(board, piece, rot_dir):
     else:
         kicks = JLSTZ_KICKS.get((old_rot,new_rot), [(0,0)])
     for dr,dc in kicks:
-        if can_place(board, piece, r_off=dr, c_off=dc, rot=new_rot):
+        if board.fits(piece.kind, new_rot, piece.r + dr, piece.c + dc):
             piece.r += dr
             piece.c += dc
             piece.rot = new_rot
@@ -138,104 +281,186 @@ def try_rotate(board, piece, rot_dir):
     return False
 
 def merge(board, piece, val):
-    for dr,dc in piece.blocks():
-        r = piece.r + dr; c = piece.c + dc
-        board[r][c] = val
+    # val was the cell colour in the list-of-lists board; the bitboard only tracks occupancy.
+    board.merge(piece.kind, piece.rot, piece.r, piece.c)
 
 def clear_lines(board):
-    new_rows = [row for row in board if any(x==0 for x in row)]
-    cleared = ROWS - len(new_rows)
-    for _ in range(cleared):
-        new_rows.insert(0, [0]*COLS)
-    return new_rows, cleared
+    cleared = board.clear_lines()
+    return board, cleared
 
-def new_bag():
+def new_bag(rng=random):
     bag = ORDER[:]
-    random.shuffle(bag)
+    rng.shuffle(bag)
     return bag
 
 # -------- Drawing --------
 
-def draw(stdscr, board, piece, score, next_src, hold_kind):
-    maxy, maxx = stdscr.getmaxyx()
-    need_h = ROWS + 2 + 2
-    need_w = 2 + COLS + 2 + 22
-    stdscr.clear()
-    if maxy < need_h or maxx < need_w:
-        msg = f"Resize terminal to at least ~{need_w}x{need_h}. Now: {maxx}x{maxy}"
-        stdscr.addstr(0, 0, msg[:maxx-1]); stdscr.refresh(); return
-
-    top = "+" + "-"*COLS + "+"
-    bot = "+" + "-"*COLS + "+"
-    header = f"{top}   Score: {score}   (←/→/↓, z/↑=rot, SPACE=hard, c=hold, q=quit)"
-    stdscr.addstr(0, 0, header[:maxx-1])
+HELP = "(←/→/↓, z/↑=rot, SPACE=hard, c=hold, q=quit)"
 
-    for r in range(ROWS):
-        row_chars = ["#" if board[r][c] else "." for c in range(COLS)]
-        line = "|" + "".join(row_chars) + "|"
-        stdscr.addstr(1 + r, 0, line[:maxx-1])
+_row_text = {}
 
-    stdscr.addstr(1 + ROWS, 0, bot[:maxx-1])
+def row_text(bits):
+    text = _row_text.get(bits)
+    if text is None:
+        text = _row_text[bits] = "".join("#" if (bits >> c) & 1 else "." for c in range(COLS))
+    return text
 
+def frame_lines(board, piece, score, next_src, hold_kind):
+    """The screen as text lines: the board with the falling piece, and the side panel."""
+    rows = [row_text(bits) for bits in board.rows]
     for dr, dc in piece.blocks():
         rr = piece.r + dr; cc = piece.c + dc
-        if 0 <= rr < ROWS and 0 <= cc < COLS and 0 <= 1+rr < maxy and 0 <= 1+cc < maxx-1:
-            stdscr.addch(1 + rr, 1 + cc, ord("@"))
-
-    panel_x = COLS + 4
-    stdscr.addstr(2, panel_x, "Next:"[:maxx - panel_x - 1])
-    nxt = next_src.peek_kinds(5)
-    stdscr.addstr(3, panel_x, ("  " + " ".join(nxt))[:maxx - panel_x - 1])
-    stdscr.addstr(5, panel_x, "Hold:"[:maxx - panel_x - 1])
-    stdscr.addstr(6, panel_x, (f"  {hold_kind if hold_kind else '-'}")[:maxx - panel_x - 1])
-
-    stdscr.refresh()
+        if 0 <= rr < ROWS and 0 <= cc < COLS:
+            rows[rr] = rows[rr][:cc] + "@" + rows[rr][cc + 1:]
+    edge = "+" + "-"*COLS + "+"
+    lines = [f"{edge}   Score: {score}   {HELP}"]
+    lines += ["|" + row + "|" for row in rows]
+    lines.append(edge)
+    panel = {2: "Next:", 3: "  " + " ".join(next_src.peek_kinds(5)), 5: "Hold:", 6: f"  {hold_kind or '-'}"}
+    for y, text in panel.items():
+        lines[y] += "  " + text
+    return lines
+
+class Renderer:
+    """
+    Curses renderer that keeps the frame on screen and repaints only the
+    changed span of each changed line. Draws come at most fps times a second;
+    one that comes sooner is dropped and leaves the screen dirty, and the
+    loop draws again once wait() reaches zero, so the screen is never more
+    than one interval behind the game.
+    """
+    def __init__(self, stdscr, fps=30):
+        self.stdscr = stdscr
+        self.interval = 1 / fps if fps else 0
+        self.shown = []
+        self.size = None
+        self.last = float("-inf")
+        self.frames = self.dropped = 0
+        self.dirty = False
+
+    def wait(self):
+        """Seconds until a dropped frame may be drawn (<= 0 once it may), or None if none was dropped."""
+        return self.last + self.interval - time.perf_counter() if self.dirty else None
+
+    def draw(self, board, piece, score, next_src, hold_kind, force=False):
+        now = time.perf_counter()
+        if not force and now - self.last < self.interval:
+            self.dropped += 1
+            self.dirty = True
+            return False
+        self.last = now
+        self.dirty = False
+        size = self.stdscr.getmaxyx()
+        if size != self.size:
+            self.size, self.shown = size, []
+            self.stdscr.clear()
+        maxy, maxx = size
+        need_h = ROWS + 2 + 2
+        need_w = 2 + COLS + 2 + 22
+        if maxy < need_h or maxx < need_w:
+            lines = [f"Resize terminal to at least ~{need_w}x{need_h}. Now: {maxx}x{maxy}"]
+        else:
+            lines = frame_lines(board, piece, score, next_src, hold_kind)
+        self.paint([line[:maxx-1] for line in lines])
+        self.frames += 1
+        return True
+
+    def paint(self, lines):
+        scr, old = self.stdscr, self.shown
+        changed = False
+        for y in range(max(len(lines), len(old))):
+            new = lines[y] if y < len(lines) else ""
+            prev = old[y] if y < len(old) else ""
+            if new == prev:
+                continue
+            changed = True
+            start = 0
+            n = min(len(new), len(prev))
+            while start < n and new[start] == prev[start]:
+                start += 1
+            end = len(new)
+            if len(new) == len(prev):
+                while new[end - 1] == prev[end - 1]:
+                    end -= 1
+            if start < end:
+                scr.addstr(y, start, new[start:end])
+            if len(new) < len(prev):
+                scr.move(y, len(new))
+                scr.clrtoeol()
+        self.shown = lines
+        if changed:
+            scr.refresh()
+
+class NullRenderer:
+    """Renderer for headless runs: draws nothing."""
+    frames = dropped = 0
+
+    def wait(self):
+        return None
+
+    def draw(self, board, piece, score, next_src, hold_kind, force=False):
+        return False
 
 # -------- Next piece management --------
 
-def make_bag():
-    bag = ORDER[:]; random.shuffle(bag); return bag
+def make_bag(rng=random):
+    bag = ORDER[:]; rng.shuffle(bag); return bag
 
 class NextSource:
-    def __init__(self):
-        self.bag = make_bag()
-        self.next_bag = make_bag()
+    """7-bags from a private RNG; the same seed always deals the same pieces."""
+    def __init__(self, seed=None):
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed)
+        self.bag = make_bag(self.rng)
+        self.next_bag = make_bag(self.rng)
     def next_kind(self):
         if not self.bag:
-            self.bag, self.next_bag = self.next_bag, make_bag()
+            self.bag, self.next_bag = self.next_bag, make_bag(self.rng)
         return self.bag.pop()
     def peek_kinds(self, k=5):
-        preview = list(reversed(self.bag)) + self.next_bag[:]
+        # both bags are drawn from the end
+        preview = list(reversed(self.bag)) + list(reversed(self.next_bag))
         return preview[:k]
 
 # -------- New FrameLogger with autosave --------
 
+def frame_columns(cols=COLS):
+    """Column names of a frame log row."""
+    return ["piece_seq","frame","piece_id","row","col","rotation","leftmost_col"] + \
+           [f"col_h_{i}" for i in range(cols)] + ["locked","lines_cleared"]
+
 class FrameLogger:
     """
     Logs every frame directly to a CSV file (safe continuous write).
+    Subclasses change the storage by overriding ext, _open, _write and save_csv.
     """
-    def __init__(self, prefix="tetris_frames_numeric"):
+    ext = ".csv"
+
+    def __init__(self, prefix="tetris_frames_numeric", cols=COLS, rows=ROWS, filename=None):
         ts = time.strftime("%Y%m%d-%H%M%S")
-        self.filename = f"{prefix}_{ts}.csv"
+        self.filename = filename or f"{prefix}_{ts}{self.ext}"
         self.piece_seq = -1
         self.frame = 0
+        self.total_frames = 0
+        self.rows = rows
+        self.cols = cols
+        self.columns = frame_columns(cols)
+        self._open()
 
+    def _open(self):
         # Open once and write header immediately
         self.file = open(self.filename, "a", newline="")
         self.writer = csv.writer(self.file)
-        header = ["piece_seq","frame","piece_id","row","col","rotation","leftmost_col"] + \
-                 [f"col_h_{i}" for i in range(COLS)] + ["locked","lines_cleared"]
-        self.writer.writerow(header)
+        self.writer.writerow(self.columns)
         self.file.flush()
 
+    def _write(self, row):
+        self.writer.writerow(row)
+        self.file.flush()  # immediate disk write
+
     def _heights_from(self, board_or_heights):
-        if (
-            isinstance(board_or_heights, list)
-            and len(board_or_heights) == COLS
-            and all(isinstance(x, int) for x in board_or_heights)
-        ):
-            return board_or_heights
-        return column_heights(board_or_heights)
+        # a Board carries its tracked heights; anything else is a heights list
+        return getattr(board_or_heights, "heights", board_or_heights)
 
     def start_piece(self, piece, board):
         self.piece_seq += 1
@@ -259,9 +484,9 @@ class FrameLogger:
             piece.rot,
             piece_leftmost_col(piece),
         ] + heights + [locked, lines_cleared]
-        self.writer.writerow(row)
-        self.file.flush()  # immediate disk write
+        self._write(row)
         self.frame += 1
+        self.total_frames += 1
 
     def save_csv(self):
         """Close the CSV file cleanly."""
@@ -269,221 +494,278 @@ class FrameLogger:
             self.file.close()
         return self.filename
 
+# -------- Headless game --------
+
+# Actions shared by the curses loop, Game.step and batch_sim.BatchSim.step
+NOOP, LEFT, RIGHT, DOWN, ROT_CW, ROT_CCW, HOLD, HARD_DROP = range(8)
+
+class Game:
+    """
+    One game with the rules of the curses loop but no terminal.
+    step(action) is one tick: the input, then gravity on every
+    gravity_every-th tick (a hard drop locks immediately and skips gravity
+    for that tick). A recorder, if given, sees every (tick, action) passed to step.
+    """
+    def __init__(self, logger=None, next_src=None, n_rows=ROWS, n_cols=COLS, recorder=None, gravity_every=1):
+        self.board = Board(n_rows, n_cols)
+        self.gravity_every = gravity_every
+        self.score = 0
+        self.lines = 0
+        self.pieces = 0
+        self.logger = logger
+        self.recorder = recorder
+        self.ticks = 0
+        self.next_src = next_src if next_src is not None else NextSource()
+        self.hold_kind = None
+        self.hold_used = False
+        self.over = False
+        self.current = None
+        self._spawn()
+
+    def _spawn(self, kind=None):
+        self.current = Piece(kind if kind else self.next_src.next_kind())
+        if not can_place(self.board, self.current):
+            self.over = True
+        elif self.logger:
+            self.logger.start_piece(self.current, self.board)
+
+    def _log_frame(self):
+        if self.logger:
+            self.logger.log_frame(self.current, self.board)
+
+    def _shift(self, dr, dc):
+        if can_place(self.board, self.current, r_off=dr, c_off=dc):
+            self.current.r += dr
+            self.current.c += dc
+            self._log_frame()
+            return True
+        return False
+
+    def _rotate(self, rot_dir):
+        if try_rotate(self.board, self.current, rot_dir):
+            self._log_frame()
+            return True
+        return False
+
+    def lock(self):
+        current = self.current
+        heights_before = column_heights(self.board) if self.logger else None
+        merge(self.board, current, val=ORDER.index(current.kind) + 1)
+        self.board, cleared = clear_lines(self.board)
+        self.score += 100 + cleared * 500
+        self.lines += cleared
+        self.pieces += 1
+        if self.logger:
+            self.logger.log_lock(current, heights_before, lines_cleared=cleared)
+        self.hold_used = False
+        self._spawn()
+        return cleared
+
+    def add_garbage(self, n, hole):
+        """Raise the stack by n garbage rows (versus play); the falling piece is pushed up if it must be."""
+        if self.over or n <= 0:
+            return
+        ok = self.board.add_garbage(n, hole)
+        cur = self.current
+        lift = 0
+        while lift < n and not can_place(self.board, cur, r_off=-lift):
+            lift += 1
+        cur.r -= lift
+        if not ok or not can_place(self.board, cur):
+            self.over = True
+
+    def act(self, action):
+        """Apply one input. Returns True if the piece moved, rotated, was held or dropped."""
+        if self.over:
+            return False
+        if action == LEFT:
+            return self._shift(0, -1)
+        if action == RIGHT:
+            return self._shift(0, +1)
+        if action == DOWN:
+            return self._shift(+1, 0)
+        if action == ROT_CW:
+            return self._rotate(+1)
+        if action == ROT_CCW:
+            return self._rotate(-1)
+        if action == HOLD:
+            if self.hold_used:
+                return False
+            swap_kind = self.hold_kind
+            self.hold_kind = self.current.kind
+            # log the pre-hold frame (still current piece in same board)
+            self._log_frame()
+            self.hold_used = True
+            self._spawn(swap_kind)
+            return True
+        if action == HARD_DROP:
+            # hard drop: log each step
+            while self._shift(+1, 0):
+                pass
+            self.lock()
+            return True
+        return False
+
+    def gravity(self):
+        """One gravity step: fall one row, or lock if resting."""
+        if self.over:
+            return
+        if not self._shift(+1, 0):
+            self.lock()
+
+    def step(self, action=NOOP):
+        if self.recorder is not None:
+            self.recorder.record(self.ticks, action)
+        self.ticks += 1
+        self.act(action)
+        if action != HARD_DROP and self.ticks % self.gravity_every == 0:
+            self.gravity()
+        return not self.over
+
 # -------- Game loop --------
-# (unchanged from your original, except it now uses the new FrameLogger)
+
+KEY_ACTIONS = {
+    curses.KEY_LEFT: LEFT, ord('a'): LEFT,
+    curses.KEY_RIGHT: RIGHT, ord('d'): RIGHT,
+    curses.KEY_DOWN: DOWN, ord('s'): DOWN,
+    curses.KEY_UP: ROT_CW, ord('w'): ROT_CW, ord('x'): ROT_CW,
+    ord('z'): ROT_CCW,
+    ord('c'): HOLD,
+    ord(' '): HARD_DROP,
+}
+
+def load_model(path="tetris_model1.pkl"):
+    """
+    NumPy inference for the trained MLP. Prefers the .tmod artifact (weights plus
+    scalers) written by model.py, then an older .npz; a bare pickle is wrapped
+    as-is, unscaled. Any of them built for another frame layout is refused
+    with inference.SchemaError.
+    """
+    from inference import MLPInference
+    base = path.rsplit(".", 1)[0]
+    for artifact in (base + ".tmod", base + ".npz"):
+        if os.path.exists(artifact):
+            return MLPInference.load(artifact, columns=frame_columns())
+    return MLPInference.load_pickle(path, columns=frame_columns())
+
+def flag_value(name, default):
+    """The number after a --flag on the command line, or default."""
+    return float(sys.argv[sys.argv.index(name) + 1]) if name in sys.argv else default
 
 def game(stdscr):
     curses.curs_set(0)
     stdscr.nodelay(True)
-    stdscr.timeout(200)
-
-    board = new_board()
-    score = 0
-    logger = FrameLogger()
-
+    from scheduler import FixedStep, AIWorker
+    # simulation ticks per second, and gravity rows per second
+    tick_rate = flag_value("--tick-rate", 60)
+    speed = flag_value("--speed", 5)
+
+    if "--binlog" in sys.argv:
+        from framelog import BinaryFrameLogger
+        logger = BinaryFrameLogger()
+    else:
+        logger = FrameLogger()
+    from replay import ReplayRecorder
     next_src = NextSource()
-    hold_kind = None
-    hold_used = False
-
-    with open("tetris_model1.pkl", "rb") as f:
-        model = pickle.load(f)
-
-    def spawn_new_piece(kind=None):
-        p = Piece(kind if kind else next_src.next_kind())
-        p.rot = 0
-        p.r, p.c = 0, 4
-        return p
+    recorder = ReplayRecorder(next_src.seed)
+    state = Game(logger, next_src, recorder=recorder, gravity_every=max(1, round(tick_rate / speed)))
+
+    ai_mode = len(sys.argv) > 1 and sys.argv[1] == "ai"
+    if ai_mode:
+        from placement import PlacementAI, ModelScorer
+        # the AI moves on every tick, many times per gravity step
+        if "--lookahead" in sys.argv:
+            from planner import BeamPlanner, LookaheadAI
+            ai = LookaheadAI(BeamPlanner(ModelScorer(load_model())))
+        else:
+            ai = PlacementAI(ModelScorer(load_model()))
 
-    current = spawn_new_piece()
-    if not can_place(board, current):
+    if "--no-render" in sys.argv:
+        renderer = NullRenderer()
+    else:
+        renderer = Renderer(stdscr, flag_value("--fps", 30))
+
+    render, getch = renderer.draw, stdscr.getch
+    inst = sampler = None
+    if "--profile" in sys.argv:
+        from instrument import Instrumentation, StackSampler
+        inst = Instrumentation()
+        render = inst.timed(renderer.draw, "render")
+        getch = inst.timed(stdscr.getch, "input")  # includes the tick's wait for a key
+        inst.wrap(state, "step", "step")
+        inst.wrap(state, "lock", "lock")
+        inst.wrap(logger, "_log", "log")
+        inst.count_kicks(state)
+        if ai_mode:
+            inst.wrap(ai, "next_action", "ai")
+            inst.wrap(ai.scorer.model, "predict", "predict", counter="predicts")
+        if "--profile-stacks" in sys.argv:
+            sampler = StackSampler().start()
+
+    if state.over:
         return
-    logger.start_piece(current, board)
-
-    sw = False
-
-    while True:
-        draw(stdscr, board, current, score, next_src, hold_kind)
-        
-        if (len(sys.argv) > 1 and sys.argv[1] == "ai"):
-            if sw:
-                try:
-                    key = stdscr.getch()
-                except:
-                    key = -1
-
-                if key != -1:
-                    if key in (ord('q'), 27):
-                        break
-                    elif key in (curses.KEY_LEFT, ord('a')):
-                        if can_place(board, current, c_off=-1):
-                            current.c -= 1
-                            logger.log_frame(current, board)
-                    elif key in (curses.KEY_RIGHT, ord('d')):
-                        if can_place(board, current, c_off=+1):
-                            current.c += 1
-                            logger.log_frame(current, board)
-                    elif key in (curses.KEY_DOWN, ord('s')):
-                        if can_place(board, current, r_off=+1):
-                            current.r += 1
-                            logger.log_frame(current, board)
-                    elif key in (curses.KEY_UP, ord('w'), ord('x')):
-                        if try_rotate(board, current, +1):  # CW
-                            logger.log_frame(current, board)
-                    elif key == ord('z'):
-                        if try_rotate(board, current, -1):  # CCW
-                            logger.log_frame(current, board)
-                    elif key == ord('c'):
-                        if not hold_used:
-                            swap_kind = hold_kind
-                            hold_kind = current.kind
-                            # log the pre-hold frame (still current piece in same board)
-                            logger.log_frame(current, board)
-                            if swap_kind is None:
-                                current = spawn_new_piece()
-                            else:
-                                current = spawn_new_piece(swap_kind)
-                            hold_used = True
-                            if not can_place(board, current):
-                                break
-                            logger.start_piece(current, board)
-                    elif key == ord(' '):
-                        # hard drop: log each step
-                        while can_place(board, current, r_off=+1):
-                            current.r += 1
-                            logger.log_frame(current, board)
-                        # lock
-                        heights_before = column_heights(board)
-                        merge(board, current, val=ORDER.index(current.kind) + 1)
-                        board, cleared = clear_lines(board)
-                        score += 100 + cleared * 500
-                        logger.log_lock(current, heights_before, lines_cleared=cleared)
-                        current = spawn_new_piece()
-                        hold_used = False
-                        if not can_place(board, current):
-                            break
-                        logger.start_piece(current, board)
-                        continue  # skip gravity this tick
-            else:
-                heights = column_heights(board)
-                current_frame_data = [
-                    logger.piece_seq,           # piece_seq
-                    logger.frame,               # frame
-                    PIECE_TO_ID[current.kind],  # piece_id
-                    current.r,                  # row
-                    current.c,                  # col
-                    current.rot,                # rotation
-                    piece_leftmost_col(current) # leftmost_col
-                ] + heights + [0, 0]            # locked, lines_cleared placeholders
-
-                predicted = model.predict([current_frame_data])[0]
-                next_r = int(round(predicted[4]))
-                next_c = int(round(predicted[5]))
-                next_rot = int(round(predicted[6])) % 4
-
-                dr = next_r - current.r
-                dc = next_c - current.c
-                rot_dir = (next_rot - current.rot) % 4
-
-                moved = False
-                if dr > 0 and can_place(board, current, r_off=+1):
-                    current.r += 1; moved = True
-                elif dr < 0 and can_place(board, current, r_off=-1):
-                    current.r -= 1; moved = True
-
-                if dc > 0 and can_place(board, current, c_off=+1):
-                    current.c += 1; moved = True
-                elif dc < 0 and can_place(board, current, c_off=-1):
-                    current.c -= 1; moved = True
-
-                if rot_dir != 0:
-                    if rot_dir == 1:
-                        moved = try_rotate(board, current, +1) or moved
-                    elif rot_dir == 3:
-                        moved = try_rotate(board, current, -1) or moved
-
-                if moved:
-                    logger.log_frame(current, board)
-            
-            sw = not sw
 
-        else:
+    # ticks come from the clock; keys that arrive in between are applied one per tick
+    clock = FixedStep(tick_rate)
+    worker = AIWorker(ai) if ai_mode else None
+    keys = []
+    playing = True
+
+    while playing:
+        while playing and clock.remaining() > 0:
+            # wake for a dropped frame's repaint too, not only for the next tick
+            wait = clock.remaining()
+            repaint = renderer.wait()
+            if repaint is not None:
+                wait = min(wait, repaint)
+            stdscr.timeout(max(1, int(wait * 1000)))
             try:
-                key = stdscr.getch()
+                key = getch()
             except:
                 key = -1
-
-            if key != -1:
-                if key in (ord('q'), 27):
-                    break
-                elif key in (curses.KEY_LEFT, ord('a')):
-                    if can_place(board, current, c_off=-1):
-                        current.c -= 1
-                        logger.log_frame(current, board)
-                elif key in (curses.KEY_RIGHT, ord('d')):
-                    if can_place(board, current, c_off=+1):
-                        current.c += 1
-                        logger.log_frame(current, board)
-                elif key in (curses.KEY_DOWN, ord('s')):
-                    if can_place(board, current, r_off=+1):
-                        current.r += 1
-                        logger.log_frame(current, board)
-                elif key in (curses.KEY_UP, ord('w'), ord('x')):
-                    if try_rotate(board, current, +1):  # CW
-                        logger.log_frame(current, board)
-                elif key == ord('z'):
-                    if try_rotate(board, current, -1):  # CCW
-                        logger.log_frame(current, board)
-                elif key == ord('c'):
-                    if not hold_used:
-                        swap_kind = hold_kind
-                        hold_kind = current.kind
-                        # log the pre-hold frame (still current piece in same board)
-                        logger.log_frame(current, board)
-                        if swap_kind is None:
-                            current = spawn_new_piece()
-                        else:
-                            current = spawn_new_piece(swap_kind)
-                        hold_used = True
-                        if not can_place(board, current):
-                            break
-                        logger.start_piece(current, board)
-                elif key == ord(' '):
-                    # hard drop: log each step
-                    while can_place(board, current, r_off=+1):
-                        current.r += 1
-                        logger.log_frame(current, board)
-                    # lock
-                    heights_before = column_heights(board)
-                    merge(board, current, val=ORDER.index(current.kind) + 1)
-                    board, cleared = clear_lines(board)
-                    score += 100 + cleared * 500
-                    logger.log_lock(current, heights_before, lines_cleared=cleared)
-                    current = spawn_new_piece()
-                    hold_used = False
-                    if not can_place(board, current):
-                        break
-                    logger.start_piece(current, board)
-                    continue  # skip gravity this tick
-
-        # gravity step (always logs one frame when it moves)
-        if can_place(board, current, r_off=+1):
-            current.r += 1
-            logger.log_frame(current, board)
-        else:
-            heights_before = column_heights(board)
-            merge(board, current, val=ORDER.index(current.kind) + 1)
-            board, cleared = clear_lines(board)
-            score += 100 + cleared * 500
-            logger.log_lock(current, heights_before, lines_cleared=cleared)
-            current = spawn_new_piece()
-            hold_used = False
-            if not can_place(board, current):
+            if key in (ord('q'), 27):
+                playing = False
+            elif key != -1:
+                keys.append(key)
+            repaint = renderer.wait()
+            if repaint is not None and repaint <= 0:
+                render(state.board, state.current, state.score, state.next_src, state.hold_kind)
+
+        for _ in range(clock.due() if playing else 0):
+            action = NOOP
+            if keys:
+                action = KEY_ACTIONS.get(keys.pop(0), NOOP)
+            elif worker:
+                decided = worker.poll(state)
+                if decided is not None:
+                    action = decided
+            if not state.step(action):
+                playing = False
                 break
-            logger.start_piece(current, board)
+            if worker:
+                worker.post(state)
+
+        render(state.board, state.current, state.score, state.next_src, state.hold_kind)
+
+    if worker:
+        worker.close()
 
     # ---- Game over & optional save ----
+    renderer.draw(state.board, state.current, state.score, state.next_src, state.hold_kind, force=True)
+    base = logger.filename.rsplit(".", 1)[0]
+    recorder.save(base + ".trp", state)
+    summary = None
+    if inst:
+        from instrument import format_report, save_report
+        if sampler:
+            sampler.stop()
+            sampler.save(base + ".folded")
+        inst.counters.update(frames_drawn=renderer.frames, frames_dropped=renderer.dropped, ticks_dropped=clock.dropped)
+        report = inst.report(state.pieces)
+        save_report(report, base + ".profile.json")
+        summary = format_report(report)
     stdscr.nodelay(False)
-    stdscr.addstr(ROWS + 3, 0, f"Game Over. Final score: {score}")
+    stdscr.addstr(ROWS + 3, 0, f"Game Over. Final score: {state.score}")
     stdscr.addstr(ROWS + 4, 0, "Can we sell your data? (y/n): ")
     stdscr.refresh()
 
@@ -499,6 +781,9 @@ def game(stdscr):
     stdscr.addstr(ROWS + 7, 0, "Press any key to exit.")
     stdscr.refresh()
     stdscr.getch()
+    return summary
 
 if __name__ == "__main__":
-    curses.wrapper(game)
\ No newline at end of file
+    summary = curses.wrapper(game)
+    if summary:
+        print(summary)
\ No newline at end of file
@@ -0,0 +1,268 @@
+"""
+Headless 1v1 matches and tournaments between model artifacts.
+
+A Match steps two Games in lockstep on the same seeded piece sequence.
+A lock that clears lines attacks the other board (ATTACK: 2 lines send 1,
+3 send 2, a tetris sends 4). Incoming garbage first cancels against the
+receiver's own attacks (those made on the same tick included) and is
+otherwise pushed in under their stack at their next lock that clears
+nothing, one hole column per batch. The hole columns come from the match
+seed too, so a match is fully determined by its seed and its two players.
+A player who tops out loses; if both top out on the same tick, or both
+reach max_pieces, it is a draw.
+
+A tournament plays every pair of entrants on a process pool, each seed
+twice with the sides swapped, and fits Elo ratings (Bradley-Terry, mean
+1500) with bootstrap confidence intervals. An entrant is a model artifact
+path (loaded like tetris_ai.load_model) or "heuristic".
+
+Usage:
+    python versus.py match tetris_model1.tmod heuristic --seed 7
+    python versus.py tournament tetris_model1.tmod other.tmod heuristic --matches 200 --out results.json
+"""
+import argparse, json, os, random, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import combinations
+
+import numpy as np
+
+from tetris_ai import ROWS, COLS, Game, NextSource, load_model
+
+ATTACK = [0, 0, 1, 2, 4]
+
+class Match:
+    def __init__(self, seed, n_rows=ROWS, n_cols=COLS, max_pieces=500, gravity_every=1):
+        self.seed = seed
+        self.max_pieces = max_pieces
+        self.games = [Game(next_src=NextSource(seed), n_rows=n_rows, n_cols=n_cols, gravity_every=gravity_every)
+                      for _ in range(2)]
+        # both players get the same hole columns, in the same order, from a
+        # stream of their own: seeded like NextSource they would track the bag
+        self.holes = [random.Random(f"{seed}:holes"), random.Random(f"{seed}:holes")]
+        self.pending = [0, 0]
+        self.sent = [0, 0]
+        self.ticks = 0
+        self.over = False
+        self.winner = None
+
+    def step(self, actions):
+        """One tick of both games. Returns False once the match is decided."""
+        cleared = [None, None]
+        for i, game in enumerate(self.games):
+            if game.pieces >= self.max_pieces:
+                continue
+            pieces, lines = game.pieces, game.lines
+            game.step(actions[i])
+            if game.pieces != pieces:
+                cleared[i] = game.lines - lines
+        if cleared != [None, None]:
+            self._resolve(cleared)
+        self.ticks += 1
+        lost = [g.over for g in self.games]
+        if any(lost):
+            self.over = True
+            self.winner = None if all(lost) else lost.index(False)
+        elif all(g.pieces >= self.max_pieces for g in self.games):
+            self.over = True
+        return not self.over
+
+    def _resolve(self, cleared):
+        """Settle this tick's locks; attacks made on the same tick are settled together."""
+        attacks = [ATTACK[min(c or 0, 4)] for c in cleared]
+        for i in (0, 1):
+            cancelled = min(attacks[i], self.pending[i])
+            self.pending[i] -= cancelled
+            attacks[i] -= cancelled
+        for i in (0, 1):
+            self.pending[1 - i] += attacks[i]
+            self.sent[i] += attacks[i]
+        for i, game in enumerate(self.games):
+            if cleared[i] == 0 and self.pending[i]:
+                game.add_garbage(self.pending[i], self.holes[i].randrange(game.board.n_cols))
+                self.pending[i] = 0
+
+    def result(self):
+        return {
+            "seed": self.seed, "winner": self.winner, "ticks": self.ticks,
+            "pieces": [g.pieces for g in self.games], "lines": [g.lines for g in self.games],
+            "sent": self.sent,
+        }
+
+def make_scorer(entrant):
+    from placement import HeuristicScorer, ModelScorer
+    if entrant == "heuristic":
+        return HeuristicScorer()
+    return ModelScorer(load_model(entrant))
+
+def play_match(scorers, seed, max_pieces=500):
+    """One match between two scorers; returns Match.result()."""
+    from placement import PlacementAI
+    match = Match(seed, max_pieces=max_pieces)
+    # headless, every decision is followed by exactly one gravity step
+    ais = [PlacementAI(scorer, gravity=1) for scorer in scorers]
+    games = match.games
+    while match.step([ais[0].next_action(games[0]), ais[1].next_action(games[1])]):
+        pass
+    return match.result()
+
+# -------- Tournament --------
+
+_scorers = None
+
+def _init_worker(entrants):
+    # models are loaded once per worker, not once per match
+    global _scorers
+    _scorers = [make_scorer(e) for e in entrants]
+
+def play_batch(jobs, max_pieces):
+    """jobs: (a, b, seed) entrant indices; returns (a, b, result) for each."""
+    return [(a, b, play_match([_scorers[a], _scorers[b]], seed, max_pieces)) for a, b, seed in jobs]
+
+def schedule(n_entrants, matches, seed):
+    """(a, b, seed) for every pair, `matches` per pair: each seed once from each side."""
+    rng = random.Random(seed)
+    jobs = []
+    for a, b in combinations(range(n_entrants), 2):
+        for _ in range(-(-matches // 2)):
+            s = rng.getrandbits(64)
+            jobs += [(a, b, s), (b, a, s)]
+    return jobs
+
+def fit_elo(n, a, b, score, prior=1.0, iters=1000):
+    """
+    Bradley-Terry ratings on the Elo scale, mean 1500, from games a[k] vs
+    b[k] where a[k] scored score[k] (1, 0.5 or 0). Each pair that met gets
+    `prior` virtual drawn games, so an unbeaten entrant still has a finite rating.
+    An entrant with no games has no rating: ValueError.
+    """
+    wins = np.zeros((n, n))
+    games = np.zeros((n, n))
+    np.add.at(wins, (a, b), score)
+    np.add.at(wins, (b, a), 1 - score)
+    np.add.at(games, (a, b), 1)
+    np.add.at(games, (b, a), 1)
+    idle = np.flatnonzero(games.sum(axis=1) == 0)
+    if len(idle):
+        raise ValueError(f"entrants {idle.tolist()} have no games")
+    met = games > 0
+    wins += prior / 2 * met
+    games += prior * met
+    total = wins.sum(axis=1)
+    gamma = np.ones(n)
+    for _ in range(iters):
+        new = total / (games / (gamma[:, None] + gamma[None, :])).sum(axis=1)
+        new /= np.exp(np.log(new).mean())
+        if np.abs(new - gamma).max() < 1e-10:
+            break
+        gamma = new
+    elo = 400 * np.log10(new)
+    return elo - elo.mean() + 1500
+
+def score_ci(points, n, z=1.96):
+    """Wilson interval for a score of points out of n games."""
+    if not n:
+        return 0.0, 1.0
+    p = points / n
+    centre = (p + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+def summarize(entrants, results, bootstrap=200, seed=0):
+    n = len(entrants)
+    a = np.array([r[0] for r in results], dtype=int)
+    b = np.array([r[1] for r in results], dtype=int)
+    winner = [r[2]["winner"] for r in results]
+    score = np.array([0.5 if w is None else float(w == 0) for w in winner])
+
+    elo = fit_elo(n, a, b, score)
+    rng = np.random.default_rng(seed)
+    samples = []
+    while len(samples) < bootstrap:
+        i = rng.integers(0, len(a), len(a))
+        # a resample that leaves out every game of some entrant is drawn again
+        if np.all(np.bincount(np.concatenate([a[i], b[i]]), minlength=n)):
+            samples.append(fit_elo(n, a[i], b[i], score[i]))
+    lo, hi = np.percentile(samples, [2.5, 97.5], axis=0)
+
+    pairs = []
+    for i, j in combinations(range(n), 2):
+        as_a = (a == i) & (b == j)
+        as_b = (a == j) & (b == i)
+        games = int(as_a.sum() + as_b.sum())
+        points = float(score[as_a].sum() + (1 - score[as_b]).sum())
+        draws = int(sum(1 for k in np.flatnonzero(as_a | as_b) if winner[k] is None))
+        ci = score_ci(points, games)
+        pairs.append({
+            "a": entrants[i], "b": entrants[j], "games": games,
+            "a_wins": int(points - draws / 2), "draws": draws, "b_wins": int(games - points - draws / 2),
+            "a_score": round(points / max(games, 1), 4), "ci95": [round(ci[0], 4), round(ci[1], 4)],
+        })
+    ratings = [{"entrant": e, "elo": round(float(elo[i]), 1),
+                "ci95": [round(float(lo[i]), 1), round(float(hi[i]), 1)],
+                "games": int((a == i).sum() + (b == i).sum())}
+               for i, e in enumerate(entrants)]
+    ratings.sort(key=lambda r: -r["elo"])
+    return {"ratings": ratings, "pairs": pairs}
+
+def tournament(entrants, matches=100, workers=None, seed=0, max_pieces=500, batch=4):
+    workers = workers or os.cpu_count()
+    jobs = schedule(len(entrants), matches, seed)
+    batches = [jobs[i:i + batch] for i in range(0, len(jobs), batch)]
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(entrants,)) as pool:
+        futures = [pool.submit(play_batch, jb, max_pieces) for jb in batches]
+        for future in as_completed(futures):
+            results += future.result()
+            print(f"\r{len(results)}/{len(jobs)} matches", end="", flush=True)
+    print()
+    # as_completed order varies; sort so the bootstrap sees the same list every run
+    results.sort(key=lambda r: (r[0], r[1], r[2]["seed"]))
+    seconds = time.perf_counter() - start
+    report = summarize(entrants, results, seed=seed)
+    report.update(entrants=entrants, matches=len(results), seed=seed, max_pieces=max_pieces,
+                  workers=workers, seconds=round(seconds, 3),
+                  ticks=sum(r[2]["ticks"] for r in results))
+    return report
+
+def format_report(report):
+    lines = [f"{'entrant':40s} {'elo':>7s} {'95% CI':>17s} {'games':>6s}"]
+    for r in report["ratings"]:
+        lines.append(f"{r['entrant']:40s} {r['elo']:7.1f} [{r['ci95'][0]:7.1f}, {r['ci95'][1]:7.1f}] {r['games']:6d}")
+    lines.append("")
+    for p in report["pairs"]:
+        lines.append(f"{p['a']} vs {p['b']}: {p['a_wins']}-{p['draws']}-{p['b_wins']}, "
+                     f"score {p['a_score']:.3f} [{p['ci95'][0]:.3f}, {p['ci95'][1]:.3f}]")
+    lines.append(f"{report['matches']} matches in {report['seconds']:.1f}s")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless 1v1 matches and tournaments.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    one = sub.add_parser("match", help="play one match and print its result")
+    one.add_argument("a")
+    one.add_argument("b")
+    one.add_argument("--seed", type=int, default=0)
+    one.add_argument("--max-pieces", type=int, default=500)
+    tour = sub.add_parser("tournament", help="round robin between entrants, with Elo")
+    tour.add_argument("entrants", nargs="+", help="model artifacts or 'heuristic'")
+    tour.add_argument("--matches", type=int, default=100, help="per pair, rounded up to even")
+    tour.add_argument("--workers", type=int, default=None, help="default: one per core")
+    tour.add_argument("--seed", type=int, default=0)
+    tour.add_argument("--max-pieces", type=int, default=500, help="a match where both reach this is drawn")
+    tour.add_argument("--out", default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+
+    if args.command == "match":
+        print(json.dumps(play_match([make_scorer(args.a), make_scorer(args.b)], args.seed, args.max_pieces)))
+        return
+    if len(set(args.entrants)) < 2:
+        parser.error("a tournament needs at least two different entrants")
+    report = tournament(args.entrants, args.matches, args.workers, args.seed, args.max_pieces)
+    print(format_report(report))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+
+if __name__ == "__main__":
+    main()